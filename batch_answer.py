@@ -0,0 +1,282 @@
+"""Answer saved screenshots in bulk through the OpenAI Batch API.
+
+OCRs every capture in a folder, submits the questions as one batch job and
+ingests the answers into a local results store once the job completes.
+
+Usage:
+    python batch_answer.py submit ss/
+    python batch_answer.py status [batch_id] [--wait]
+    python batch_answer.py ingest [batch_id]
+
+Use --base-url http://localhost:8765/v1 to run against stub_server.py.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from openai import OpenAI
+from PIL import Image
+
+from core import OCRError, OCRProcessor, PromptBuilder, SettingsManager
+
+JOBS_FILE = "batch_jobs.json"
+RESULTS_FILE = "batch_results.json"
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def load_json(path):
+    """Load a JSON store, returning an empty dict if it does not exist yet."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    """Write a JSON store atomically."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def create_client(base_url=None):
+    """Create an OpenAI client, optionally pointed at a different server."""
+    api_key = os.getenv("OPENAI_API_KEY") or ("stub" if base_url else None)
+    return OpenAI(api_key=api_key, base_url=base_url)
+
+
+def write_batch_file(folder, settings_manager, batch_path):
+    """OCR every new capture in folder and write one chat completion request per line.
+
+    Captures already answered or queued in a batch that is still pending are
+    skipped, and so are captures OCR could not read. Returns the list of
+    capture paths included in the batch.
+    """
+    ocr_processor = OCRProcessor(settings_manager)
+    prompt_builder = PromptBuilder(settings_manager)
+    results = load_json(RESULTS_FILE)
+    queued = {
+        path for job in load_json(JOBS_FILE).values()
+        if not job.get("ingested") and job.get("status") not in ("failed", "expired", "cancelled")
+        for path in job.get("captures", {})
+    }
+    model = settings_manager.get("openai_model")
+
+    captures = sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+    included = []
+    failed = []
+    with open(batch_path, "w") as f:
+        for path in captures:
+            if path in results or path in queued:
+                continue  # Already answered, or waiting in a submitted batch
+
+            try:
+                with Image.open(path) as image:
+                    extracted_text = ocr_processor.read_text(image)
+            except OCRError as e:
+                print(f"Skipping {path}: {e}")
+                failed.append(path)
+                continue
+            if not extracted_text.strip():
+                print(f"Skipping {path}: no text extracted")
+                continue
+
+            prompt_text, _ = prompt_builder.build(extracted_text, model)
+            request = {
+                "custom_id": path,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": model,
+                    "messages": [
+                        {"role": "system", "content": settings_manager.get("system_prompt")},
+                        {"role": "user", "content": f"Please answer the question and keep short: {prompt_text}"}
+                    ],
+                    "max_tokens": settings_manager.get("max_tokens"),
+                    "temperature": settings_manager.get("temperature")
+                }
+            }
+            f.write(json.dumps(request) + "\n")
+            included.append({"path": path, "ocr_text": extracted_text})
+            print(f"Queued {path}")
+
+    if failed:
+        print(f"OCR failed for {len(failed)} captures; they were not submitted")
+    return included
+
+
+def submit(client, settings_manager, folder):
+    """Build the batch file for a folder, upload it and create the batch job."""
+    os.makedirs("batches", exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")  # Unique even for submits in the same second
+    batch_path = os.path.join("batches", f"batch_{timestamp}.jsonl")
+
+    included = write_batch_file(folder, settings_manager, batch_path)
+    if not included:
+        print("Nothing to submit - all captures are answered, queued or unreadable")
+        os.remove(batch_path)
+        return None
+
+    with open(batch_path, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+        metadata={"folder": folder}
+    )
+
+    jobs = load_json(JOBS_FILE)
+    jobs[batch.id] = {
+        "status": batch.status,
+        "folder": folder,
+        "batch_file": batch_path,
+        "input_file_id": input_file.id,
+        "output_file_id": None,
+        "error_file_id": None,
+        "captures": {item["path"]: item["ocr_text"] for item in included},
+        "created_at": datetime.now().isoformat(),
+        "ingested": False
+    }
+    save_json(JOBS_FILE, jobs)
+
+    print(f"Submitted batch {batch.id} with {len(included)} requests")
+    return batch.id
+
+
+def refresh_status(client, batch_id):
+    """Fetch the latest status of a batch and store it in the jobs file."""
+    batch = client.batches.retrieve(batch_id)
+    jobs = load_json(JOBS_FILE)
+    job = jobs.setdefault(batch_id, {"captures": {}, "ingested": False})
+    job["status"] = batch.status
+    job["output_file_id"] = batch.output_file_id
+    job["error_file_id"] = batch.error_file_id
+    if batch.request_counts:
+        job["request_counts"] = {
+            "total": batch.request_counts.total,
+            "completed": batch.request_counts.completed,
+            "failed": batch.request_counts.failed
+        }
+    save_json(JOBS_FILE, jobs)
+    return job
+
+
+def ingest(client, batch_id):
+    """Download the output of a completed batch into the results store."""
+    job = refresh_status(client, batch_id)
+    if job["status"] != "completed":
+        print(f"Batch {batch_id} is {job['status']} - nothing to ingest yet")
+        return 0
+
+    results = load_json(RESULTS_FILE)
+    ingested = 0
+
+    # A batch whose requests all failed has no output file, only an error file
+    output = client.files.content(job["output_file_id"]).text if job.get("output_file_id") else ""
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        path = record["custom_id"]
+        response = record.get("response") or {}
+        if response.get("status_code") != 200:
+            print(f"Request for {path} failed: {record.get('error')}")
+            continue
+
+        body = response["body"]
+        results[path] = {
+            "answer": body["choices"][0]["message"]["content"],
+            "model": body.get("model"),
+            "usage": body.get("usage"),
+            "ocr_text": job["captures"].get(path),
+            "batch_id": batch_id,
+            "ingested_at": datetime.now().isoformat()
+        }
+        ingested += 1
+
+    if job.get("error_file_id"):
+        errors = client.files.content(job["error_file_id"]).text
+        for line in errors.splitlines():
+            if line.strip():
+                record = json.loads(line)
+                print(f"Request for {record.get('custom_id')} failed: {record.get('error')}")
+
+    save_json(RESULTS_FILE, results)
+
+    jobs = load_json(JOBS_FILE)
+    jobs[batch_id]["ingested"] = True
+    save_json(JOBS_FILE, jobs)
+
+    print(f"Ingested {ingested} answers from batch {batch_id} into {RESULTS_FILE}")
+    return ingested
+
+
+def pending_batch_ids():
+    """Return ids of batches that have not been ingested yet."""
+    return [batch_id for batch_id, job in load_json(JOBS_FILE).items() if not job.get("ingested")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer saved screenshots through the OpenAI Batch API")
+    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL"), help="API base URL (e.g. a local stub server)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = subparsers.add_parser("submit", help="OCR a folder and submit a batch")
+    submit_parser.add_argument("folder", nargs="?", default="ss")
+
+    status_parser = subparsers.add_parser("status", help="Show batch status")
+    status_parser.add_argument("batch_id", nargs="?")
+    status_parser.add_argument("--wait", action="store_true", help="Poll until the batch finishes")
+    status_parser.add_argument("--interval", type=float, default=30.0, help="Polling interval in seconds")
+
+    ingest_parser = subparsers.add_parser("ingest", help="Ingest completed batch results")
+    ingest_parser.add_argument("batch_id", nargs="?")
+
+    args = parser.parse_args()
+    client = create_client(args.base_url)
+    settings_manager = SettingsManager()
+
+    try:
+        if args.command == "submit":
+            submit(client, settings_manager, args.folder)
+            return 0
+
+        batch_ids = [args.batch_id] if args.batch_id else pending_batch_ids()
+        if not batch_ids:
+            print("No pending batches")
+            return 0
+
+        failed = False
+        for batch_id in batch_ids:
+            if args.command == "status":
+                job = refresh_status(client, batch_id)
+                while args.wait and job["status"] not in TERMINAL_STATUSES:
+                    time.sleep(args.interval)
+                    job = refresh_status(client, batch_id)
+                counts = job.get("request_counts") or {}
+                print(f"{batch_id}: {job['status']} ({counts.get('completed', 0)}/{counts.get('total', 0)} completed, {counts.get('failed', 0)} failed)")
+            else:
+                try:
+                    ingest(client, batch_id)
+                except Exception as e:
+                    # Keep going: one broken batch must not hold back the others
+                    print(f"Batch error: failed to ingest {batch_id}: {e}")
+                    failed = True
+        return 1 if failed else 0
+    except Exception as e:
+        print(f"Batch error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""Benchmark OCR backends on a folder of captures.
+
+Each backend runs in its own subprocess so model load time and memory (RSS)
+are measured from a clean process. If the folder has a labels.jsonl (see
+generate_corpus.py), each image is read in its labeled language and the
+character error rate against the ground truth is reported too.
+
+Usage:
+    python benchmark_ocr.py ss/
+    python benchmark_ocr.py ss/ --backends easyocr easyocr_onnx easyocr_onnx_int8 --repeat 3
+    python generate_corpus.py corpus/ && python benchmark_ocr.py corpus/
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+# Backend name -> settings overrides applied to OCRProcessor
+BACKENDS = {
+    "pytesseract": {"ocr_method": "pytesseract"},
+    "easyocr": {"ocr_method": "easyocr"},
+    "easyocr_onnx": {"ocr_method": "easyocr_onnx", "onnx_quantized": False},
+    "easyocr_onnx_int8": {"ocr_method": "easyocr_onnx", "onnx_quantized": True},
+    "cascade": {"ocr_method": "cascade"},
+}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of values (nearest-rank)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def list_images(folder):
+    """Return the capture files in a folder."""
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def load_labels(folder):
+    """Return {file name: label record} from folder/labels.jsonl, or {} if there is none."""
+    path = os.path.join(folder, "labels.jsonl")
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return {record["file"]: record for record in records}
+
+
+def normalize_text(text):
+    """Collapse whitespace so line breaks and spacing differences are not counted as errors."""
+    return " ".join(text.split())
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def character_error_rate(predicted, truth):
+    """Edit distance over ground-truth length, after whitespace normalization."""
+    truth = normalize_text(truth)
+    return edit_distance(normalize_text(predicted), truth) / max(1, len(truth))
+
+
+def run_worker(backend, paths, repeat, labels=None):
+    """Run one backend over the images in this process and return its measurements.
+
+    With labels, images are grouped by language and each language gets an untimed
+    warm-up call, so switching models is not counted as OCR latency.
+    """
+    from PIL import Image
+    from core import OCRProcessor, SettingsManager
+
+    labels = labels or {}
+    settings_manager = SettingsManager()
+    for key, value in BACKENDS[backend].items():
+        settings_manager.set(key, value)
+    ocr_processor = OCRProcessor(settings_manager)
+
+    default_language = settings_manager.get("ocr_language")
+    groups = {}
+    for path in paths:
+        label = labels.get(os.path.basename(path), {})
+        image = Image.open(path).convert("RGB")
+        groups.setdefault(label.get("language", default_language), []).append((image, label.get("text")))
+    rss_before = peak_rss_mb()
+
+    load_ms = None
+    first_text = ""
+    latencies = []
+    characters = 0
+    errors = 0.0
+    truth_characters = 0
+    for language, items in groups.items():
+        settings_manager.set("ocr_language", language)
+
+        # The first call includes model loading
+        start = time.perf_counter()
+        text = ocr_processor.extract_text(items[0][0])
+        if load_ms is None:
+            load_ms = (time.perf_counter() - start) * 1000
+            first_text = text
+
+        for _ in range(repeat):
+            for image, truth in items:
+                start = time.perf_counter()
+                text = ocr_processor.extract_text(image)
+                latencies.append((time.perf_counter() - start) * 1000)
+                characters += len(text)
+                if truth is not None:
+                    truth_length = len(normalize_text(truth))
+                    errors += character_error_rate(text, truth) * truth_length
+                    truth_characters += truth_length
+
+    return {
+        "backend": backend,
+        "first_call_ms": load_ms,
+        "mean_ms": sum(latencies) / len(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "chars_per_s": characters / (sum(latencies) / 1000) if latencies else 0.0,
+        "cer": errors / truth_characters if truth_characters else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "model_rss_mb": peak_rss_mb() - rss_before,
+        "sample": first_text[:60]
+    }
+
+
+def run_in_subprocess(backend, folder, repeat):
+    """Run a backend in a fresh interpreter and parse its JSON result."""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), folder, "--worker", backend, "--repeat", str(repeat)],
+        capture_output=True,
+        text=True
+    )
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    return {"backend": backend, "error": (result.stderr or result.stdout).strip().splitlines()[-1:]}
+
+
+def print_table(results):
+    """Print the benchmark results as a table."""
+    print(
+        f"{'backend':<20}{'first ms':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'chars/s':>10}{'CER':>8}{'peak RSS':>11}{'model RSS':>11}"
+    )
+    for r in results:
+        if "error" in r:
+            print(f"{r['backend']:<20}  failed: {r['error']}")
+            continue
+        cer = f"{r['cer']:.1%}" if r["cer"] is not None else "-"
+        print(
+            f"{r['backend']:<20}{r['first_call_ms']:>10.0f}{r['mean_ms']:>10.1f}{r['p50_ms']:>10.1f}"
+            f"{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['chars_per_s']:>10.0f}{cer:>8}"
+            f"{r['peak_rss_mb']:>9.0f}MB{r['model_rss_mb']:>9.0f}MB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR backends")
+    parser.add_argument("folder", nargs="?", default="ss", help="Folder of capture images (with optional labels.jsonl)")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the images after warm-up")
+    parser.add_argument("--worker", choices=list(BACKENDS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    paths = list_images(args.folder)
+    if not paths:
+        print(f"No images found in {args.folder}")
+        return 1
+
+    labels = load_labels(args.folder)
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, paths, args.repeat, labels)))
+        return 0
+
+    labeled = ", labeled" if labels else ""
+    print(f"Benchmarking {len(paths)} images{labeled} x {args.repeat} passes")
+    results = [run_in_subprocess(backend, args.folder, args.repeat) for backend in args.backends]
+    print_table(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Benchmark lite-mode startup: time from launching main_simple.py to its first drawn frame.
+
+Each run starts a fresh interpreter, so the time includes interpreter startup and
+all imports. The app reports when its window is up and which heavy modules were
+already loaded by then; both are checked against the target.
+
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py --runs 20 --target-ms 200
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from benchmark_ocr import percentile
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main_simple.py")
+
+
+def run_once():
+    """Start the app once and return {"wall_ms", "ready_ms", "heavy_modules"} or {"error"}."""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, APP, "--startup-probe"], capture_output=True, text=True, timeout=60)
+    wall_ms = (time.perf_counter() - started) * 1000
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("{"):
+            return dict(json.loads(line), wall_ms=wall_ms)
+    return {"error": (result.stderr or result.stdout).strip().splitlines()[-1:]}
+
+
+def children_peak_rss_mb():
+    """Peak resident set size of the largest finished child process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lite-mode (main_simple.py) startup time")
+    parser.add_argument("--runs", type=int, default=10, help="Timed launches after one warm-up launch")
+    parser.add_argument("--target-ms", type=float, default=200, help="p95 time-to-window target")
+    args = parser.parse_args()
+
+    # The first launch warms the OS file cache and writes .pyc files
+    warmup = run_once()
+    if "error" in warmup:
+        print(f"main_simple.py failed to start: {warmup['error']}")
+        return 1
+
+    results = [run_once() for _ in range(args.runs)]
+    failed = [r for r in results if "error" in r]
+    results = [r for r in results if "error" not in r]
+    if not results:
+        print(f"main_simple.py failed to start: {failed[0]['error']}")
+        return 1
+
+    wall = [r["wall_ms"] for r in results]
+    ready = [r["ready_ms"] for r in results]
+    heavy = sorted({name for r in results for name in r["heavy_modules"]})
+    print(f"{'':<24}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}")
+    print(f"{'launch to window (ms)':<24}{sum(wall) / len(wall):>10.0f}{percentile(wall, 50):>10.0f}"
+          f"{percentile(wall, 95):>10.0f}{max(wall):>10.0f}")
+    print(f"{'in-process (ms)':<24}{sum(ready) / len(ready):>10.0f}{percentile(ready, 50):>10.0f}"
+          f"{percentile(ready, 95):>10.0f}{max(ready):>10.0f}")
+    print(f"Peak RSS: {children_peak_rss_mb():.0f} MB")
+    if failed:
+        print(f"{len(failed)} of {args.runs} launches failed: {failed[0]['error']}")
+    if heavy:
+        print(f"Heavy modules loaded before the window was up: {', '.join(heavy)}")
+
+    ok = percentile(wall, 95) <= args.target_ms and not heavy
+    print(f"{'PASS' if ok else 'FAIL'}: p95 {percentile(wall, 95):.0f} ms (target {args.target_ms:.0f} ms)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
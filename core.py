@@ -0,0 +1,2831 @@
+"""UI-free core of the app: settings, OCR, prompt building, provider calls and history.
+
+Importable without a display, so the command-line tools and tests can use it.
+"""
+import contextlib
+import gc
+import importlib.util
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+import requests
+import openai
+from openai import OpenAI
+
+# OCR libraries - only checked here; easyocr pulls in torch, so engines are imported on first use
+OCR_AVAILABLE = any(importlib.util.find_spec(name) for name in ("pytesseract", "easyocr", "onnxruntime"))
+if not OCR_AVAILABLE:
+    print("OCR libraries not found. Please install: pip install pytesseract easyocr")
+
+# Local tokenizer for prompt budgeting (optional)
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# Global client - will be initialized based on settings
+client = None
+
+# Global HTTP session for Ollama requests - swapped together with the client on profile switch
+http_session = requests.Session()
+
+# Settings that are stored per named provider profile
+PROFILE_KEYS = [
+    "ai_provider",
+    "openai_model",
+    "ollama_url",
+    "ollama_model",
+    "max_tokens",
+    "temperature",
+    "system_prompt",
+    "ocr_method",
+    "send_text_only",
+    "ocr_language",
+    "tesseract_psm",
+    "tesseract_oem",
+    "tessdata_dir",
+    "easyocr_min_confidence",
+    "ocr_scale",
+]
+
+
+def grab_screen(region=None):
+    """Screenshot region (x, y, width, height) in screen coordinates, or every monitor if None.
+    
+    Unlike pyautogui.screenshot, this covers all monitors, including ones left of or above the primary.
+    """
+    from PIL import ImageGrab
+    
+    bbox = None if region is None else (region[0], region[1], region[0] + region[2], region[1] + region[3])
+    return ImageGrab.grab(bbox=bbox, all_screens=True)
+
+
+class SettingsManager:
+    def __init__(self):
+        self.settings_file = "settings.json"
+        self.default_settings = {
+            "ai_provider": "openai",  # "openai" or "ollama"
+            "openai_model": "gpt-4o-mini",
+            "ollama_url": "http://localhost:11434",
+            "ollama_model": "gemma3:12b",
+            "max_tokens": 1000,
+            "temperature": 0.1,
+            "system_prompt": "You are an advanced AI assistant specializing in analyzing text extracted from images. Provide clear, accurate, and detailed answers based on the given text content. Focus on understanding the context and providing helpful responses in English with perfect grammar and contextual accuracy.",
+            "ocr_method": "pytesseract",  # "pytesseract", "easyocr", "easyocr_onnx" or "cascade" (Tesseract, escalating to EasyOCR)
+            "send_text_only": True,  # If True, send only OCR text; if False, send both text and image
+            "ocr_language": "eng",  # Language for OCR (eng, spa, fra, deu, etc.), or "auto" to detect it per capture
+            "ocr_auto_languages": ["eng", "spa", "fra", "deu", "rus", "chi_sim", "jpn", "kor"],  # Languages "auto" chooses from, preferred first
+            "ocr_detect_width": 800,  # Captures are downscaled to this width for language detection
+            "ocr_reader_pool_size": 3,  # Per-language EasyOCR/ONNX engines kept loaded (least recently used are dropped)
+            "window_transparency": 0.9,  # Window transparency (0.1 = very transparent, 1.0 = opaque)
+            "profiles": {},  # Named provider profiles: name -> {setting: value} for PROFILE_KEYS
+            "active_profile": "",  # Name of the profile currently applied ("" = none)
+            "ollama_keep_alive": "30m",  # How long Ollama keeps a model loaded after a request
+            "normalize_ocr_text": True,  # Clean up OCR noise and duplicate lines before prompting
+            "prompt_token_budget": 1500,  # Maximum tokens of OCR text sent to the AI (0 = unlimited)
+            "easyocr_min_confidence": 0.5,  # EasyOCR results below this confidence (0-1) are dropped
+            "tesseract_psm": 3,  # Tesseract page segmentation mode (3 = automatic, 4 = columns, 6 = single block, 11 = sparse text)
+            "tesseract_oem": 3,  # Tesseract engine mode (1 = LSTM only, 3 = default)
+            "tessdata_dir": "",  # Tesseract model folder, e.g. a tessdata_fast or tessdata_best checkout ("" = built-in)
+            "ocr_scale": 1.0,  # Resize captures by this factor before OCR (see tune_ocr.py)
+            "ocr_cascade_threshold": 60,  # Cascade: Tesseract lines below this confidence (0-100) go to EasyOCR
+            "ocr_incremental": False,  # Re-OCR only the parts of a region that changed since the last capture
+            "ocr_tile_gap": 8,  # Blank rows that separate text bands (tiles) in incremental OCR
+            "onnx_model_dir": "models/onnx",  # Exported EasyOCR models for "easyocr_onnx" (see export_onnx.py)
+            "onnx_quantized": False,  # Use the int8-quantized ONNX models
+            "onnx_threads": 0,  # ONNX Runtime intra-op threads (0 = one per core)
+            "reuse_mode": "off",  # Near-duplicate questions: "off", "offer" (show old answer without copying it, still ask AI) or "auto" (skip AI)
+            "reuse_similarity_threshold": 0.85,  # Minimum similarity (0-1) for reusing a previous answer
+            "openai_rpm_limit": 500,  # Client-side requests per minute per model (synced from rate-limit headers)
+            "openai_tpm_limit": 200000,  # Client-side tokens per minute per model (synced from rate-limit headers)
+            "openai_max_retries": 4,  # Retries for 429s, 5xx and connection errors, with jittered backoff
+            "ocr_idle_unload_seconds": 600,  # Unload EasyOCR/ONNX models after this long unused (0 = never)
+            "memory_rss_budget_mb": 0,  # Unload OCR models when process memory exceeds this (0 = no budget)
+            "profiler_interval_ms": 10,  # Sampling interval of the F8 profiler
+            "precapture": False,  # Capture and OCR the selected area in the background so F10 can skip OCR (costs CPU while idle)
+            "precapture_interval": 2.0,  # Seconds between background checks of the selected area
+            "ollama_session_mode": "off",  # "chat" (multi-turn /api/chat reusing the cached prefix) or "off" (stateless /api/generate)
+            "ollama_session_max_turns": 6,  # Questions kept in an Ollama chat session before trimming
+            "ollama_session_max_tokens": 3000,  # History tokens kept in an Ollama chat session before trimming
+            "question_routing": True,  # Pick model, max_tokens and prompt per question type (see QuestionRouter)
+            "ollama_urls": [],  # Extra Ollama hosts; each request goes to the least-loaded healthy host of ollama_url + these
+            "ollama_health_interval": 15,  # Seconds between /api/tags health checks of the Ollama hosts
+            "routing_rules": {},  # Per-type overrides, e.g. {"essay": {"openai_model": "gpt-4o", "max_tokens": 800, "prompt": "... {question}"}}
+            "model_catalog_ttl": 300,  # Seconds the Ollama model catalog (model_catalog.json) is used before a background refresh
+            "ollama_auto_model": False,  # Use the smallest installed model that can generate text
+            "daily_budget_usd": 0,  # Estimated OpenAI spend per day before switching to budget_fallback_model (0 = no limit)
+            "budget_fallback_model": "gpt-4o-mini",  # Cheaper OpenAI model used once the daily budget is reached
+            "model_prices": {},  # USD per million tokens, e.g. {"gpt-4o": [2.5, 10.0]}; overrides the built-in prices
+            "answer_on_select": False,  # Answer the selected area as soon as the selection is made, like F10
+            "selection_redraw_ms": 16,  # Minimum interval between selection rectangle redraws (~60 Hz)
+            "connect_timeout": 3,  # Seconds to connect to a provider before it counts as unreachable
+            "request_timeout": 60,  # Seconds to wait for a provider's answer
+            "failover_provider": "",  # "openai" or "ollama": answer with this provider while the selected one is down ("" = never)
+            "circuit_failure_threshold": 3,  # Consecutive connection errors, timeouts or 5xx before a provider's circuit opens
+            "circuit_probe_interval": 10  # Seconds between background probes of a provider whose circuit is open
+        }
+        self.settings = self.load_settings()
+    
+    def load_settings(self):
+        """Load settings from file or create default."""
+        try:
+            if os.path.exists(self.settings_file):
+                with open(self.settings_file, 'r') as f:
+                    loaded_settings = json.load(f)
+                # Merge with defaults to handle new settings
+                settings = self.default_settings.copy()
+                settings.update(loaded_settings)
+                return settings
+            else:
+                return self.default_settings.copy()
+        except Exception as e:
+            print(f"Error loading settings: {e}")
+            return self.default_settings.copy()
+    
+    def save_settings(self):
+        """Save current settings to file."""
+        try:
+            with open(self.settings_file, 'w') as f:
+                json.dump(self.settings, f, indent=2)
+            return True
+        except Exception as e:
+            print(f"Error saving settings: {e}")
+            return False
+    
+    def get(self, key):
+        """Get a setting value."""
+        return self.settings.get(key, self.default_settings.get(key))
+    
+    def set(self, key, value):
+        """Set a setting value."""
+        self.settings[key] = value
+    
+    def initialize_ai_client(self):
+        """Initialize the AI client based on current settings."""
+        global client
+        try:
+            if self.get("ai_provider") == "openai":
+                # Get API key from environment variable
+                api_key = os.getenv("OPENAI_API_KEY")
+                if api_key:
+                    client = OpenAI(api_key=api_key)
+                else:
+                    # Try to use default OpenAI client (might have API key set elsewhere)
+                    client = OpenAI()
+                return True
+            else:  # ollama
+                # For Ollama, we'll use requests directly
+                client = None
+                return True
+        except Exception as e:
+            print(f"Error initializing AI client: {e}")
+            return False
+
+
+class ProfileManager:
+    """Manage named provider profiles, each with its own warm client and connection pool."""
+
+    def __init__(self, settings_manager):
+        self.settings_manager = settings_manager
+        self.clients = {}  # profile name -> {"openai": OpenAI or None, "session": requests.Session}
+        self.lock = threading.Lock()
+
+    def get_profiles(self):
+        """Return the stored profiles as a dict of name -> settings."""
+        return self.settings_manager.get("profiles") or {}
+
+    def get_names(self):
+        """Return profile names in the order they were created."""
+        return list(self.get_profiles().keys())
+
+    def save_profile(self, name):
+        """Store the current profile-related settings under the given name."""
+        name = name.strip()
+        if not name:
+            return False
+
+        profiles = dict(self.get_profiles())
+        profiles[name] = {key: self.settings_manager.get(key) for key in PROFILE_KEYS}
+        self.settings_manager.set("profiles", profiles)
+        self.settings_manager.set("active_profile", name)
+
+        # Settings may have changed, so rebuild and re-warm the clients for this profile
+        with self.lock:
+            self.clients.pop(name, None)
+        self.warm_profile(name)
+        return self.settings_manager.save_settings()
+
+    def delete_profile(self, name):
+        """Delete a profile and close its clients."""
+        profiles = dict(self.get_profiles())
+        if name not in profiles:
+            return False
+
+        del profiles[name]
+        self.settings_manager.set("profiles", profiles)
+        if self.settings_manager.get("active_profile") == name:
+            self.settings_manager.set("active_profile", "")
+
+        with self.lock:
+            entry = self.clients.pop(name, None)
+        if entry:
+            entry["session"].close()
+        return self.settings_manager.save_settings()
+
+    def _build_clients(self, profile):
+        """Create the OpenAI client and pooled HTTP session for a profile."""
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        openai_client = None
+        if profile.get("ai_provider") == "openai":
+            api_key = os.getenv("OPENAI_API_KEY")
+            openai_client = OpenAI(api_key=api_key) if api_key else OpenAI()
+
+        return {"openai": openai_client, "session": session}
+
+    def get_clients(self, name):
+        """Return the cached clients for a profile, building them on first use."""
+        profile = self.get_profiles().get(name)
+        if profile is None:
+            return None
+
+        with self.lock:
+            if name not in self.clients:
+                self.clients[name] = self._build_clients(profile)
+            return self.clients[name]
+
+    def warm_profile(self, name):
+        """Open connections and load the model for a profile in the background."""
+        def warm():
+            try:
+                profile = self.get_profiles().get(name)
+                entry = self.get_clients(name)
+                if not profile or not entry:
+                    return
+
+                if profile.get("ai_provider") == "openai":
+                    # A cheap request establishes the TLS connection in the client's pool
+                    entry["openai"].models.retrieve(profile.get("openai_model"))
+                else:
+                    # A generate request without a prompt only loads the model into memory
+                    entry["session"].post(
+                        f"{profile.get('ollama_url')}/api/generate",
+                        json={
+                            "model": profile.get("ollama_model"),
+                            "keep_alive": self.settings_manager.get("ollama_keep_alive")
+                        },
+                        timeout=120
+                    )
+                print(f"Profile '{name}' warmed up")
+            except Exception as e:
+                print(f"Error warming profile '{name}': {e}")
+
+        threading.Thread(target=warm, daemon=True).start()
+
+    def warm_all(self):
+        """Warm up every stored profile in the background."""
+        for name in self.get_names():
+            self.warm_profile(name)
+
+    def activate(self, name):
+        """Apply a profile's settings and swap in its warm clients without reconnecting."""
+        global client, http_session
+
+        profile = self.get_profiles().get(name)
+        if profile is None:
+            return False
+
+        for key, value in profile.items():
+            self.settings_manager.set(key, value)
+        self.settings_manager.set("active_profile", name)
+
+        entry = self.get_clients(name)
+        client = entry["openai"]
+        http_session = entry["session"]
+
+        self.settings_manager.save_settings()
+        return True
+
+    def refresh_client(self):
+        """Make the global client fit the current provider without discarding warm clients.
+
+        Nothing is rebuilt if the installed client still fits; otherwise the active
+        profile's warm clients are used when that profile has the same provider.
+        """
+        global client, http_session
+
+        if self.settings_manager.get("ai_provider") != "openai":
+            return True  # Ollama requests use http_session with the URL of each request
+        api_key = os.getenv("OPENAI_API_KEY")
+        if client is not None and (not api_key or client.api_key == api_key):
+            return True
+
+        name = self.settings_manager.get("active_profile")
+        profile = self.get_profiles().get(name)
+        if profile and profile.get("ai_provider") == "openai":
+            entry = self.get_clients(name)
+            client = entry["openai"]
+            http_session = entry["session"]
+            return True
+        return self.settings_manager.initialize_ai_client()
+
+    def cycle(self):
+        """Activate the profile after the current one and return its name."""
+        names = self.get_names()
+        if not names:
+            return None
+
+        current = self.settings_manager.get("active_profile")
+        index = names.index(current) + 1 if current in names else 0
+        name = names[index % len(names)]
+        return name if self.activate(name) else None
+
+
+class OnnxOCRBackend:
+    """Run exported EasyOCR detector (CRAFT) and recognizer models on ONNX Runtime (CPU).
+    
+    Pre- and post-processing follow EasyOCR's defaults so results match the PyTorch path,
+    without importing torch into the GUI process.
+    """
+    
+    def __init__(self, model_dir, language, quantized=False, threads=0):
+        import onnxruntime as ort
+        
+        self.language = language
+        self.quantized = quantized
+        suffix = ".int8.onnx" if quantized else ".onnx"
+        detector_path = os.path.join(model_dir, f"detector{suffix}")
+        recognizer_path = os.path.join(model_dir, f"recognizer_{language}{suffix}")
+        charset_path = os.path.join(model_dir, f"charset_{language}.json")
+        for path in (detector_path, recognizer_path, charset_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        providers = ["CPUExecutionProvider"]
+        self.detector = ort.InferenceSession(detector_path, options, providers=providers)
+        self.recognizer = ort.InferenceSession(recognizer_path, options, providers=providers)
+        
+        with open(charset_path, "r", encoding="utf-8") as f:
+            # Index 0 is the CTC blank
+            self.characters = ["[blank]"] + list(json.load(f)["characters"])
+    
+    def detect(self, image, canvas_size=2560, text_threshold=0.7, link_threshold=0.4, low_text=0.4):
+        """Detect text boxes; returns a list of [left, top, right, bottom] in image coordinates."""
+        import cv2
+        import numpy as np
+        
+        img = np.asarray(image.convert("RGB"))
+        height, width = img.shape[:2]
+        
+        # Resize so the long side fits the canvas, then pad to a multiple of 32
+        ratio = min(1.0, canvas_size / max(height, width))
+        target_h, target_w = int(height * ratio), int(width * ratio)
+        resized = cv2.resize(img, (target_w, target_h), interpolation=cv2.INTER_LINEAR)
+        pad_h, pad_w = (32 - target_h % 32) % 32, (32 - target_w % 32) % 32
+        canvas = np.zeros((target_h + pad_h, target_w + pad_w, 3), dtype=np.float32)
+        canvas[:target_h, :target_w] = resized
+        
+        mean = np.array([0.485, 0.456, 0.406], dtype=np.float32) * 255.0
+        std = np.array([0.229, 0.224, 0.225], dtype=np.float32) * 255.0
+        tensor = ((canvas - mean) / std).transpose(2, 0, 1)[np.newaxis]
+        
+        output = self.detector.run(None, {self.detector.get_inputs()[0].name: tensor})[0]
+        text_map, link_map = output[0, :, :, 0], output[0, :, :, 1]
+        
+        # Connected components over text + link scores (CRAFT post-processing)
+        _, text_score = cv2.threshold(text_map, low_text, 1, 0)
+        _, link_score = cv2.threshold(link_map, link_threshold, 1, 0)
+        combined = np.clip(text_score + link_score, 0, 1).astype(np.uint8)
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(combined, connectivity=4)
+        
+        scale = 2.0 / ratio  # Score maps are half the input resolution
+        boxes = []
+        for k in range(1, count):
+            size = stats[k, cv2.CC_STAT_AREA]
+            if size < 10 or np.max(text_map[labels == k]) < text_threshold:
+                continue
+            
+            x, y = stats[k, cv2.CC_STAT_LEFT], stats[k, cv2.CC_STAT_TOP]
+            w, h = stats[k, cv2.CC_STAT_WIDTH], stats[k, cv2.CC_STAT_HEIGHT]
+            niter = int(np.sqrt(size * min(w, h) / (w * h)) * 2)
+            left, top = max(0, x - niter), max(0, y - niter)
+            right = min(text_map.shape[1], x + w + niter + 1)
+            bottom = min(text_map.shape[0], y + h + niter + 1)
+            boxes.append([
+                max(0, int(left * scale)),
+                max(0, int(top * scale)),
+                min(width, int(right * scale)),
+                min(height, int(bottom * scale))
+            ])
+        
+        return self._merge_line_boxes(boxes)
+    
+    def _merge_line_boxes(self, boxes, width_ths=0.5):
+        """Merge horizontally adjacent boxes on the same line, like EasyOCR's group_text_box."""
+        boxes = sorted(boxes, key=lambda b: ((b[1] + b[3]) / 2, b[0]))
+        lines = []
+        for box in boxes:
+            center = (box[1] + box[3]) / 2
+            height = box[3] - box[1]
+            for line in lines:
+                line_center = (line[1] + line[3]) / 2
+                line_height = line[3] - line[1]
+                same_line = abs(center - line_center) < 0.5 * min(height, line_height)
+                close = box[0] - line[2] < width_ths * max(height, line_height)
+                if same_line and close:
+                    line[:] = [min(line[0], box[0]), min(line[1], box[1]), max(line[2], box[2]), max(line[3], box[3])]
+                    break
+            else:
+                lines.append(list(box))
+        return sorted(lines, key=lambda b: (b[1], b[0]))
+    
+    def recognize(self, image, box, img_height=64):
+        """Recognize the text in one box; returns (text, confidence)."""
+        import cv2
+        import numpy as np
+        
+        gray = np.asarray(image.convert("L").crop(tuple(box)), dtype=np.float32)
+        h, w = gray.shape
+        if h == 0 or w == 0:
+            return "", 0.0
+        
+        target_w = max(img_height, int(np.ceil(img_height * w / h)))
+        resized = cv2.resize(gray, (target_w, img_height), interpolation=cv2.INTER_CUBIC)
+        tensor = ((resized / 255.0 - 0.5) / 0.5).astype(np.float32)[np.newaxis, np.newaxis]
+        
+        logits = self.recognizer.run(None, {self.recognizer.get_inputs()[0].name: tensor})[0][0]
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probs /= probs.sum(axis=1, keepdims=True)
+        indices = probs.argmax(axis=1)
+        
+        # Greedy CTC decoding: collapse repeats and drop blanks
+        chars = []
+        max_probs = []
+        previous = 0
+        for i, index in enumerate(indices):
+            if index != 0 and index != previous:
+                chars.append(self.characters[index])
+                max_probs.append(probs[i, index])
+            previous = index
+        
+        if not max_probs:
+            return "", 0.0
+        # EasyOCR's confidence: geometric-style mean of per-character probabilities
+        confidence = float(np.prod(max_probs) ** (2.0 / np.sqrt(len(max_probs))))
+        return "".join(chars), confidence
+    
+    def readtext(self, image):
+        """Detect and recognize text; returns a list of (text, confidence, box)."""
+        results = []
+        for box in self.detect(image):
+            text, confidence = self.recognize(image, box)
+            if text.strip():
+                results.append((text, confidence, box))
+        return results
+
+
+class ScriptDetector:
+    """Guess the OCR language of a capture cheaply, before the real OCR runs.
+    
+    Tesseract's orientation and script detection (OSD) on a downscaled grayscale copy
+    picks the script. No extra OCR pass runs for Latin-script text: the language is
+    told apart by stopword and diacritic counts in the text of the previous capture.
+    """
+    
+    # Tesseract OSD script name -> OCR languages written in it
+    SCRIPT_LANGUAGES = {
+        "Cyrillic": ["rus"],
+        "Han": ["chi_sim", "chi_tra", "jpn"],
+        "Japanese": ["jpn"],
+        "Katakana": ["jpn"],
+        "Hiragana": ["jpn"],
+        "Hangul": ["kor"],
+    }
+    
+    # Unicode character name prefix -> script, for text read by the quick pass
+    UNICODE_SCRIPTS = [
+        ("CYRILLIC", "Cyrillic"),
+        ("HIRAGANA", "Japanese"),
+        ("KATAKANA", "Japanese"),
+        ("HANGUL", "Hangul"),
+        ("CJK", "Han"),
+    ]
+    
+    LATIN_HINTS = {
+        "eng": ({"the", "and", "of", "is", "which", "what", "to", "in", "true", "false"}, ""),
+        "spa": ({"el", "la", "de", "que", "es", "cuál", "los", "las", "en", "y"}, "ñ¿¡"),
+        "fra": ({"le", "la", "les", "de", "est", "quelle", "des", "et", "un", "une"}, "çœèêà"),
+        "deu": ({"der", "die", "das", "und", "ist", "welcher", "wie", "nicht", "ein", "eine"}, "ßäöü"),
+        "ita": ({"il", "di", "che", "è", "qual", "quanti", "gli", "della", "e", "un"}, "ìò"),
+        "por": ({"o", "de", "que", "é", "qual", "os", "das", "do", "em", "um"}, "ãõ"),
+    }
+    
+    def __init__(self, settings_manager):
+        self.settings_manager = settings_manager
+        self.cache = OrderedDict()  # Hash of the downscaled frame -> OSD script (None for Latin or unknown)
+        self.osd_available = True  # Cleared once OSD fails for lack of osd.traineddata
+        self.latin_language = None  # Latin-script language guessed from the last OCR text
+        self.installed = {}  # tessdata_dir -> set of installed Tesseract languages
+    
+    def tesseract_config(self):
+        """Return the Tesseract command-line options for the configured tessdata folder."""
+        tessdata_dir = self.settings_manager.get("tessdata_dir")
+        return f'--tessdata-dir "{tessdata_dir}"' if tessdata_dir else ""
+    
+    def installed_languages(self):
+        """Return the installed Tesseract languages, or None if they cannot be listed."""
+        tessdata_dir = self.settings_manager.get("tessdata_dir")
+        if tessdata_dir not in self.installed:
+            try:
+                import pytesseract
+                self.installed[tessdata_dir] = set(pytesseract.get_languages(config=self.tesseract_config()))
+            except Exception as e:
+                print(f"Could not list Tesseract languages: {e}")
+                self.installed[tessdata_dir] = None
+        return self.installed[tessdata_dir]
+    
+    def candidates(self):
+        """Return the languages auto-detection may choose from, most preferred first.
+        
+        With a Tesseract-based OCR method, languages without installed traineddata are dropped.
+        """
+        candidates = list(self.settings_manager.get("ocr_auto_languages")) or ["eng"]
+        if self.settings_manager.get("ocr_method") in ("pytesseract", "cascade"):
+            installed = self.installed_languages()
+            if installed:
+                candidates = [language for language in candidates if language in installed] or ["eng"]
+        return candidates
+    
+    def detect(self, image):
+        """Return the OCR language code for an image."""
+        import hashlib
+        
+        small = image.convert("L")
+        width = self.settings_manager.get("ocr_detect_width")
+        if small.width > width:
+            small = small.resize((width, max(1, round(small.height * width / small.width))))
+        
+        digest = hashlib.blake2b(small.tobytes(), digest_size=16).digest()
+        if digest in self.cache:
+            self.cache.move_to_end(digest)
+            script = self.cache[digest]
+        else:
+            script = self._osd_script(small)
+            self.cache[digest] = script
+            while len(self.cache) > 16:
+                self.cache.popitem(last=False)
+        
+        candidates = self.candidates()
+        if script in self.SCRIPT_LANGUAGES:
+            return self._pick(self.SCRIPT_LANGUAGES[script], candidates)
+        
+        # Latin script (or OSD unavailable or unsure): the language seen in the last capture
+        latin = [language for language in candidates if language in self.LATIN_HINTS]
+        if self.latin_language in latin:
+            return self.latin_language
+        return latin[0] if latin else candidates[0]
+    
+    def observe(self, text):
+        """Learn the Latin-script language from the OCR text of a capture, for the next detect()."""
+        latin = [language for language in self.candidates() if language in self.LATIN_HINTS]
+        if latin and self.script_of_text(text) is None and re.search(r"[^\W\d_]{2}", text):
+            self.latin_language = self.guess_latin_language(text, latin)
+    
+    def _osd_script(self, small):
+        """Return Tesseract's script name for an image, or None."""
+        if not self.osd_available:
+            return None
+        try:
+            import pytesseract
+        except ImportError:
+            return None
+        try:
+            osd = pytesseract.image_to_osd(small, config=self.tesseract_config(), output_type=pytesseract.Output.DICT)
+            return osd.get("script")
+        except Exception as e:
+            missing_osd = "osd" in str(e).lower() and "traineddata" in str(e).lower()
+            if missing_osd or isinstance(e, pytesseract.TesseractNotFoundError):
+                self.osd_available = False  # Not installed; don't retry on every capture
+            return None  # Also raised when there is too little text to decide
+    
+    def _pick(self, languages, candidates):
+        """Return the first candidate among languages, else the script's default if it is installed."""
+        for language in candidates:
+            if language in languages:
+                return language
+        installed = self.installed_languages() if self.settings_manager.get("ocr_method") in ("pytesseract", "cascade") else None
+        return languages[0] if not installed or languages[0] in installed else candidates[0]
+    
+    @classmethod
+    def script_of_text(cls, text):
+        """Return the dominant non-Latin script of text, or None."""
+        counts = {}
+        for char in text:
+            if char.isalpha() and ord(char) > 0x24F:
+                name = unicodedata.name(char, "")
+                for prefix, script in cls.UNICODE_SCRIPTS:
+                    if name.startswith(prefix):
+                        counts[script] = counts.get(script, 0) + 1
+                        break
+        letters = sum(1 for char in text if char.isalpha())
+        if not counts or max(counts.values()) < letters / 3:
+            return None
+        # Kana marks Japanese even when most characters are Han
+        if counts.get("Japanese"):
+            return "Japanese"
+        return max(counts, key=counts.get)
+    
+    @classmethod
+    def guess_latin_language(cls, text, languages):
+        """Pick among Latin-script languages by stopword and diacritic counts."""
+        words = re.findall(r"[^\W\d_]+", text.lower())
+        scores = {}
+        for language in languages:
+            stopwords, diacritics = cls.LATIN_HINTS[language]
+            scores[language] = sum(word in stopwords for word in words) + 2 * sum(char in diacritics for char in text.lower())
+        return max(languages, key=lambda language: scores[language])  # Ties keep the preferred order
+
+
+class OCRError(RuntimeError):
+    """OCR could not read an image: no engine installed, missing models or an engine failure."""
+
+
+class OCRProcessor:
+    """Handle OCR text extraction from images."""
+    
+    # Map common language codes to EasyOCR format
+    EASYOCR_LANG_MAP = {
+        'eng': 'en',
+        'spa': 'es', 
+        'fra': 'fr',
+        'deu': 'de',
+        'ita': 'it',
+        'por': 'pt',
+        'rus': 'ru',
+        'chi_sim': 'ch_sim',
+        'chi_tra': 'ch_tra',
+        'jpn': 'ja',
+        'kor': 'ko'
+    }
+    
+    def __init__(self, settings_manager):
+        self.settings_manager = settings_manager
+        self.easyocr_readers = OrderedDict()  # EasyOCR language -> reader, least recently used first
+        self.onnx_backends = OrderedDict()  # (EasyOCR language, model dir, quantized, threads) -> OnnxOCRBackend
+        self.script_detector = ScriptDetector(settings_manager)
+        self.last_language = None  # Language used by the last OCR call (the detected one for "auto")
+        self.model_lock = threading.RLock()  # Held while a model runs so it is never unloaded mid-read
+        self.last_used = time.monotonic()
+        self.tile_cache = OrderedDict()  # (region, OCR config) -> {tile hash: text} for the last capture
+    
+    def extract_text(self, image):
+        """Extract text from an image using the configured OCR method; failures are returned as text."""
+        try:
+            return self.read_text(image)
+        except OCRError as e:
+            return str(e)
+    
+    def read_text(self, image):
+        """Extract text from an image using the configured OCR method; raises OCRError on failure."""
+        if not OCR_AVAILABLE:
+            raise OCRError("OCR libraries not available. Please install: pip install pytesseract easyocr")
+        
+        method = self.settings_manager.get("ocr_method")
+        
+        try:
+            image = self._scale(image)
+            language = self._resolve_language(image)
+            if method == "pytesseract":
+                text = self._extract_with_pytesseract(image, language)
+            elif method == "easyocr":
+                text = self._extract_with_easyocr(image, language)
+            elif method == "cascade":
+                text = self._extract_with_cascade(image, language)
+            elif method == "easyocr_onnx":
+                text = self._extract_with_onnx(image, language)
+            else:
+                raise OCRError(f"Unknown OCR method: {method}")
+            self._observe_language(text)
+            return text
+        except OCRError:
+            raise
+        except Exception as e:
+            raise OCRError(f"OCR extraction failed: {str(e)}")
+    
+    def _resolve_language(self, image):
+        """Return the configured OCR language, detecting it from the image for "auto"."""
+        language = self.settings_manager.get("ocr_language")
+        if language == "auto":
+            started = time.perf_counter()
+            language = self.script_detector.detect(image)
+            print(f"Detected OCR language: {language} ({(time.perf_counter() - started) * 1000:.0f} ms)")
+        self.last_language = language
+        return language
+    
+    def _observe_language(self, text):
+        """Let "auto" learn the Latin-script language from the text just read."""
+        if self.settings_manager.get("ocr_language") == "auto":
+            self.script_detector.observe(text)
+    
+    def _pooled(self, pool, key, create):
+        """Return the engine for key from an LRU pool, creating it and evicting beyond ocr_reader_pool_size."""
+        if key in pool:
+            pool.move_to_end(key)
+            return pool[key]
+        pool[key] = create()
+        while len(pool) > max(1, self.settings_manager.get("ocr_reader_pool_size")):
+            pool.popitem(last=False)
+        return pool[key]
+    
+    def _scale(self, image):
+        """Resize an image by the ocr_scale setting."""
+        scale = self.settings_manager.get("ocr_scale")
+        if scale == 1.0:
+            return image
+        from PIL import Image
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        return image.resize(size, Image.LANCZOS)
+    
+    def _tesseract_config(self):
+        """Return the Tesseract command-line options from the settings."""
+        config = f"--psm {self.settings_manager.get('tesseract_psm')} --oem {self.settings_manager.get('tesseract_oem')}"
+        tessdata_dir = self.settings_manager.get("tessdata_dir")
+        if tessdata_dir:
+            config += f' --tessdata-dir "{tessdata_dir}"'
+        return config
+    
+    def _extract_with_pytesseract(self, image, language):
+        """Extract text using pytesseract."""
+        try:
+            import pytesseract
+            # Configure language for pytesseract
+            text = pytesseract.image_to_string(image, lang=language, config=self._tesseract_config())
+            return text.strip()
+        except ImportError:
+            raise OCRError("pytesseract not installed. Please install: pip install pytesseract")
+        except Exception as e:
+            raise OCRError(f"Pytesseract error: {str(e)}")
+    
+    def _get_easyocr_reader(self, language):
+        """Return the EasyOCR reader for a language, creating it on first use."""
+        import easyocr
+        
+        easy_lang = self.EASYOCR_LANG_MAP.get(language, 'en')
+        return self._pooled(self.easyocr_readers, easy_lang, lambda: easyocr.Reader([easy_lang]))
+    
+    def _read_with_easyocr(self, image, language):
+        """Run EasyOCR and return a list of (text, confidence, box) above the confidence threshold."""
+        import numpy as np
+        
+        with self.model_lock:
+            reader = self._get_easyocr_reader(language)
+            results = reader.readtext(np.array(image))
+            self.last_used = time.monotonic()
+        
+        min_confidence = self.settings_manager.get("easyocr_min_confidence")
+        lines = []
+        for (bbox, text, confidence) in results:
+            if confidence > min_confidence:
+                xs = [point[0] for point in bbox]
+                ys = [point[1] for point in bbox]
+                lines.append((text, confidence, [min(xs), min(ys), max(xs), max(ys)]))
+        return lines
+    
+    def _extract_with_easyocr(self, image, language):
+        """Extract text using easyocr."""
+        try:
+            # Combine all detected text
+            text_lines = [text for (text, confidence, box) in self._read_with_easyocr(image, language)]
+            return '\n'.join(text_lines).strip()
+            
+        except ImportError:
+            raise OCRError("easyocr not installed. Please install: pip install easyocr")
+        except Exception as e:
+            raise OCRError(f"EasyOCR error: {str(e)}")
+    
+    def _get_onnx_backend(self, language):
+        """Return the ONNX Runtime backend for a language, creating it on first use."""
+        easy_lang = self.EASYOCR_LANG_MAP.get(language, 'en')
+        model_dir = self.settings_manager.get("onnx_model_dir")
+        quantized = self.settings_manager.get("onnx_quantized")
+        threads = self.settings_manager.get("onnx_threads")
+        # Keyed by everything the backend is built from, so changed settings never reuse a stale one
+        return self._pooled(self.onnx_backends, (easy_lang, model_dir, quantized, threads), lambda: OnnxOCRBackend(
+            model_dir,
+            easy_lang,
+            quantized=quantized,
+            threads=threads
+        ))
+    
+    def models_loaded(self):
+        """Return True if an EasyOCR reader or ONNX session is resident."""
+        return bool(self.easyocr_readers or self.onnx_backends)
+    
+    def unload_models(self):
+        """Drop the EasyOCR reader and ONNX sessions; they are rebuilt on the next capture.
+        
+        Returns False without unloading while OCR is running.
+        """
+        if not self.model_lock.acquire(blocking=False):
+            return False
+        try:
+            unloaded = self.models_loaded()
+            self.easyocr_readers.clear()
+            self.onnx_backends.clear()
+            return unloaded
+        finally:
+            self.model_lock.release()
+    
+    def _read_with_onnx(self, image, language):
+        """Run the ONNX EasyOCR models and return (text, confidence, box) above the confidence threshold."""
+        min_confidence = self.settings_manager.get("easyocr_min_confidence")
+        with self.model_lock:
+            results = self._get_onnx_backend(language).readtext(image)
+            self.last_used = time.monotonic()
+        return [(text, confidence, box) for (text, confidence, box) in results if confidence > min_confidence]
+    
+    def _extract_with_onnx(self, image, language):
+        """Extract text using the EasyOCR models under ONNX Runtime."""
+        try:
+            text_lines = [text for (text, confidence, box) in self._read_with_onnx(image, language)]
+            return '\n'.join(text_lines).strip()
+        except ImportError:
+            raise OCRError("ONNX OCR requires onnxruntime and opencv. Please install: pip install onnxruntime opencv-python-headless")
+        except FileNotFoundError as e:
+            raise OCRError(f"ONNX models not found ({e}). Export them first: python export_onnx.py")
+        except Exception as e:
+            raise OCRError(f"ONNX OCR error: {str(e)}")
+    
+    def _read_tesseract_lines(self, image, language):
+        """Run Tesseract and group words into lines with their mean confidence and bounding box."""
+        import pytesseract
+        
+        data = pytesseract.image_to_data(
+            image, lang=language, config=self._tesseract_config(), output_type=pytesseract.Output.DICT
+        )
+        
+        lines = {}  # (block, paragraph, line) -> line info, in reading order
+        for i, word in enumerate(data["text"]):
+            confidence = float(data["conf"][i])
+            if confidence < 0 or not word.strip():
+                continue
+            
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            left, top = data["left"][i], data["top"][i]
+            right, bottom = left + data["width"][i], top + data["height"][i]
+            
+            if key not in lines:
+                lines[key] = {"words": [], "confidences": [], "box": [left, top, right, bottom]}
+            line = lines[key]
+            line["words"].append(word)
+            line["confidences"].append(confidence)
+            box = line["box"]
+            line["box"] = [min(box[0], left), min(box[1], top), max(box[2], right), max(box[3], bottom)]
+        
+        return [
+            {
+                "text": " ".join(line["words"]),
+                "confidence": sum(line["confidences"]) / len(line["confidences"]),
+                "min_confidence": min(line["confidences"]),
+                "box": line["box"]
+            }
+            for line in lines.values()
+        ]
+    
+    def _read_cascade_lines(self, image, language):
+        """Read lines with Tesseract and re-read only low-confidence lines with EasyOCR.
+        
+        If EasyOCR is missing or fails, the Tesseract text is kept for the remaining lines.
+        """
+        lines = self._read_tesseract_lines(image, language)
+        threshold = self.settings_manager.get("ocr_cascade_threshold")
+        padding = 4
+        escalated = 0
+        
+        for line in lines:
+            # Escalate weak lines, and lines with a single clearly misread word
+            if line["confidence"] < threshold or line["min_confidence"] < threshold / 2:
+                # Re-read just this line's crop with the slower, more accurate engine
+                left, top, right, bottom = line["box"]
+                crop = image.crop((
+                    max(0, left - padding),
+                    max(0, top - padding),
+                    min(image.width, right + padding),
+                    min(image.height, bottom + padding)
+                ))
+                try:
+                    results = self._read_with_easyocr(crop, language)
+                except Exception as e:
+                    print(f"OCR cascade: EasyOCR unavailable ({e.__class__.__name__}: {e}), keeping Tesseract text")
+                    break
+                if results:
+                    easy_confidence = sum(conf for _, conf, _ in results) / len(results)
+                    if easy_confidence * 100 > line["confidence"]:
+                        line["text"] = " ".join(text for text, _, _ in results)
+                escalated += 1
+        
+        print(f"OCR cascade: {escalated}/{len(lines)} lines escalated to EasyOCR")
+        return lines
+    
+    def _extract_with_cascade(self, image, language):
+        """Extract text with Tesseract, escalating low-confidence lines to EasyOCR."""
+        try:
+            lines = self._read_cascade_lines(image, language)
+            return '\n'.join(line["text"] for line in lines).strip()
+            
+        except ImportError:
+            raise OCRError("Cascade OCR requires pytesseract and easyocr. Please install: pip install pytesseract easyocr")
+        except Exception as e:
+            raise OCRError(f"Cascade OCR error: {str(e)}")
+    
+    def _read_lines(self, image, language):
+        """Return OCR lines as (text, vertical center) using the configured method."""
+        method = self.settings_manager.get("ocr_method")
+        if method == "easyocr":
+            return [(text, (box[1] + box[3]) / 2) for (text, confidence, box) in self._read_with_easyocr(image, language)]
+        elif method == "easyocr_onnx":
+            return [(text, (box[1] + box[3]) / 2) for (text, confidence, box) in self._read_with_onnx(image, language)]
+        elif method == "cascade":
+            lines = self._read_cascade_lines(image, language)
+        else:
+            lines = self._read_tesseract_lines(image, language)
+        return [(line["text"], (line["box"][1] + line["box"][3]) / 2) for line in lines]
+    
+    # Settings that change the text read from the same pixels
+    CONFIG_KEYS = [
+        "ocr_method", "ocr_language", "ocr_scale", "tesseract_psm", "tesseract_oem", "tessdata_dir",
+        "easyocr_min_confidence", "ocr_cascade_threshold", "onnx_model_dir", "onnx_quantized"
+    ]
+    
+    def config_key(self):
+        """Return the OCR settings as a hashable key, so cached text is never reused across engines or languages."""
+        return tuple(self.settings_manager.get(key) for key in self.CONFIG_KEYS)
+    
+    def _split_text_bands(self, gray):
+        """Split a grayscale frame into horizontal bands of text separated by blank rows.
+        
+        Returns a list of (top, bottom) row ranges.
+        """
+        import numpy as np
+        
+        background = int(np.median(gray))
+        ink_rows = (np.abs(gray.astype(np.int16) - background) > 40).any(axis=1)
+        min_gap = self.settings_manager.get("ocr_tile_gap")
+        padding = 2
+        
+        bands = []
+        rows = np.flatnonzero(ink_rows)
+        if len(rows) == 0:
+            return bands
+        
+        # Group ink rows into bands, merging bands closer than min_gap rows
+        start = previous = rows[0]
+        for row in rows[1:]:
+            if row - previous > min_gap:
+                bands.append((start, previous + 1))
+                start = row
+            previous = row
+        bands.append((start, previous + 1))
+        
+        height = gray.shape[0]
+        return [(max(0, top - padding), min(height, bottom + padding)) for top, bottom in bands]
+    
+    def extract_text_incremental(self, image, region_key):
+        """Extract text, re-running OCR only on the bands that changed since the last capture of this region.
+        
+        The frame is split into text bands (tiles spanning the full width). Bands whose pixels
+        match the previous frame reuse their cached text; all changed bands are stacked into a
+        single image and read in one OCR call, so the cost follows the changed area.
+        Cached text is keyed by region and OCR configuration. The model lock is held
+        throughout because Precapture and F10 can call this at the same time.
+        """
+        if not OCR_AVAILABLE:
+            return self.extract_text(image)
+        
+        with self.model_lock:
+            return self._extract_incremental(image, (region_key, self.config_key()))
+    
+    def _extract_incremental(self, image, cache_key):
+        """Body of extract_text_incremental; the caller holds model_lock."""
+        try:
+            import hashlib
+            import numpy as np
+            from PIL import Image
+            
+            rgb = self._scale(image).convert("RGB")
+            language = self._resolve_language(rgb)  # From the whole frame; a changed band alone may be just "3/10"
+            pixels = np.asarray(rgb)
+            gray = np.asarray(rgb.convert("L"))
+            background = tuple(int(v) for v in np.median(pixels.reshape(-1, 3), axis=0))
+            
+            bands = []
+            for top, bottom in self._split_text_bands(gray):
+                digest = hashlib.blake2b(pixels[top:bottom].tobytes(), digest_size=16).digest()
+                bands.append({"top": top, "bottom": bottom, "hash": digest})
+            
+            previous = self.tile_cache.get(cache_key, {})
+            dirty = []
+            for band in bands:
+                if band["hash"] not in previous and band["hash"] not in (d["hash"] for d in dirty):
+                    dirty.append(band)
+            
+            new_texts = {}
+            if dirty:
+                # Stack all changed bands into one image separated by blank gaps
+                gap = 12
+                height = sum(band["bottom"] - band["top"] for band in dirty) + gap * (len(dirty) + 1)
+                composite = Image.new("RGB", (rgb.width, height), background)
+                offsets = []
+                y = gap
+                for band in dirty:
+                    composite.paste(rgb.crop((0, band["top"], rgb.width, band["bottom"])), (0, y))
+                    offsets.append((y, y + band["bottom"] - band["top"], band["hash"]))
+                    y += band["bottom"] - band["top"] + gap
+                
+                # Assign each recognized line back to the band it came from
+                band_lines = {digest: [] for _, _, digest in offsets}
+                for text, center in self._read_lines(composite, language):
+                    for top, bottom, digest in offsets:
+                        if top - gap / 2 <= center < bottom + gap / 2:
+                            band_lines[digest].append(text)
+                            break
+                new_texts = {digest: "\n".join(lines) for digest, lines in band_lines.items()}
+            
+            texts = {}
+            for band in bands:
+                texts[band["hash"]] = new_texts.get(band["hash"], previous.get(band["hash"], ""))
+            
+            # Keep only the current frame's tiles so the cache stays bounded
+            self.tile_cache[cache_key] = texts
+            self.tile_cache.move_to_end(cache_key)
+            while len(self.tile_cache) > 4:
+                self.tile_cache.popitem(last=False)
+            
+            print(f"Incremental OCR: {len(dirty)}/{len(bands)} tiles re-read")
+            text = "\n".join(texts[band["hash"]] for band in bands if texts[band["hash"]]).strip()
+            self._observe_language(text)
+            return text
+            
+        except ImportError:
+            return self.extract_text(image)
+        except Exception as e:
+            return f"Incremental OCR error: {str(e)}"
+
+
+class MemoryManager:
+    """Unload idle OCR models and trim allocator caches to keep the process RSS down."""
+    
+    def __init__(self, settings_manager, ocr_processor, on_update=None, interval=15.0):
+        self.settings_manager = settings_manager
+        self.ocr_processor = ocr_processor
+        self.on_update = on_update  # Called with the current RSS in MB after every check
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    @staticmethod
+    def current_rss_mb():
+        """Return the current resident set size in MB, or None if it cannot be read."""
+        try:
+            with open("/proc/self/statm") as f:
+                pages = int(f.read().split()[1])
+            return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        except (OSError, ValueError, AttributeError):
+            pass
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss / (1024 * 1024)
+        except ImportError:
+            return None
+    
+    @staticmethod
+    def trim():
+        """Hand freed memory back to the OS: collect garbage, empty torch caches, trim the C heap."""
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        try:
+            import ctypes
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass  # Not glibc
+    
+    def check(self):
+        """Unload the OCR models if they sat idle too long or RSS is over budget; return the RSS."""
+        rss = self.current_rss_mb()
+        if self.ocr_processor.models_loaded():
+            idle_limit = self.settings_manager.get("ocr_idle_unload_seconds")
+            budget = self.settings_manager.get("memory_rss_budget_mb")
+            idle = time.monotonic() - self.ocr_processor.last_used
+            
+            reason = None
+            if idle_limit and idle >= idle_limit:
+                reason = f"idle for {idle:.0f}s"
+            elif budget and rss and rss > budget:
+                reason = f"RSS {rss:.0f}MB over the {budget}MB budget"
+            
+            if reason and self.ocr_processor.unload_models():
+                self.trim()
+                before, rss = rss, self.current_rss_mb()
+                if before and rss:
+                    print(f"Unloaded OCR models ({reason}): RSS {before:.0f}MB -> {rss:.0f}MB")
+        
+        if self.on_update:
+            self.on_update(rss)
+        return rss
+    
+    def _run(self):
+        """Check periodically until stopped."""
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Memory check failed: {e}")
+    
+    def start(self):
+        """Start the background checks."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+    
+    def stop(self):
+        """Stop the background checks."""
+        self.stop_event.set()
+
+
+class Precapture:
+    """Capture and OCR the selected region in the background so F10 can skip OCR if nothing changed."""
+    
+    def __init__(self, settings_manager, ocr_processor):
+        self.settings_manager = settings_manager
+        self.ocr_processor = ocr_processor
+        self.lock = threading.Lock()
+        self.region = None
+        self.frame_hash = None  # Hash of the newest frame seen for region
+        self.text = None  # OCR text of frame_hash once ready is set
+        self.ready = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    @staticmethod
+    def hash_frame(image):
+        """Return a cheap exact hash of a frame's pixels."""
+        import hashlib
+        return hashlib.blake2b(image.tobytes(), digest_size=16).digest()
+    
+    def ocr(self, image, region, background=False):
+        """Run OCR the same way an F10 capture does.
+        
+        The model lock keeps background passes and F10 from using the OCR engines and
+        tile cache at the same time. Background passes do not count as use, so idle
+        models can still be unloaded.
+        """
+        with self.ocr_processor.model_lock:
+            last_used = self.ocr_processor.last_used
+            if self.settings_manager.get("ocr_incremental"):
+                text = self.ocr_processor.extract_text_incremental(image, region)
+            else:
+                text = self.ocr_processor.extract_text(image)
+            if background:
+                self.ocr_processor.last_used = last_used
+            return text
+    
+    def models_idle(self):
+        """Return True if a background pass would reload OCR models that were unloaded as idle."""
+        return self.settings_manager.get("ocr_method") != "pytesseract" and not self.ocr_processor.models_loaded()
+    
+    def start(self, region, image=None):
+        """Start keeping region warm, replacing any previous region.
+        
+        image is an already captured frame of region (e.g. cropped from the selection
+        overlay); it is OCR'd first instead of grabbing the screen again.
+        """
+        self.stop()
+        digest = self.hash_frame(image) if image is not None else None
+        with self.lock:
+            self.region = region
+            self.frame_hash = digest
+            self.text = None
+            self.ready.clear()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(region, self.stop_event, image, digest), daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop the background captures (an OCR already running finishes on its own)."""
+        self.stop_event.set()
+    
+    def _run(self, region, stop_event, first_image=None, first_digest=None):
+        """Re-capture periodically and OCR only frames whose hash changed."""
+        if first_image is not None:
+            try:
+                self.store(region, first_digest, self.ocr(first_image, region))
+            except Exception as e:
+                print(f"Pre-capture failed: {e}")
+            stop_event.wait(self.settings_manager.get("precapture_interval"))
+        
+        while not stop_event.is_set():
+            if self.models_idle():
+                stop_event.wait(self.settings_manager.get("precapture_interval"))
+                continue
+            try:
+                image = grab_screen(region)
+                digest = self.hash_frame(image)
+                if digest != self.frame_hash:
+                    with self.lock:
+                        if self.region != region:
+                            return
+                        self.frame_hash = digest
+                        self.text = None
+                        self.ready.clear()
+                    self.store(region, digest, self.ocr(image, region, background=True))
+            except Exception as e:
+                print(f"Pre-capture failed: {e}")
+            stop_event.wait(self.settings_manager.get("precapture_interval"))
+    
+    def store(self, region, digest, text, newest=False):
+        """Remember the OCR text of a frame.
+        
+        Background results are dropped if a newer frame was seen meanwhile; newest=True
+        (a frame just captured by F10) always wins.
+        """
+        with self.lock:
+            if self.region != region or (not newest and self.frame_hash != digest):
+                return
+            self.frame_hash = digest
+            self.text = text
+            self.ready.set()
+    
+    def lookup(self, region, digest, timeout=30.0):
+        """Return the pre-computed text for a frame hash, or None if the frame differs.
+        
+        If the background OCR of this very frame is still running, wait for it
+        instead of starting a second OCR.
+        """
+        with self.lock:
+            if region != self.region or digest != self.frame_hash:
+                return None
+        if not self.ready.wait(timeout):
+            return None
+        with self.lock:
+            return self.text if self.frame_hash == digest else None
+
+
+class PromptBuilder:
+    """Normalize OCR text and fit it into a token budget before it is sent to the AI."""
+    
+    # Lines that are typical UI chrome around a question and carry no content (only dropped at the edges)
+    UI_CHROME_PATTERNS = [
+        r"^(next|previous|prev|back|submit|skip|menu|home|help|close|cancel|ok|search|log ?out|sign ?in|save|continue|finish)$",
+        r"^(page|question)?\s*\d+\s*(/|of)\s*\d+$",  # Page / question counters
+        r"^\d{1,2}:\d{2}(:\d{2})?\s*([ap]\.?m\.?)?$",  # Clock / timer
+        r"^[\W_]+$",  # Only symbols, bullets or box-drawing noise
+    ]
+    
+    # Answer option markers: "A)", "b.", "(3)", "○ ..."
+    OPTION_RE = re.compile(r"^(\(?[A-Ha-h1-9][).:]|[○●◯◉☐☑☒□■•▪]\s)")
+    
+    def __init__(self, settings_manager):
+        self.settings_manager = settings_manager
+        self.chrome_regex = re.compile("|".join(f"(?:{p})" for p in self.UI_CHROME_PATTERNS), re.IGNORECASE)
+        self.encoders = {}  # model name -> tiktoken encoding
+        self.stats_lock = threading.Lock()
+        self.total_requests = 0
+        self.total_tokens_saved = 0
+    
+    def normalize(self, text):
+        """Normalize OCR output: unify characters, collapse whitespace, drop chrome and duplicates."""
+        text = unicodedata.normalize("NFKC", text)
+        text = text.replace("\u2018", "'").replace("\u2019", "'").replace("\u201c", '"').replace("\u201d", '"')
+        
+        # Join words hyphenated across line breaks
+        text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+        
+        lines = [re.sub(r"[ \t\f\v]+", " ", line).strip() for line in text.splitlines()]
+        lines = [line for line in lines if line]
+        
+        # Chrome is only dropped at the top and bottom of the capture: "OK" or "?" between them may
+        # be an answer option, and so may a bottom run that follows the question or another option
+        start, end = 0, len(lines)
+        while start < end and self.chrome_regex.match(lines[start]):
+            start += 1
+        bottom = end
+        while bottom > start and self.chrome_regex.match(lines[bottom - 1]):
+            bottom -= 1
+        if bottom == start or not (lines[bottom - 1].endswith(("?", ":")) or self.OPTION_RE.match(lines[bottom - 1])):
+            end = bottom
+        
+        kept = []
+        seen = set()
+        for line in lines[start:end]:
+            # Drop repeated lines (OCR often reads sticky headers and footers twice)
+            key = line.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append(line)
+        
+        return "\n".join(kept)
+    
+    def get_encoder(self, model):
+        """Return a tiktoken encoder for the model, or None if tiktoken or its encoding is unavailable."""
+        if not TIKTOKEN_AVAILABLE:
+            return None
+        
+        if model not in self.encoders:
+            try:
+                try:
+                    encoder = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    # Unknown (e.g. Ollama) models: a modern BPE vocabulary is a close estimate
+                    encoder = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                # Encodings are downloaded on first use; offline, fall back to the estimate
+                print(f"tiktoken encoding for {model} unavailable ({e}); estimating tokens")
+                encoder = None
+            self.encoders[model] = encoder
+        return self.encoders[model]
+    
+    def count_tokens(self, text, model):
+        """Count tokens locally, falling back to a ~4 characters per token estimate."""
+        encoder = self.get_encoder(model)
+        if encoder is None:
+            return (len(text) + 3) // 4
+        return len(encoder.encode(text))
+    
+    def trim_to_budget(self, text, model, budget):
+        """Trim text to the token budget, keeping the beginning and the end of the capture."""
+        if budget <= 0 or self.count_tokens(text, model) <= budget:
+            return text
+        
+        # Keep both ends: captures usually start with the question and end with the answer options
+        head_budget = budget // 2
+        tail_budget = budget - head_budget
+        encoder = self.get_encoder(model)
+        if encoder is None:
+            head, tail = text[:head_budget * 4], text[-tail_budget * 4:]
+        else:
+            tokens = encoder.encode(text)
+            head, tail = encoder.decode(tokens[:head_budget]), encoder.decode(tokens[-tail_budget:])
+        return f"{head}\n...\n{tail}"
+    
+    def build(self, text, model):
+        """Return (prompt_text, stats) for the OCR text and count the tokens saved.
+        
+        AIService stores the stats with each request's usage record.
+        """
+        raw_tokens = self.count_tokens(text, model)
+        
+        prompt_text = text
+        if self.settings_manager.get("normalize_ocr_text"):
+            prompt_text = self.normalize(prompt_text)
+        prompt_text = self.trim_to_budget(prompt_text, model, self.settings_manager.get("prompt_token_budget"))
+        
+        prompt_tokens = self.count_tokens(prompt_text, model)
+        saved = max(0, raw_tokens - prompt_tokens)
+        with self.stats_lock:
+            self.total_requests += 1
+            self.total_tokens_saved += saved
+        
+        return prompt_text, {"raw_tokens": raw_tokens, "prompt_tokens": prompt_tokens, "tokens_saved": saved}
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills continuously up to its capacity."""
+    
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self):
+        """Add the tokens accumulated since the last update (lock must be held)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+    
+    def acquire(self, amount=1):
+        """Block until amount tokens are available, then take them."""
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.refill_per_second
+            time.sleep(min(wait, 1.0))
+    
+    def sync(self, remaining, limit=None):
+        """Align the bucket with the server's view of the remaining quota."""
+        with self.lock:
+            self._refill()
+            if limit:
+                # Learn the real limit (requests or tokens per minute) from the headers
+                self.capacity = float(limit)
+                self.refill_per_second = float(limit) / 60.0
+            self.tokens = min(self.tokens, float(remaining))
+    
+    def refund(self, amount):
+        """Return unused tokens, e.g. when a request used fewer tokens than reserved."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + max(0.0, float(amount)))
+    
+    def available(self):
+        """Return the tokens currently available."""
+        with self.lock:
+            self._refill()
+            return self.tokens
+
+
+class RateLimiter:
+    """Per-model client-side request and token limits for OpenAI with 429-aware retries."""
+    
+    RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+    
+    def __init__(self, settings_manager):
+        self.settings_manager = settings_manager
+        self.buckets = {}  # model -> {"requests": TokenBucket, "tokens": TokenBucket}
+        self.paused_until = {}  # model -> monotonic time until which no request is sent
+        self.lock = threading.Lock()
+    
+    def get_buckets(self, model):
+        """Return the request and token buckets for a model, creating them from the settings."""
+        with self.lock:
+            if model not in self.buckets:
+                rpm = self.settings_manager.get("openai_rpm_limit")
+                tpm = self.settings_manager.get("openai_tpm_limit")
+                self.buckets[model] = {
+                    "requests": TokenBucket(rpm, rpm / 60.0),
+                    "tokens": TokenBucket(tpm, tpm / 60.0)
+                }
+            return self.buckets[model]
+    
+    def acquire(self, model, tokens):
+        """Wait for any server-requested pause, then for request and token capacity."""
+        pause = self.paused_until.get(model, 0) - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+        buckets = self.get_buckets(model)
+        buckets["requests"].acquire(1)
+        buckets["tokens"].acquire(tokens)
+    
+    @staticmethod
+    def parse_duration(value):
+        """Parse OpenAI reset durations like "1s", "6m0s" or "20ms" into seconds."""
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+        return sum(float(number) * units[unit] for number, unit in parts) if parts else None
+    
+    def update_from_headers(self, model, headers):
+        """Sync the buckets with the x-ratelimit-* response headers."""
+        buckets = self.get_buckets(model)
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            buckets[kind].sync(float(remaining), float(limit) if limit else None)
+            
+            # Out of quota: hold further requests until the window resets
+            reset = self.parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if float(remaining) <= 0 and reset:
+                self.pause(model, reset)
+    
+    def pause(self, model, seconds):
+        """Hold all requests for a model for the given number of seconds."""
+        with self.lock:
+            until = time.monotonic() + seconds
+            self.paused_until[model] = max(self.paused_until.get(model, 0), until)
+    
+    def retry_delay(self, error, attempt):
+        """Return the delay before the next attempt: Retry-After if given, else jittered backoff."""
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after_ms = response.headers.get("retry-after-ms")
+            if retry_after_ms:
+                return float(retry_after_ms) / 1000
+            retry_after = self.parse_duration(response.headers.get("retry-after"))
+            if retry_after is not None:
+                return retry_after
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(30.0, 0.5 * (2 ** attempt)))
+    
+    def is_retryable(self, error):
+        """Return True for rate limits, transient server errors and connection problems."""
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code in self.RETRYABLE_STATUS
+    
+    def call(self, model, tokens, request, on_retry=None):
+        """Run request() under the limits, retrying transient failures.
+        
+        request must return a raw response (client.chat.completions.with_raw_response.create);
+        the parsed response is returned.
+        """
+        max_retries = self.settings_manager.get("openai_max_retries")
+        for attempt in range(max_retries + 1):
+            self.acquire(model, tokens)
+            try:
+                raw = request()
+                response = raw.parse()
+                usage = getattr(response, "usage", None)
+                if usage is not None and usage.total_tokens < tokens:
+                    self.get_buckets(model)["tokens"].refund(tokens - usage.total_tokens)
+                self.update_from_headers(model, raw.headers)
+                return response
+            except Exception as e:
+                if not self.is_retryable(e) or attempt == max_retries:
+                    raise
+                response = getattr(e, "response", None)
+                if response is not None:
+                    self.update_from_headers(model, response.headers)
+                delay = self.retry_delay(e, attempt)
+                if isinstance(e, openai.RateLimitError):
+                    self.pause(model, delay)
+                if on_retry:
+                    on_retry(attempt + 1, delay, e)
+                time.sleep(delay)
+    
+    def quota_text(self, model):
+        """Return a short description of the remaining quota for the status bar."""
+        buckets = self.get_buckets(model)
+        requests_left = buckets["requests"].available()
+        tokens_left = buckets["tokens"].available()
+        return f"📊 {model}: {requests_left:.0f}/{buckets['requests'].capacity:.0f} req · {tokens_left / 1000:.0f}k/{buckets['tokens'].capacity / 1000:.0f}k tok"
+
+
+class QuestionRouter:
+    """Classify a question with fast heuristics and pick its model, token budget and prompt.
+    
+    Routing decisions are appended to routing_log.jsonl so token savings can be measured.
+    """
+    
+    DEFAULT_PROMPT = "Please answer the question and keep short: {question}"
+    
+    # Question type -> rule; an empty model means the configured openai_model / ollama_model
+    DEFAULT_RULES = {
+        "true_false": {"max_tokens": 48, "prompt": "Answer with True or False and at most one short sentence of reason:\n\n{question}"},
+        "multiple_choice": {"max_tokens": 48, "prompt": "Answer with the letter and text of the correct option only:\n\n{question}"},
+        "short_answer": {"max_tokens": 150, "prompt": DEFAULT_PROMPT},
+        "math": {"max_tokens": 400, "prompt": "Solve briefly, showing only the key steps, and end with the final answer:\n\n{question}"},
+        "code": {"max_tokens": 600, "prompt": "Answer the programming question concisely; include code only if needed:\n\n{question}"},
+        "essay": {"max_tokens": 1000, "prompt": "Please answer the question: {question}"},
+    }
+    
+    OPTION_RE = re.compile(r"^\s*(?:\(?[A-Ha-h][\).:]|\(?[1-8]\)|[○◯●□☐■◻])\s*\S", re.MULTILINE)
+    TRUE_FALSE_RE = re.compile(r"\btrue\s*(?:/|or|-)\s*false\b|\bT\s*/\s*F\b|^\s*(?:\(?[a-b][\).:])?\s*(?:true|false)\s*$", re.IGNORECASE | re.MULTILINE)
+    CODE_RE = re.compile(
+        r"^\s*(?:def |class |import |from \S+ import|#include|public |private |function\b|return\b|for\s*\(|if\s*\(|while\s*\()"
+        r"|[;{}]\s*$|=>|->|::|\bprint\(|console\.log|System\.out|\bSELECT\b.+\bFROM\b",
+        re.MULTILINE
+    )
+    # "/" and "-" only count inside a longer expression, so counters ("3/10") and dates ("12/05") are not math
+    MATH_RE = re.compile(r"\d\s*[+*×÷^=<>≤≥]\s*\(?\d|\d\s*[-/]\s*\(?\d+\)?\s*[+*×÷^=<>≤≥]\s*\(?\d|[√∫∑π∞≈]|\b(?:solve|calculate|compute|evaluate|simplify|derivative|integral|equation)\b|\b[a-z]\s*[=^]\s*\d", re.IGNORECASE)
+    ESSAY_RE = re.compile(
+        r"\b(?:explain|discuss|describe|compare|contrast|analy[sz]e|justify|argue|essay|in your own words|elaborate|critically|why do you think)\b|\b\d{2,4}\s*words\b",
+        re.IGNORECASE
+    )
+    
+    def __init__(self, settings_manager, log_path="routing_log.jsonl"):
+        self.settings_manager = settings_manager
+        self.log_path = log_path
+        self.lock = threading.Lock()
+    
+    def classify(self, text):
+        """Return (question_type, signals) for OCR text."""
+        text = text or ""
+        lines = [line for line in text.splitlines() if line.strip()]
+        signals = {
+            "options": len(self.OPTION_RE.findall(text)),
+            "true_false": len(self.TRUE_FALSE_RE.findall(text)),
+            "code_lines": sum(1 for line in lines if self.CODE_RE.search(line)),
+            "math": len(self.MATH_RE.findall(text)),
+            "essay": len(self.ESSAY_RE.findall(text)),
+            "words": len(text.split())
+        }
+        
+        if signals["true_false"]:
+            question_type = "true_false"
+        elif signals["options"] >= 2:
+            question_type = "multiple_choice"
+        elif signals["code_lines"] >= 2:
+            question_type = "code"
+        elif signals["math"] >= 1 and signals["essay"] == 0:
+            question_type = "math"
+        elif signals["essay"] or signals["words"] > 80:
+            question_type = "essay"
+        else:
+            question_type = "short_answer"
+        return question_type, signals
+    
+    def route(self, text, provider):
+        """Return the routing decision for a question: type, model, max_tokens and prompt template."""
+        default_model = self.settings_manager.get(f"{provider}_model")
+        default_max_tokens = self.settings_manager.get("max_tokens")
+        if not self.settings_manager.get("question_routing"):
+            return {"type": None, "signals": {}, "model": default_model, "max_tokens": default_max_tokens, "prompt": None}
+        
+        question_type, signals = self.classify(text)
+        rule = dict(self.DEFAULT_RULES[question_type])
+        rule.update(self.settings_manager.get("routing_rules").get(question_type, {}))
+        return {
+            "type": question_type,
+            "signals": signals,
+            "model": rule.get(f"{provider}_model") or default_model,
+            "max_tokens": rule.get("max_tokens") or default_max_tokens,
+            "prompt": rule.get("prompt") or self.DEFAULT_PROMPT
+        }
+    
+    @staticmethod
+    def render(route, question, fallback):
+        """Fill a route's prompt template (or the fallback when routing is off) with the question."""
+        return (route["prompt"] or fallback).replace("{question}", question)
+    
+    def log(self, route, provider, prompt_tokens=None, completion_tokens=None, latency_ms=None, prompt_stats=None):
+        """Append a routing decision and its outcome to the routing log."""
+        if route["type"] is None:
+            return
+        record = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "provider": provider,
+            "type": route["type"],
+            "signals": route["signals"],
+            "model": route["model"],
+            "default_model": self.settings_manager.get(f"{provider}_model"),
+            "max_tokens": route["max_tokens"],
+            "default_max_tokens": self.settings_manager.get("max_tokens"),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms": round(latency_ms) if latency_ms is not None else None,
+            "raw_tokens": (prompt_stats or {}).get("raw_tokens"),
+            "tokens_saved": (prompt_stats or {}).get("tokens_saved")
+        }
+        try:
+            with self.lock, open(self.log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"Error writing routing log: {e}")
+        print(f"Routed {route['type']} question to {route['model']} (max_tokens {route['max_tokens']})")
+
+
+class ProviderUnavailableError(RuntimeError):
+    """A provider could not be reached, answered with a server error, or its circuit is open."""
+
+
+class CircuitBreaker:
+    """Per-provider circuit breaker: closed -> open -> half-open -> closed.
+    
+    After circuit_failure_threshold consecutive outage failures the circuit opens and
+    requests fail immediately instead of waiting for timeouts. A background thread
+    probes the provider every circuit_probe_interval seconds; once a probe succeeds the
+    circuit is half-open and the next request is let through to decide whether it closes.
+    """
+    
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+    
+    def __init__(self, name, settings_manager, probe):
+        self.name = name
+        self.settings_manager = settings_manager
+        self.probe = probe  # Callable that raises if the provider is still down
+        self.state = self.CLOSED
+        self.failures = 0  # Consecutive outage failures
+        self.opened_at = None
+        self.trial_running = False  # Half-open: a request is already testing the provider
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    def allow(self):
+        """Return True if a request may be sent now."""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+    
+    def record_success(self):
+        """Close the circuit after a successful request."""
+        with self.lock:
+            if self.state != self.CLOSED:
+                print(f"{self.name} circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trial_running = False
+    
+    def record_failure(self, error):
+        """Count an outage failure; open the circuit at the threshold or when a half-open trial fails."""
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            threshold = self.settings_manager.get("circuit_failure_threshold")
+            if self.state == self.OPEN or (self.state == self.CLOSED and self.failures < threshold):
+                return
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            print(f"{self.name} circuit opened after {self.failures} failures ({error.__class__.__name__})")
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._probe_until_up, daemon=True)
+                self.thread.start()
+    
+    def _probe_until_up(self):
+        """Probe the provider until it answers, then move the circuit to half-open."""
+        while not self.stop_event.wait(self.settings_manager.get("circuit_probe_interval")):
+            try:
+                self.probe()
+            except Exception:
+                continue
+            with self.lock:
+                if self.state == self.OPEN:
+                    self.state = self.HALF_OPEN
+                    print(f"{self.name} circuit half-open: probe succeeded")
+            return
+    
+    def stop(self):
+        """Stop background probes."""
+        self.stop_event.set()
+    
+    def status_text(self):
+        """Return a short description of the circuit for the status bar."""
+        if self.state == self.OPEN:
+            return f"⚡ {self.name} unavailable for {time.monotonic() - self.opened_at:.0f}s - probing every {self.settings_manager.get('circuit_probe_interval')}s"
+        return f"⚡ {self.name} circuit {self.state}"
+
+
+class OllamaHostPool:
+    """Spread Ollama requests over several hosts.
+    
+    Each request goes to the healthy host with the lowest (outstanding requests + 1) x
+    EWMA latency. Failed requests mark a host unhealthy; background /api/tags checks
+    bring it back and record which models each host has installed. With a ModelCatalog,
+    requests carrying an image only go to hosts whose copy of the model is vision-capable.
+    """
+    
+    EWMA_ALPHA = 0.3
+    
+    def __init__(self, settings_manager, model_catalog=None):
+        self.settings_manager = settings_manager
+        self.model_catalog = model_catalog
+        self.state = {}  # url -> {"outstanding", "ewma_ms", "healthy", "models"}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    def hosts(self):
+        """Return the configured host URLs: ollama_url first, then ollama_urls."""
+        urls = [self.settings_manager.get("ollama_url")] + list(self.settings_manager.get("ollama_urls") or [])
+        hosts = []
+        for url in urls:
+            url = (url or "").strip().rstrip("/")
+            if url and url not in hosts:
+                hosts.append(url)
+        with self.lock:
+            for url in hosts:
+                self.state.setdefault(url, {"outstanding": 0, "ewma_ms": None, "healthy": True, "models": None})
+        return hosts
+    
+    def is_healthy(self, url):
+        """Return True if url is configured and not marked unhealthy."""
+        return url in self.hosts() and self.state[url]["healthy"]
+    
+    def has_vision(self, url, model):
+        """Return False if the model catalog knows url has no vision-capable copy of model.
+        
+        Hosts the catalog has not described yet stay eligible.
+        """
+        if self.model_catalog is None:
+            return True
+        models = self.model_catalog.cached(url)
+        if not models:
+            return True
+        if model is None:
+            return any(info.get("vision") for info in models.values())
+        return bool(models.get(model, {}).get("vision"))
+    
+    def pick(self, model=None, exclude=(), vision=False):
+        """Return the least-loaded healthy host, preferring hosts known to have model installed.
+        
+        With vision, hosts whose copy of model cannot read images are left out.
+        """
+        hosts = [url for url in self.hosts() if url not in exclude] or self.hosts()
+        with_vision = [url for url in hosts if self.has_vision(url, model)] if vision else hosts
+        with self.lock:
+            candidates = [url for url in hosts if self.state[url]["healthy"]] or hosts
+            if model:
+                # Hosts whose model list is unknown yet stay eligible
+                with_model = [url for url in candidates if self.state[url]["models"] is None or model in self.state[url]["models"]]
+                candidates = with_model or candidates
+            if vision:
+                candidates = [url for url in candidates if url in with_vision] or candidates
+            
+            known = [self.state[url]["ewma_ms"] for url in candidates if self.state[url]["ewma_ms"] is not None]
+            default_ms = min(known) / 2 if known else 1.0  # Untried hosts look fast so they get probed
+            
+            def score(url):
+                entry = self.state[url]
+                return (entry["outstanding"] + 1) * (entry["ewma_ms"] if entry["ewma_ms"] is not None else default_ms)
+            
+            return min(candidates, key=score)
+    
+    @contextlib.contextmanager
+    def lease(self, url):
+        """Count a request against url while it runs and record its latency or failure."""
+        with self.lock:
+            self.state[url]["outstanding"] += 1
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self.lock:
+                entry = self.state[url]
+                entry["outstanding"] -= 1
+                if ok:
+                    previous = entry["ewma_ms"]
+                    entry["ewma_ms"] = elapsed_ms if previous is None else self.EWMA_ALPHA * elapsed_ms + (1 - self.EWMA_ALPHA) * previous
+                else:
+                    entry["healthy"] = False
+    
+    def post(self, path, payload, model=None, preferred=None, vision=False):
+        """POST to preferred (if healthy) or the best host, failing over on connection errors and 5xx.
+        
+        vision marks a request carrying an image (see pick). Returns (url, response);
+        the last error is raised once every host has failed.
+        """
+        tried = []
+        while True:
+            if (preferred and preferred not in tried and self.is_healthy(preferred)
+                    and (not vision or self.has_vision(preferred, model))):
+                url = preferred
+            else:
+                url = self.pick(model, exclude=tried, vision=vision)
+            try:
+                with self.lease(url):
+                    timeout = (self.settings_manager.get("connect_timeout"), self.settings_manager.get("request_timeout"))
+                    response = http_session.post(f"{url}{path}", json=payload, timeout=timeout)
+                    if response.status_code >= 500:
+                        raise ProviderUnavailableError(f"Ollama request failed: {response.status_code} - {response.text}")
+                return url, response
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, RuntimeError) as e:
+                tried.append(url)
+                if len(tried) >= len(self.hosts()):
+                    raise
+                print(f"Ollama host {url} failed ({e.__class__.__name__}), trying another host")
+    
+    def check_health(self):
+        """Probe every host's /api/tags and update its health and installed models."""
+        for url in self.hosts():
+            try:
+                response = http_session.get(f"{url}/api/tags", timeout=3)
+                healthy = response.status_code == 200
+                models = {model["name"] for model in response.json().get("models", [])} if healthy else None
+            except (requests.exceptions.RequestException, ValueError):
+                healthy, models = False, None
+            with self.lock:
+                entry = self.state[url]
+                if entry["healthy"] != healthy:
+                    print(f"Ollama host {url} is {'healthy' if healthy else 'unhealthy'}")
+                entry["healthy"] = healthy
+                if models is not None:
+                    entry["models"] = models
+    
+    def _run(self):
+        """Check host health periodically until stopped."""
+        while True:
+            if len(self.hosts()) > 1:  # With a single host there is nothing to choose between
+                self.check_health()
+            if self.stop_event.wait(self.settings_manager.get("ollama_health_interval")):
+                return
+    
+    def start(self):
+        """Start background health checks."""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+    
+    def stop(self):
+        """Stop background health checks."""
+        self.stop_event.set()
+    
+    def status_text(self):
+        """Return a one-line summary of the pool for the status bar."""
+        hosts = self.hosts()
+        healthy = sum(1 for url in hosts if self.state[url]["healthy"])
+        busy = sum(self.state[url]["outstanding"] for url in hosts)
+        return f"🖧 Ollama pool: {healthy}/{len(hosts)} healthy · {busy} in flight"
+
+
+class OllamaChatSession:
+    """Multi-turn Ollama /api/chat session with a stable message prefix.
+    
+    Ollama keeps the KV cache of the last prompt while the model stays loaded, so a
+    request whose messages start with the same system prompt and earlier turns only
+    prefills the new question. History is trimmed in chunks to keep that prefix
+    stable for as many turns as possible.
+    """
+    
+    def __init__(self, settings_manager, prompt_builder, host_pool):
+        self.settings_manager = settings_manager
+        self.prompt_builder = prompt_builder
+        self.host_pool = host_pool
+        self.messages = []  # User/assistant turns after the system prompt
+        self.key = None  # (model, system prompt) the cached prefix belongs to
+        self.host = None  # Ollama host holding this session's cache; kept while it stays healthy
+        self.lock = threading.Lock()
+    
+    def reset(self):
+        """Forget the conversation; the next request starts a new session."""
+        with self.lock:
+            self.messages = []
+            self.key = None
+            self.host = None
+    
+    def _trim(self, model):
+        """Drop the oldest turns once over the turn or token limit.
+        
+        Trimming changes the prefix and forces the kept history to be prefilled again,
+        so it drops down to half the limits rather than one turn at a time.
+        """
+        max_turns = self.settings_manager.get("ollama_session_max_turns")
+        max_tokens = self.settings_manager.get("ollama_session_max_tokens")
+        
+        def turns():
+            return sum(1 for m in self.messages if m["role"] == "user")
+        
+        def tokens():
+            return sum(self.prompt_builder.count_tokens(m["content"], model) for m in self.messages)
+        
+        if (max_turns and turns() > max_turns) or (max_tokens and tokens() > max_tokens):
+            while len(self.messages) > 1 and (
+                (max_turns and turns() > max(1, max_turns // 2)) or (max_tokens and tokens() > max_tokens // 2)
+            ):
+                # Remove the oldest user message and its answer
+                del self.messages[:2]
+            print(f"Ollama session trimmed to {turns()} turns")
+    
+    def ask(self, prompt, model=None, max_tokens=None, vision=False):
+        """Send a question as the next turn and return (answer, response); raises RuntimeError on HTTP errors.
+        
+        The lock covers only reading and updating the history, not the request, so
+        concurrent questions can run in parallel on different hosts. vision keeps a
+        question about an image on hosts with a vision-capable model.
+        """
+        model = model or self.settings_manager.get("ollama_model")
+        system_prompt = self.settings_manager.get("system_prompt")
+        
+        with self.lock:
+            # A different model or system prompt cannot reuse the cached prefix
+            key = (model, system_prompt)
+            if key != self.key:
+                self.messages = []
+                self.key = key
+            history = list(self.messages)
+            preferred = self.host
+        
+        question = {"role": "user", "content": prompt}
+        payload = {
+            "model": model,
+            "messages": [{"role": "system", "content": system_prompt}] + history + [question],
+            "stream": False,
+            "keep_alive": self.settings_manager.get("ollama_keep_alive"),
+            "options": {
+                "temperature": self.settings_manager.get("temperature"),
+                "num_predict": max_tokens or self.settings_manager.get("max_tokens")
+            }
+        }
+        
+        # Stay on the host that holds the cached prefix; the history moves with us on failover
+        host, response = self.host_pool.post("/api/chat", payload, model=model, preferred=preferred, vision=vision)
+        if response.status_code != 200:
+            raise RuntimeError(f"Ollama request failed: {response.status_code} - {response.text}")
+        
+        result = response.json()
+        answer = result.get("message", {}).get("content", "No response from Ollama")
+        
+        with self.lock:
+            # Skip the turn if the session was reset or switched model meanwhile
+            if self.key == key:
+                self.messages += [question, {"role": "assistant", "content": answer}]
+                self.host = host
+                self._trim(model)
+            turn = sum(1 for m in self.messages if m["role"] == "user")
+        print(f"Ollama session turn {turn}: prefilled {result.get('prompt_eval_count', 0)} prompt tokens")
+        return answer, result
+
+
+class AIService:
+    """Provider calls for OpenAI and Ollama, kept free of any UI so they can be load-tested."""
+    
+    def __init__(self, settings_manager, prompt_builder, rate_limiter, usage_tracker=None):
+        self.settings_manager = settings_manager
+        self.prompt_builder = prompt_builder
+        self.rate_limiter = rate_limiter
+        self.usage_tracker = usage_tracker  # Optional UsageTracker for token/cost accounting
+        self.model_catalog = ModelCatalog(settings_manager)
+        self.ollama_pool = OllamaHostPool(settings_manager, self.model_catalog)
+        self.ollama_session = OllamaChatSession(settings_manager, prompt_builder, self.ollama_pool)
+        self.router = QuestionRouter(settings_manager)
+        self.last_usage = None  # Usage entry of the last request
+        self.failover_client = None  # OpenAI client built on demand when failing over from Ollama
+        self.breakers = {
+            "openai": CircuitBreaker("OpenAI", settings_manager, self.probe_openai),
+            "ollama": CircuitBreaker("Ollama", settings_manager, self.probe_ollama)
+        }
+    
+    def openai_client(self):
+        """Return the active OpenAI client, or one built from OPENAI_API_KEY when OpenAI is the failover provider."""
+        if client:
+            return client
+        if self.failover_client is None and os.getenv("OPENAI_API_KEY"):
+            self.failover_client = OpenAI()
+        return self.failover_client
+    
+    def is_configured(self, provider):
+        """Return True if requests can be sent to provider."""
+        if provider == "openai":
+            return self.openai_client() is not None
+        return bool(self.ollama_pool.hosts())
+    
+    @staticmethod
+    def is_outage(error):
+        """Return True for errors that mean the provider is down rather than the request being wrong."""
+        if isinstance(error, (ProviderUnavailableError, openai.APIConnectionError, openai.APITimeoutError,
+                              requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+    
+    def probe_openai(self):
+        """Raise unless the OpenAI API answers a cheap request."""
+        timeout = openai.Timeout(self.settings_manager.get("request_timeout"), connect=self.settings_manager.get("connect_timeout"))
+        try:
+            self.openai_client().with_options(max_retries=0, timeout=timeout).models.retrieve(self.settings_manager.get("openai_model"))
+        except openai.APIStatusError as e:
+            # Any answer short of a server error means the API is reachable
+            if e.status_code >= 500:
+                raise
+    
+    def probe_ollama(self):
+        """Raise unless at least one Ollama host answers /api/tags."""
+        self.ollama_pool.check_health()
+        if not any(self.ollama_pool.state[url]["healthy"] for url in self.ollama_pool.hosts()):
+            raise ProviderUnavailableError("No Ollama host is reachable")
+    
+    def ask(self, extracted_text, send_text_only=True, on_retry=None, on_failover=None):
+        """Answer with the selected provider, failing over to failover_provider while it is down.
+        
+        Each provider has a CircuitBreaker, so a provider that keeps failing is skipped
+        at once instead of waiting for timeouts. Failover is opt-in, since it can send
+        the capture to a cloud provider when a local one was chosen. on_failover(failed,
+        fallback, error) is called before the fallback provider is tried.
+        
+        Returns (answer, provider, model) for the provider and model that answered.
+        """
+        selected = self.settings_manager.get("ai_provider")
+        providers = [selected]
+        fallback = self.settings_manager.get("failover_provider")
+        if fallback in self.breakers and fallback != selected and self.is_configured(fallback):
+            providers.append(fallback)
+        
+        first_error = None
+        for provider in providers:
+            breaker = self.breakers[provider]
+            if not breaker.allow():
+                error = ProviderUnavailableError(f"{breaker.name} circuit is open")
+            else:
+                try:
+                    if provider == "openai":
+                        answer, model = self.ask_openai(extracted_text, on_retry=self.breaker_retry_hook(breaker, on_retry))
+                    else:
+                        answer, model = self.ask_ollama(extracted_text, send_text_only)
+                    breaker.record_success()
+                    return answer, provider, model
+                except Exception as e:
+                    if not self.is_outage(e):
+                        breaker.record_success()  # The provider answered, the request itself failed
+                        if first_error is None:
+                            raise
+                        break
+                    breaker.record_failure(e)
+                    error = e
+            
+            first_error = first_error or error
+            if provider != providers[-1]:
+                print(f"{breaker.name} unavailable ({error}), failing over to {providers[-1]}")
+                if on_failover:
+                    on_failover(provider, providers[-1], error)
+        raise ProviderUnavailableError(f"{self.breakers[selected].name} unavailable: {first_error}") from first_error
+    
+    def breaker_retry_hook(self, breaker, on_retry):
+        """Wrap on_retry so outage retries count against the breaker and stop once it opens."""
+        def hook(attempt, delay, error):
+            if self.is_outage(error):
+                breaker.record_failure(error)
+                if breaker.state == CircuitBreaker.OPEN:
+                    raise ProviderUnavailableError(f"{breaker.name} circuit opened") from error
+            if on_retry:
+                on_retry(attempt, delay, error)
+        return hook
+    
+    def record_usage(self, route, provider, prompt_tokens, completion_tokens, latency_ms, generation_ms=None, prompt_stats=None):
+        """Log the routing decision and, with a usage tracker, store the request's tokens, speed, cost and tokens saved."""
+        self.router.log(route, provider, prompt_tokens, completion_tokens, latency_ms, prompt_stats=prompt_stats)
+        if self.usage_tracker:
+            self.last_usage = self.usage_tracker.record(
+                provider, route["model"], prompt_tokens, completion_tokens, latency_ms,
+                generation_ms=generation_ms, question_type=route.get("type"), prompt_stats=prompt_stats
+            )
+    
+    def ask_openai(self, extracted_text, on_retry=None):
+        """Send the question to OpenAI under the rate limits and return (answer, model)."""
+        openai_client = self.openai_client()
+        if not openai_client:
+            raise RuntimeError("OpenAI client not initialized")
+        
+        route = self.router.route(extracted_text, "openai")
+        if self.usage_tracker:
+            # Past the daily budget, answer with the cheaper fallback model
+            route["model"] = self.usage_tracker.budget_model(route["model"])
+        model = route["model"]
+        max_tokens = route["max_tokens"]
+        prompt_text, prompt_stats = self.prompt_builder.build(extracted_text, model)
+        system_prompt = self.settings_manager.get("system_prompt")
+        user_prompt = self.router.render(route, prompt_text, QuestionRouter.DEFAULT_PROMPT)
+        
+        # Reserve the worst case (prompt + full completion) against the token budget
+        estimated_tokens = prompt_stats["prompt_tokens"] + self.prompt_builder.count_tokens(system_prompt, model) + max_tokens
+        
+        timeout = openai.Timeout(self.settings_manager.get("request_timeout"), connect=self.settings_manager.get("connect_timeout"))
+        
+        def request():
+            # The limiter owns retries, so the SDK's own retries are disabled
+            return openai_client.with_options(max_retries=0, timeout=timeout).chat.completions.with_raw_response.create(
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": system_prompt,
+                            }
+                        ],
+                    },
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": user_prompt,
+                            }
+                        ],
+                    }
+                ],
+                max_tokens=max_tokens,
+                temperature=self.settings_manager.get("temperature")
+            )
+        
+        started = time.perf_counter()
+        response = self.rate_limiter.call(model, estimated_tokens, request, on_retry=on_retry)
+        usage = getattr(response, "usage", None)
+        self.record_usage(
+            route,
+            "openai",
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None,
+            latency_ms=(time.perf_counter() - started) * 1000,
+            prompt_stats=prompt_stats
+        )
+        return response.choices[0].message.content, model
+    
+    def ask_ollama(self, extracted_text, send_text_only=True):
+        """Send the question to Ollama and return (answer, model); raises RuntimeError on HTTP errors."""
+        route = self.router.route(extracted_text, "ollama")
+        model = route["model"]
+        vision = not send_text_only
+        if self.settings_manager.get("ollama_auto_model") and model == self.settings_manager.get("ollama_model"):
+            # No routing rule chose a model: take the smallest capable one from the catalog
+            model = self.model_catalog.fastest(self.settings_manager.get("ollama_url"), vision=vision) or model
+            route["model"] = model
+        if vision or self.settings_manager.get("ollama_auto_model"):
+            # Host selection and the auto-picked model rely on each host's catalog
+            for url in self.ollama_pool.hosts():
+                if not self.model_catalog.is_fresh(url):
+                    self.model_catalog.refresh_async(url)
+        prompt_text, prompt_stats = self.prompt_builder.build(extracted_text, model)
+        
+        if send_text_only:
+            # Send only text to Ollama (for non-vision models or text-only processing)
+            prompt = self.router.render(route, prompt_text, "Please answer the question and keep short:\n\n{question}")
+        else:
+            # Send both text and image to Ollama (for vision models)
+            prompt = self.router.render(route, prompt_text, "Please answer the question and keep short: {question}")
+        
+        started = time.perf_counter()
+        if self.settings_manager.get("ollama_session_mode") == "chat":
+            # A routed model different from the session's one starts a new session
+            answer, result = self.ollama_session.ask(prompt, model=model, max_tokens=route["max_tokens"], vision=vision)
+            self.record_usage(
+                route, "ollama", result.get("prompt_eval_count"), result.get("eval_count"),
+                (time.perf_counter() - started) * 1000, generation_ms=(result.get("eval_duration") or 0) / 1e6,
+                prompt_stats=prompt_stats
+            )
+            return answer, model
+        
+        payload = {
+            "model": model,
+            "system": self.settings_manager.get("system_prompt"),
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.settings_manager.get("ollama_keep_alive"),
+            "options": {
+                "temperature": self.settings_manager.get("temperature"),
+                "num_predict": route["max_tokens"]
+            }
+        }
+        
+        # Ollama API endpoint on the least-loaded healthy host
+        _, response = self.ollama_pool.post("/api/generate", payload, model=model, vision=vision)
+        if response.status_code != 200:
+            raise RuntimeError(f"Ollama request failed: {response.status_code} - {response.text}")
+        result = response.json()
+        self.record_usage(
+            route, "ollama", result.get("prompt_eval_count"), result.get("eval_count"),
+            (time.perf_counter() - started) * 1000, generation_ms=(result.get("eval_duration") or 0) / 1e6,
+            prompt_stats=prompt_stats
+        )
+        return result.get("response", "No response from Ollama"), model
+    
+    @staticmethod
+    def list_ollama_models(url):
+        """Return the model names installed on an Ollama instance."""
+        response = http_session.get(f"{url}/api/tags", timeout=5)
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to fetch models: {response.status_code}")
+        return [model['name'] for model in response.json().get('models', [])]
+
+
+class ModelCatalog:
+    """Ollama models with their capabilities, cached in memory and on disk and refreshed in the background.
+    
+    /api/tags lists the models; /api/show is queried concurrently for each new or changed
+    model (by digest) to learn whether it accepts images, its context length and size.
+    """
+    
+    def __init__(self, settings_manager, cache_path="model_catalog.json"):
+        self.settings_manager = settings_manager
+        self.cache_path = cache_path
+        self.entries = {}  # url -> {"fetched_at": epoch seconds, "models": {name: info}}
+        self.refreshing = set()  # URLs with a background refresh running
+        self.lock = threading.Lock()
+        self.load()
+    
+    def load(self):
+        """Load the catalog cached by a previous run."""
+        try:
+            if os.path.exists(self.cache_path):
+                with open(self.cache_path, "r") as f:
+                    self.entries = json.load(f)
+        except Exception as e:
+            print(f"Error loading model catalog: {e}")
+    
+    def save(self):
+        """Write the catalog to disk."""
+        try:
+            with self.lock:
+                data = json.dumps(self.entries, indent=2)
+            with open(self.cache_path, "w") as f:
+                f.write(data)
+        except Exception as e:
+            print(f"Error saving model catalog: {e}")
+    
+    @staticmethod
+    def parse_parameters(parameter_size):
+        """Convert Ollama's parameter size ("7B", "3.2B", "500M") to billions."""
+        match = re.match(r"([\d.]+)\s*([KMBT]?)", str(parameter_size or "").upper())
+        if not match:
+            return None
+        scale = {"K": 1e-6, "M": 1e-3, "B": 1.0, "T": 1e3, "": 1e-9}[match.group(2)]
+        return float(match.group(1)) * scale
+    
+    @classmethod
+    def model_info(cls, tag, show):
+        """Build a model's catalog entry from its /api/tags record and /api/show response."""
+        details = show.get("details") or tag.get("details") or {}
+        info = show.get("model_info") or {}
+        capabilities = show.get("capabilities")
+        if capabilities is None:
+            # Older Ollama versions: embedding models are BERT-based, vision models carry a CLIP projector
+            families = details.get("families") or [details.get("family") or ""]
+            if any(family.endswith("bert") for family in families):
+                capabilities = ["embedding"]
+            else:
+                capabilities = ["completion"]
+                if "clip" in families or "mllama" in families or "projector_info" in show:
+                    capabilities.append("vision")
+        context_length = next((value for key, value in info.items() if key.endswith(".context_length")), None)
+        parameters = cls.parse_parameters(details.get("parameter_size"))
+        if parameters is None and info.get("general.parameter_count"):
+            parameters = info["general.parameter_count"] / 1e9
+        return {
+            "digest": tag.get("digest"),
+            "capabilities": list(capabilities),
+            "vision": "vision" in capabilities,
+            "context_length": context_length,
+            "parameter_size": details.get("parameter_size"),
+            "parameters": parameters,
+            "size": tag.get("size"),
+            "family": details.get("family")
+        }
+    
+    def fetch(self, url):
+        """Query an Ollama instance and return {name: info}; unchanged models are not re-queried."""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        response = http_session.get(f"{url}/api/tags", timeout=5)
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to fetch models: {response.status_code}")
+        tags = response.json().get("models", [])
+        
+        with self.lock:
+            previous = dict((self.entries.get(url) or {}).get("models", {}))
+        
+        def describe(tag):
+            known = previous.get(tag["name"])
+            if known and known.get("digest") == tag.get("digest") and "capabilities" in known:
+                return known
+            try:
+                show = http_session.post(f"{url}/api/show", json={"model": tag["name"]}, timeout=10)
+                return self.model_info(tag, show.json() if show.status_code == 200 else {})
+            except requests.exceptions.RequestException as e:
+                print(f"Error describing model {tag['name']}: {e}")
+                return self.model_info(tag, {})
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            infos = list(executor.map(describe, tags))
+        models = {tag["name"]: info for tag, info in zip(tags, infos)}
+        
+        with self.lock:
+            self.entries[url] = {"fetched_at": time.time(), "models": models}
+        self.save()
+        return models
+    
+    def is_fresh(self, url):
+        """Return True if url's models were fetched within model_catalog_ttl seconds."""
+        with self.lock:
+            entry = self.entries.get(url.rstrip("/"))
+        return bool(entry) and time.time() - entry["fetched_at"] < self.settings_manager.get("model_catalog_ttl")
+    
+    def cached(self, url):
+        """Return the last known {name: info} for url without any network access (may be stale)."""
+        with self.lock:
+            return dict((self.entries.get(url.rstrip("/")) or {}).get("models", {}))
+    
+    def details(self, url, force=False):
+        """Return {name: info} for url, fetching only when the cached catalog is stale."""
+        url = url.rstrip("/")
+        if not force and self.is_fresh(url):
+            return self.cached(url)
+        return self.fetch(url)
+    
+    def get(self, url, force=False):
+        """Return the model names on an Ollama instance."""
+        return list(self.details(url, force))
+    
+    def refresh_async(self, url, on_done=None):
+        """Refresh a stale catalog in a background thread; on_done gets {name: info} afterwards."""
+        url = url.rstrip("/")
+        with self.lock:
+            if url in self.refreshing:
+                return
+            self.refreshing.add(url)
+        
+        def run():
+            try:
+                models = self.details(url)
+                if on_done:
+                    on_done(models)
+            except Exception as e:
+                print(f"Background model catalog refresh failed: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(url)
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def fastest(self, url, vision=False):
+        """Return the smallest cached model that can generate text (and, with vision, read images), or None.
+        
+        Embedding-only models (and entries cached before capabilities were recorded) are skipped.
+        """
+        candidates = [
+            (info.get("parameters") or float("inf"), info.get("size") or 0, name)
+            for name, info in self.cached(url).items()
+            if "completion" in info.get("capabilities", ()) and (not vision or "vision" in info.get("capabilities", ()))
+        ]
+        return min(candidates)[2] if candidates else None
+    
+    @staticmethod
+    def sort_names(models):
+        """Return model names with vision-capable models first, each group smallest first."""
+        return sorted(models, key=lambda name: (not models[name].get("vision"), models[name].get("parameters") or float("inf"), name))
+    
+    def invalidate(self, url=None):
+        """Forget one URL's models, or all of them."""
+        with self.lock:
+            if url is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(url.rstrip("/"), None)
+        self.save()
+
+
+class UsageTracker:
+    """Per-request token, speed and cost accounting in the history database, with a daily budget."""
+    
+    # USD per million (input, output) tokens; override or extend with the model_prices setting
+    PRICES = {
+        "gpt-4o": (2.50, 10.00),
+        "gpt-4o-mini": (0.15, 0.60),
+        "gpt-4-turbo": (10.00, 30.00),
+        "gpt-4-vision-preview": (10.00, 30.00),
+    }
+    
+    def __init__(self, settings_manager, db_path="history.db"):
+        self.settings_manager = settings_manager
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS usage (
+                    id INTEGER PRIMARY KEY,
+                    created_at TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    provider TEXT,
+                    model TEXT,
+                    question_type TEXT,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    latency_ms REAL,
+                    tokens_per_s REAL,
+                    cost_usd REAL,
+                    raw_tokens INTEGER,
+                    tokens_saved INTEGER
+                )
+            """)
+            # Databases created before the prompt builder's stats were stored
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(usage)")}
+            for column in ("raw_tokens", "tokens_saved"):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE usage ADD COLUMN {column} INTEGER")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS usage_day ON usage(day)")
+    
+    def price(self, model):
+        """Return (input, output) USD per million tokens for a model; unknown and local models are free."""
+        prices = dict(self.PRICES, **(self.settings_manager.get("model_prices") or {}))
+        if model in prices:
+            return tuple(prices[model])
+        # Dated snapshots (gpt-4o-2024-08-06) cost the same as their base model
+        for name in sorted(prices, key=len, reverse=True):
+            if model and model.startswith(name + "-"):
+                return tuple(prices[name])
+        return (0.0, 0.0)
+    
+    def cost(self, provider, model, prompt_tokens, completion_tokens):
+        """Estimated USD cost of one request."""
+        if provider != "openai":
+            return 0.0
+        input_price, output_price = self.price(model)
+        return ((prompt_tokens or 0) * input_price + (completion_tokens or 0) * output_price) / 1_000_000
+    
+    def record(self, provider, model, prompt_tokens, completion_tokens, latency_ms, generation_ms=None, question_type=None,
+               prompt_stats=None):
+        """Store one request's usage and return it as a dict.
+        
+        generation_ms is the time spent producing the completion (Ollama's eval_duration);
+        without it tokens per second are measured over the whole request. prompt_stats
+        are PromptBuilder.build's counts for the question text (raw and saved tokens).
+        """
+        prompt_stats = prompt_stats or {}
+        duration_ms = generation_ms or latency_ms
+        tokens_per_s = completion_tokens / (duration_ms / 1000) if completion_tokens and duration_ms else None
+        now = datetime.now()
+        entry = {
+            "provider": provider,
+            "model": model,
+            "question_type": question_type,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms": latency_ms,
+            "tokens_per_s": tokens_per_s,
+            "cost_usd": self.cost(provider, model, prompt_tokens, completion_tokens),
+            "raw_tokens": prompt_stats.get("raw_tokens"),
+            "tokens_saved": prompt_stats.get("tokens_saved")
+        }
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(
+                    "INSERT INTO usage (created_at, day, provider, model, question_type, prompt_tokens, completion_tokens, "
+                    "latency_ms, tokens_per_s, cost_usd, raw_tokens, tokens_saved) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (now.isoformat(timespec="seconds"), now.date().isoformat(), provider, model, question_type,
+                     prompt_tokens, completion_tokens, latency_ms, tokens_per_s, entry["cost_usd"],
+                     entry["raw_tokens"], entry["tokens_saved"])
+                )
+        except sqlite3.Error as e:
+            print(f"Error recording usage: {e}")
+        return entry
+    
+    def totals(self, day=None):
+        """Return request count, tokens, cost, mean tokens/s and tokens saved, for one day (ISO date) or all time."""
+        where, params = ("WHERE day = ?", (day,)) if day else ("", ())
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(prompt_tokens), 0), COALESCE(SUM(completion_tokens), 0), "
+                f"COALESCE(SUM(cost_usd), 0), AVG(tokens_per_s), COALESCE(SUM(tokens_saved), 0) FROM usage {where}",
+                params
+            ).fetchone()
+        return {"requests": row[0], "prompt_tokens": row[1], "completion_tokens": row[2], "cost_usd": row[3], "tokens_per_s": row[4],
+                "tokens_saved": row[5]}
+    
+    def spent_today(self):
+        """Return today's estimated spend in USD."""
+        return self.totals(datetime.now().date().isoformat())["cost_usd"]
+    
+    def budget_model(self, model):
+        """Return the model to use: the fallback model once today's spend reaches daily_budget_usd."""
+        budget = self.settings_manager.get("daily_budget_usd")
+        fallback = self.settings_manager.get("budget_fallback_model")
+        if not budget or not fallback or model == fallback:
+            return model
+        if self.spent_today() >= budget:
+            print(f"Daily budget of ${budget:.2f} reached: using {fallback} instead of {model}")
+            return fallback
+        return model
+    
+    def summary_text(self):
+        """Return today's totals for the status bar."""
+        today = self.totals(datetime.now().date().isoformat())
+        tokens = today["prompt_tokens"] + today["completion_tokens"]
+        text = f"💰 Today ${today['cost_usd']:.4f} · {today['requests']} requests · {tokens / 1000:.1f}k tokens"
+        if today["tokens_per_s"]:
+            text += f" · {today['tokens_per_s']:.0f} tok/s"
+        budget = self.settings_manager.get("daily_budget_usd")
+        if budget:
+            text += f" · budget ${budget:.2f}"
+        return text
+    
+    def close(self):
+        """Close the database connection."""
+        with self.lock:
+            self.conn.close()
+
+
+class AnswerHistory:
+    """Persistent answer history stored in SQLite with FTS5 full-text search."""
+    
+    def __init__(self, db_path="history.db"):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.fts_available = True
+        self._create_schema()
+    
+    def _create_schema(self):
+        """Create the history table, its full-text index and the triggers keeping them in sync."""
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS history (
+                    id INTEGER PRIMARY KEY,
+                    created_at TEXT NOT NULL,
+                    capture_path TEXT,
+                    ocr_text TEXT,
+                    answer TEXT,
+                    provider TEXT,
+                    model TEXT,
+                    ocr_ms REAL,
+                    ai_ms REAL
+                )
+            """)
+            try:
+                self.conn.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS history_fts
+                    USING fts5(ocr_text, answer, content='history', content_rowid='id')
+                """)
+                self.conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+                        INSERT INTO history_fts(rowid, ocr_text, answer) VALUES (new.id, new.ocr_text, new.answer);
+                    END
+                """)
+                self.conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+                        INSERT INTO history_fts(history_fts, rowid, ocr_text, answer)
+                        VALUES ('delete', old.id, old.ocr_text, old.answer);
+                    END
+                """)
+            except sqlite3.OperationalError as e:
+                # SQLite built without FTS5: fall back to LIKE search
+                print(f"FTS5 not available, history search will be slower: {e}")
+                self.fts_available = False
+    
+    def add(self, capture_path, ocr_text, answer, provider, model, ocr_ms=None, ai_ms=None):
+        """Record an answered capture and return its id."""
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO history (created_at, capture_path, ocr_text, answer, provider, model, ocr_ms, ai_ms) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (datetime.now().isoformat(timespec="seconds"), capture_path, ocr_text, answer, provider, model, ocr_ms, ai_ms)
+            )
+            return cursor.lastrowid
+    
+    def _fts_query(self, query):
+        """Turn free text into an FTS5 query: every word must match as a prefix."""
+        words = re.findall(r"\w+", query)
+        return " ".join(f'"{word}"*' for word in words)
+    
+    def _search_sql(self, query):
+        """Return (FROM/WHERE clause, parameters, sort column) for a search query over history h."""
+        if not query.strip():
+            return "FROM history h", (), "h.id"
+        if self.fts_available:
+            fts_query = self._fts_query(query)
+            if not fts_query:
+                return "FROM history h", (), "h.id"
+            # Sort on the index rowid so SQLite walks the full-text index in order instead of sorting
+            return "FROM history_fts f JOIN history h ON h.id = f.rowid WHERE history_fts MATCH ?", (fts_query,), "f.rowid"
+        pattern = f"%{query.strip()}%"
+        return "FROM history h WHERE h.ocr_text LIKE ? OR h.answer LIKE ?", (pattern, pattern), "h.id"
+    
+    def count(self, query=""):
+        """Return the number of entries matching the query."""
+        if query.strip() and self.fts_available and self._fts_query(query):
+            # Counting on the index alone avoids touching the history rows
+            sql, params = "SELECT COUNT(*) FROM history_fts WHERE history_fts MATCH ?", (self._fts_query(query),)
+        else:
+            clause, params, _ = self._search_sql(query)
+            sql = f"SELECT COUNT(*) {clause}"
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()[0]
+    
+    def page(self, query="", offset=0, limit=100):
+        """Return a page of (id, created_at, model, answer preview) rows, newest first."""
+        clause, params, sort_column = self._search_sql(query)
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT h.id, h.created_at, h.model, substr(h.answer, 1, 200) {clause} "
+                f"ORDER BY {sort_column} DESC LIMIT ? OFFSET ?",
+                params + (limit, offset)
+            ).fetchall()
+    
+    def get(self, entry_id):
+        """Return a full history entry as a dict, or None."""
+        with self.lock:
+            cursor = self.conn.execute("SELECT * FROM history WHERE id = ?", (entry_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([column[0] for column in cursor.description], row))
+    
+    def iter_questions(self, limit=100000, batch_size=1000):
+        """Yield (id, ocr_text) for the most recent entries, in batches to bound memory."""
+        last_id = None
+        remaining = limit
+        while remaining > 0:
+            with self.lock:
+                if last_id is None:
+                    rows = self.conn.execute(
+                        "SELECT id, ocr_text FROM history ORDER BY id DESC LIMIT ?", (min(batch_size, remaining),)
+                    ).fetchall()
+                else:
+                    rows = self.conn.execute(
+                        "SELECT id, ocr_text FROM history WHERE id < ? ORDER BY id DESC LIMIT ?",
+                        (last_id, min(batch_size, remaining))
+                    ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+            remaining -= len(rows)
+    
+    def close(self):
+        """Close the database connection."""
+        with self.lock:
+            self.conn.close()
+
+
+class NearDuplicateIndex:
+    """MinHash LSH index over normalized question text for near-duplicate lookups.
+    
+    Each question is reduced to a MinHash signature of its character shingles, so small OCR
+    misreads and reflowed lines only change a few shingles. Signatures are split into bands;
+    questions sharing any band bucket are candidates, and candidates are verified with the
+    signature-estimated Jaccard similarity.
+    """
+    
+    NUM_PERM = 64
+    BANDS = 16  # 16 bands x 4 rows: ~99.9% recall at 0.8 similarity
+    SHINGLE_SIZE = 5
+    MERSENNE_PRIME = (1 << 61) - 1
+    
+    def __init__(self, seed=1):
+        import numpy as np
+        
+        rng = np.random.RandomState(seed)
+        self.perm_a = rng.randint(1, 1 << 32, self.NUM_PERM, dtype=np.uint64)
+        self.perm_b = rng.randint(0, 1 << 32, self.NUM_PERM, dtype=np.uint64)
+        self.rows = self.NUM_PERM // self.BANDS
+        self.buckets = [{} for _ in range(self.BANDS)]  # band -> {band bytes: [entry ids]}
+        self.signatures = {}  # entry id -> signature
+        self.lock = threading.Lock()
+    
+    def normalize(self, text):
+        """Lowercase, unify characters and keep only words so OCR punctuation noise is ignored."""
+        text = unicodedata.normalize("NFKC", text or "").lower()
+        return " ".join(re.findall(r"\w+", text))
+    
+    def signature(self, text):
+        """Return the MinHash signature of a text, or None if it has no words."""
+        import numpy as np
+        
+        normalized = self.normalize(text)
+        if not normalized:
+            return None
+        
+        k = self.SHINGLE_SIZE
+        shingles = {normalized[i:i + k] for i in range(max(1, len(normalized) - k + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        
+        # Universal hashing (a * x + b) mod p per permutation; keep the minimum per row
+        permuted = (np.outer(hashes, self.perm_a) + self.perm_b) % np.uint64(self.MERSENNE_PRIME)
+        return (permuted.min(axis=0) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+    
+    def _band_keys(self, signature):
+        """Yield (band index, bucket key) for a signature."""
+        for band in range(self.BANDS):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+    
+    def add(self, entry_id, text):
+        """Index a question under the given entry id."""
+        signature = self.signature(text)
+        if signature is None:
+            return
+        
+        with self.lock:
+            self.signatures[entry_id] = signature
+            for band, key in self._band_keys(signature):
+                self.buckets[band].setdefault(key, []).append(entry_id)
+    
+    def query(self, text, threshold):
+        """Return (entry id, similarity) of the most similar indexed question above threshold, or None."""
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        
+        best = None
+        with self.lock:
+            candidates = set()
+            for band, key in self._band_keys(signature):
+                candidates.update(self.buckets[band].get(key, ()))
+            
+            for entry_id in candidates:
+                similarity = float((self.signatures[entry_id] == signature).mean())
+                # Prefer the newest entry among equally similar ones
+                if similarity >= threshold and (best is None or (similarity, entry_id) > best[::-1]):
+                    best = (entry_id, similarity)
+        return best
+    
+    def __len__(self):
+        return len(self.signatures)
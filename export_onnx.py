@@ -0,0 +1,180 @@
+"""Export EasyOCR's detector and recognizer to ONNX for the "easyocr_onnx" OCR method.
+
+Needs easyocr, torch, onnx and onnxruntime at export time only; the app then runs
+the models with onnxruntime alone.
+
+Usage:
+    python export_onnx.py --languages en de --quantize
+"""
+import argparse
+import json
+import os
+
+import torch
+
+
+class RecognizerWrapper(torch.nn.Module):
+    """Exportable forward pass of EasyOCR's recognizer.
+
+    Mirrors Model.forward without the unused text argument. AdaptiveAvgPool2d((None, 1))
+    cannot be exported with a dynamic width, so it is written as the mean it computes.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, image):
+        visual_feature = self.model.FeatureExtraction(image).permute(0, 3, 1, 2)
+        visual_feature = visual_feature.mean(dim=3)
+        contextual_feature = self.model.SequenceModeling(visual_feature)
+        return self.model.Prediction(contextual_feature.contiguous())
+
+
+def export_detector(reader, output_dir):
+    """Export the CRAFT text detector with dynamic input size."""
+    path = os.path.join(output_dir, "detector.onnx")
+    dummy = torch.randn(1, 3, 640, 640)
+    torch.onnx.export(
+        reader.detector,
+        dummy,
+        path,
+        input_names=["image"],
+        output_names=["scores", "features"],
+        dynamic_axes={"image": {2: "height", 3: "width"}, "scores": {1: "height", 2: "width"}, "features": {2: "height", 3: "width"}},
+        opset_version=17,
+        dynamo=False  # TorchScript exporter: handles the LSTM and dynamic axes without onnxscript
+    )
+    print(f"Exported {path}")
+    return path
+
+
+def export_recognizer(reader, language, output_dir):
+    """Export the CRNN recognizer with dynamic width, plus its character set."""
+    path = os.path.join(output_dir, f"recognizer_{language}.onnx")
+    dummy = torch.randn(1, 1, 64, 256)
+    torch.onnx.export(
+        RecognizerWrapper(reader.recognizer),
+        dummy,
+        path,
+        input_names=["image"],
+        output_names=["logits"],
+        dynamic_axes={"image": {3: "width"}, "logits": {1: "steps"}},
+        opset_version=17,
+        dynamo=False  # TorchScript exporter: handles the LSTM and dynamic axes without onnxscript
+    )
+
+    charset_path = os.path.join(output_dir, f"charset_{language}.json")
+    with open(charset_path, "w", encoding="utf-8") as f:
+        json.dump({"characters": reader.character, "model_lang": reader.model_lang}, f, ensure_ascii=False)
+
+    print(f"Exported {path}")
+    return path
+
+
+def calibration_images(folder=None, count=8):
+    """Return PIL images for detector calibration: captures from folder, or rendered text."""
+    import random
+    from PIL import Image, ImageDraw
+
+    if folder:
+        names = sorted(n for n in os.listdir(folder) if n.lower().endswith((".png", ".jpg", ".jpeg", ".bmp")))
+        return [Image.open(os.path.join(folder, n)).convert("RGB") for n in names[:count]]
+
+    rng = random.Random(0)
+    words = "what which when where how many answer question select the correct option true false".split()
+    images = []
+    for i in range(count):
+        dark = i % 2 == 1
+        image = Image.new("RGB", (640, 480), (30, 30, 30) if dark else (255, 255, 255))
+        draw = ImageDraw.Draw(image)
+        for line in range(10):
+            text = " ".join(rng.choice(words) for _ in range(rng.randint(3, 8)))
+            draw.text((20, 20 + line * 44), text, fill=(230, 230, 230) if dark else (0, 0, 0))
+        images.append(image)
+    return images
+
+
+class DetectorCalibrationReader:
+    """Feed preprocessed images to the static quantizer, like OnnxOCRBackend.detect does."""
+
+    def __init__(self, images):
+        import numpy as np
+
+        mean = np.array([0.485, 0.456, 0.406], dtype=np.float32) * 255.0
+        std = np.array([0.229, 0.224, 0.225], dtype=np.float32) * 255.0
+        self.batches = iter([
+            {"image": ((np.asarray(image.resize((640, 480)), dtype=np.float32) - mean) / std).transpose(2, 0, 1)[np.newaxis]}
+            for image in images
+        ])
+
+    def get_next(self):
+        return next(self.batches, None)
+
+
+def quantize_detector(path, calibration_folder=None):
+    """Write a static int8 (QDQ) copy of the detector.
+
+    The detector is all convolutions; dynamic quantization turns them into slow
+    ConvInteger ops, while calibrated QLinearConv kernels are faster than float.
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    reader_class = type("CalibrationReader", (DetectorCalibrationReader, CalibrationDataReader), {})
+    quantized_path = path.replace(".onnx", ".int8.onnx")
+    quantize_static(
+        path,
+        quantized_path,
+        reader_class(calibration_images(calibration_folder)),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8
+    )
+    print(f"Quantized {quantized_path}")
+    return quantized_path
+
+
+def quantize_recognizer(path):
+    """Write a dynamic int8 copy of the recognizer (LSTM and linear layers only)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = path.replace(".onnx", ".int8.onnx")
+    quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8, op_types_to_quantize=["MatMul", "Gemm", "LSTM"])
+    print(f"Quantized {quantized_path}")
+    return quantized_path
+
+
+def main():
+    import easyocr
+
+    parser = argparse.ArgumentParser(description="Export EasyOCR models to ONNX")
+    parser.add_argument("--languages", nargs="+", default=["en"], help="EasyOCR language codes (en, de, ja, ...)")
+    parser.add_argument("--output", default="models/onnx", help="Output directory (the onnx_model_dir setting)")
+    parser.add_argument("--quantize", action="store_true", help="Also write int8-quantized models")
+    parser.add_argument("--calibration", help="Folder of captures used to calibrate the int8 detector")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+
+    detector_exported = False
+    for language in args.languages:
+        # Export the float models; EasyOCR's own torch quantization cannot be exported
+        reader = easyocr.Reader([language], gpu=False, quantize=False)
+        reader.detector.eval()
+        reader.recognizer.eval()
+
+        with torch.no_grad():
+            if not detector_exported:
+                path = export_detector(reader, args.output)
+                if args.quantize:
+                    quantize_detector(path, args.calibration)
+                detector_exported = True
+
+            path = export_recognizer(reader, language, args.output)
+            if args.quantize:
+                quantize_recognizer(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Generate a synthetic, labeled corpus of question screenshots for OCR benchmarks.
+
+Renders quiz-style questions in the app's OCR languages with varied fonts, sizes,
+light/dark themes, noise and scaling, and writes the ground truth to labels.jsonl
+next to the images. The same seed and fonts give byte-identical images, so the
+corpus can be regenerated anywhere instead of sharing real captures.
+
+Usage:
+    python generate_corpus.py corpus/ --count 200
+    python generate_corpus.py corpus/ --count 50 --languages eng deu rus --seed 7
+    python benchmark_ocr.py corpus/
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Same codes as the ocr_language setting
+LANGUAGES = ["eng", "spa", "fra", "deu", "ita", "por", "rus", "chi_sim", "chi_tra", "jpn", "kor"]
+
+# Language -> [(question, options)]
+QUESTIONS = {
+    "eng": [
+        ("Which planet is closest to the Sun?", ["Mercury", "Venus", "Earth", "Mars"]),
+        ("What is the boiling point of water at sea level?", ["90 °C", "100 °C", "110 °C", "120 °C"]),
+        ("Which gas do plants absorb from the air?", ["Oxygen", "Nitrogen", "Carbon dioxide", "Helium"]),
+        ("True or false: 17 is a prime number.", ["True", "False"]),
+        ("Solve for x: 3x + 7 = 22", ["x = 3", "x = 5", "x = 7", "x = 15"]),
+    ],
+    "spa": [
+        ("¿Cuál es el planeta más cercano al Sol?", ["Mercurio", "Venus", "Tierra", "Marte"]),
+        ("¿Cuántos lados tiene un hexágono?", ["Cinco", "Seis", "Siete", "Ocho"]),
+    ],
+    "fra": [
+        ("Quelle est la capitale de l'Australie ?", ["Sydney", "Canberra", "Melbourne", "Perth"]),
+        ("Combien de côtés a un hexagone ?", ["Cinq", "Six", "Sept", "Huit"]),
+    ],
+    "deu": [
+        ("Welcher Planet ist der Sonne am nächsten?", ["Merkur", "Venus", "Erde", "Mars"]),
+        ("Wie viele Seiten hat ein Sechseck?", ["Fünf", "Sechs", "Sieben", "Acht"]),
+    ],
+    "ita": [
+        ("Qual è il pianeta più vicino al Sole?", ["Mercurio", "Venere", "Terra", "Marte"]),
+        ("Quanti lati ha un esagono?", ["Cinque", "Sei", "Sette", "Otto"]),
+    ],
+    "por": [
+        ("Qual é o planeta mais próximo do Sol?", ["Mercúrio", "Vênus", "Terra", "Marte"]),
+        ("Quantos lados tem um hexágono?", ["Cinco", "Seis", "Sete", "Oito"]),
+    ],
+    "rus": [
+        ("Какая планета ближе всего к Солнцу?", ["Меркурий", "Венера", "Земля", "Марс"]),
+        ("Сколько сторон у шестиугольника?", ["Пять", "Шесть", "Семь", "Восемь"]),
+    ],
+    "chi_sim": [
+        ("哪颗行星离太阳最近？", ["水星", "金星", "地球", "火星"]),
+        ("六边形有几条边？", ["五条", "六条", "七条", "八条"]),
+    ],
+    "chi_tra": [
+        ("哪顆行星離太陽最近？", ["水星", "金星", "地球", "火星"]),
+        ("六邊形有幾條邊？", ["五條", "六條", "七條", "八條"]),
+    ],
+    "jpn": [
+        ("太陽に最も近い惑星はどれですか？", ["水星", "金星", "地球", "火星"]),
+        ("六角形には辺がいくつありますか？", ["五つ", "六つ", "七つ", "八つ"]),
+    ],
+    "kor": [
+        ("태양에 가장 가까운 행성은 무엇입니까?", ["수성", "금성", "지구", "화성"]),
+        ("육각형의 변은 몇 개입니까?", ["다섯 개", "여섯 개", "일곱 개", "여덟 개"]),
+    ],
+}
+
+# Font files tried per script, in order; the first few found are used
+FONT_CANDIDATES = {
+    "latin": [
+        "DejaVuSans.ttf", "DejaVuSerif.ttf", "DejaVuSansMono.ttf", "LiberationSans-Regular.ttf",
+        "LiberationSerif-Regular.ttf", "Arial.ttf", "arial.ttf", "Verdana.ttf", "verdana.ttf",
+        "Times New Roman.ttf", "times.ttf", "Courier New.ttf", "cour.ttf"
+    ],
+    "cjk": [
+        "NotoSansCJK-Regular.ttc", "NotoSerifCJK-Regular.ttc", "NotoSansCJKsc-Regular.otf",
+        "wqy-microhei.ttc", "wqy-zenhei.ttc", "PingFang.ttc", "Hiragino Sans GB.ttc", "msyh.ttc", "msgothic.ttc"
+    ],
+    "hangul": [
+        "NotoSansCJK-Regular.ttc", "NotoSansCJKkr-Regular.otf", "NanumGothic.ttf", "AppleSDGothicNeo.ttc", "malgun.ttf"
+    ],
+}
+LANGUAGE_SCRIPT = {"chi_sim": "cjk", "chi_tra": "cjk", "jpn": "cjk", "kor": "hangul"}  # Others use "latin" (incl. Cyrillic)
+
+FONT_DIRS = [
+    "/usr/share/fonts", "/usr/local/share/fonts", os.path.expanduser("~/.fonts"),
+    os.path.expanduser("~/.local/share/fonts"), "/System/Library/Fonts", "/Library/Fonts",
+    os.path.expanduser("~/Library/Fonts"), "C:\\Windows\\Fonts"
+]
+
+FONT_SIZES = [14, 16, 18, 22, 26, 32]
+NOISE_SIGMAS = [0, 0, 8, 16]  # Gaussian pixel noise; 0 twice so half the images are clean
+SCALES = [0.75, 1.0, 1.0, 1.25, 1.5]
+THEMES = {"light": ((255, 255, 255), (20, 20, 20)), "dark": ((30, 30, 30), (230, 230, 230))}
+MARGIN = 24
+
+
+def find_fonts(extra=()):
+    """Return {script: [font paths]} for the fonts installed on this machine."""
+    installed = {}
+    for folder in FONT_DIRS:
+        for dirpath, _, names in os.walk(folder):
+            for name in names:
+                installed.setdefault(name, os.path.join(dirpath, name))
+
+    fonts = {}
+    for script, candidates in FONT_CANDIDATES.items():
+        fonts[script] = [installed[name] for name in candidates if name in installed][:4]
+    # Fonts given on the command line are tried for every script
+    for script in fonts:
+        fonts[script] = list(extra) + fonts[script]
+    return fonts
+
+
+def question_lines(language, rng, number):
+    """Return the text lines of one question screen."""
+    question, options = rng.choice(QUESTIONS[language])
+    lines = [f"{number}/10", question]
+    lines += [f"{letter}) {option}" for letter, option in zip("ABCD", options)]
+    return lines
+
+
+def render(lines, font_path, size, theme, noise, scale, seed):
+    """Render text lines to an RGB image."""
+    background, foreground = THEMES[theme]
+    font = ImageFont.truetype(font_path, size)
+    line_height = int(size * 1.6)
+    width = int(max(font.getlength(line) for line in lines)) + 2 * MARGIN
+    height = line_height * len(lines) + 2 * MARGIN
+
+    image = Image.new("RGB", (width, height), background)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((MARGIN, MARGIN + i * line_height), line, font=font, fill=foreground)
+
+    if scale != 1.0:
+        image = image.resize((round(width * scale), round(height * scale)), Image.BILINEAR)
+
+    if noise:
+        pixels = np.asarray(image, dtype=np.float32)
+        pixels += np.random.default_rng(seed).normal(0, noise, pixels.shape)
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return image
+
+
+def generate(output, count, languages, seed, fonts):
+    """Write count images plus labels.jsonl to output and return the label records."""
+    os.makedirs(output, exist_ok=True)
+    rng = random.Random(seed)
+    records = []
+    for index in range(count):
+        language = languages[index % len(languages)]
+        font_path = rng.choice(fonts[LANGUAGE_SCRIPT.get(language, "latin")])
+        size = rng.choice(FONT_SIZES)
+        theme = rng.choice(list(THEMES))
+        noise = rng.choice(NOISE_SIGMAS)
+        scale = rng.choice(SCALES)
+        lines = question_lines(language, rng, index % 10 + 1)
+
+        image = render(lines, font_path, size, theme, noise, scale, seed * 100003 + index)
+        name = f"{index:05d}_{language}.png"
+        image.save(os.path.join(output, name), format="PNG")
+        records.append({
+            "file": name,
+            "text": "\n".join(lines),
+            "language": language,
+            "font": os.path.basename(font_path),
+            "size": size,
+            "theme": theme,
+            "noise": noise,
+            "scale": scale
+        })
+
+    with open(os.path.join(output, "labels.jsonl"), "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a labeled OCR benchmark corpus")
+    parser.add_argument("output", nargs="?", default="corpus", help="Output folder")
+    parser.add_argument("--count", type=int, default=100, help="Number of images")
+    parser.add_argument("--languages", nargs="+", default=LANGUAGES, choices=LANGUAGES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--font", action="append", default=[], help="Extra font file (repeatable)")
+    args = parser.parse_args()
+
+    fonts = find_fonts(args.font)
+    languages = []
+    for language in args.languages:
+        if fonts[LANGUAGE_SCRIPT.get(language, "latin")]:
+            languages.append(language)
+        else:
+            print(f"Skipping {language}: no font for its script found (pass one with --font)")
+    if not languages:
+        print("No usable fonts found")
+        return 1
+
+    records = generate(args.output, args.count, languages, args.seed, fonts)
+    print(f"Wrote {len(records)} images ({', '.join(languages)}) to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Load-test the app's provider code against the bundled stub server.
+
+Drives the real AIService (prompt building, rate limiting, retries, HTTP
+clients) with concurrent requests and reports throughput and tail latency.
+The stub runs in-process unless --url points at a running server.
+
+Usage:
+    python load_test.py --provider openai --requests 500 --concurrency 16
+    python load_test.py --provider ollama --latency-ms 150 --tokens-per-sec 40 --error-rate 0.05
+    python load_test.py --provider ollama --hosts 3 --parallel 2 --tokens-per-sec 40 --concurrency 12
+    python load_test.py --provider models --url http://localhost:8765
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from openai import OpenAI
+
+import core
+from benchmark_ocr import percentile
+from stub_server import add_stub_arguments, create_server, state_from_args
+
+SAMPLE_QUESTION = """Question 3 of 10
+Which planet in the solar system has the shortest orbital period?
+A) Venus
+B) Mercury
+C) Mars
+D) Jupiter
+Next  Previous  Submit"""
+
+
+def start_stub(args):
+    """Start the stub server in a background thread and return (server, base_url)."""
+    server = create_server(args.host, args.port, state_from_args(args))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def build_service(base_urls, args):
+    """Point the app's global clients at the stub(s) and build an AIService from in-memory settings."""
+    base_url = base_urls[0]
+    settings_manager = core.SettingsManager()
+    settings_manager.set("ai_provider", "ollama" if args.provider == "ollama" else "openai")
+    settings_manager.set("ollama_url", base_url)
+    settings_manager.set("ollama_urls", base_urls[1:])  # Extra hosts form an OllamaHostPool
+    settings_manager.set("openai_rpm_limit", args.rpm)
+    settings_manager.set("openai_tpm_limit", args.tpm)
+    settings_manager.set("openai_max_retries", args.max_retries)
+    settings_manager.set("max_tokens", args.max_tokens)
+    settings_manager.set("ollama_session_mode", args.ollama_session)
+
+    core.client = OpenAI(api_key="stub", base_url=f"{base_url}/v1")
+    core.http_session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=len(base_urls), pool_maxsize=args.concurrency)
+    core.http_session.mount("http://", adapter)
+
+    prompt_builder = core.PromptBuilder(settings_manager)
+    rate_limiter = core.RateLimiter(settings_manager)
+    service = core.AIService(settings_manager, prompt_builder, rate_limiter)
+    service.router.log_path = os.devnull  # Keep load-test traffic out of routing_log.jsonl
+    return service, settings_manager
+
+
+def run_load(service, settings_manager, args):
+    """Send args.requests requests with args.concurrency workers; return per-request results."""
+    retries = []
+
+    def on_retry(attempt, delay, error):
+        retries.append(delay)
+
+    def one(index):
+        question = f"{SAMPLE_QUESTION}\n(request {index})"
+        start = time.perf_counter()
+        try:
+            if args.provider == "openai":
+                service.ask_openai(question, on_retry=on_retry)
+            elif args.provider == "ollama":
+                service.ask_ollama(question, settings_manager.get("send_text_only"))
+            else:
+                service.list_ollama_models(settings_manager.get("ollama_url"))
+            error = None
+        except Exception as e:
+            error = e.__class__.__name__
+        return (time.perf_counter() - start) * 1000, error
+
+    # The router logs every routed request; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(one, range(args.requests)))
+        wall = time.perf_counter() - start
+
+    return results, wall, len(retries)
+
+
+def print_report(args, results, wall, retries, stub_states=()):
+    """Print throughput, error counts and latency percentiles."""
+    latencies = [ms for ms, error in results if error is None]
+    errors = {}
+    for _, error in results:
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+
+    print(f"provider={args.provider} requests={args.requests} concurrency={args.concurrency}")
+    print(f"  wall time     {wall:.2f}s")
+    print(f"  throughput    {len(latencies) / wall:.1f} ok req/s")
+    print(f"  succeeded     {len(latencies)}")
+    print(f"  failed        {sum(errors.values())} {errors if errors else ''}")
+    print(f"  retries       {retries}")
+    if stub_states:
+        injected = sum(state.error_count for state in stub_states)
+        served = [state.request_count for state in stub_states]
+        print(f"  injected      {injected} of {sum(served)} server requests")
+        if len(served) > 1:
+            print(f"  per host      {served}")
+    if latencies:
+        print(f"  latency ms    p50 {percentile(latencies, 50):.1f}  p95 {percentile(latencies, 95):.1f}  "
+              f"p99 {percentile(latencies, 99):.1f}  max {max(latencies):.1f}")
+
+
+def build_parser():
+    """Return the command-line parser; shared with the tests."""
+    parser = argparse.ArgumentParser(description="Load-test AIService against the stub server")
+    parser.add_argument("--provider", choices=["openai", "ollama", "models"], default="openai")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel workers")
+    parser.add_argument("--url", nargs="+", help="Use running server(s) instead of starting stubs")
+    parser.add_argument("--hosts", type=int, default=1, help="Number of in-process stubs (Ollama host pool)")
+    parser.add_argument("--rpm", type=int, default=100000, help="Client-side requests per minute limit")
+    parser.add_argument("--tpm", type=int, default=100000000, help="Client-side tokens per minute limit")
+    parser.add_argument("--max-retries", type=int, default=4, help="Retries for 429s and server errors")
+    parser.add_argument("--max-tokens", type=int, default=64, help="Completion token limit per request")
+    parser.add_argument("--ollama-session", choices=["off", "chat"], default="off",
+                        help="Ollama session mode; chat sends the session history with every request")
+    add_stub_arguments(parser)
+    parser.set_defaults(port=0)  # Pick a free port for the in-process stub
+    return parser
+
+
+def main_cli():
+    args = build_parser().parse_args()
+
+    servers = []
+    if args.url:
+        base_urls = [url.rstrip("/") for url in args.url]
+    else:
+        base_urls = []
+        for _ in range(args.hosts):
+            server, base_url = start_stub(args)
+            servers.append(server)
+            base_urls.append(base_url)
+
+    service, settings_manager = build_service(base_urls, args)
+    try:
+        results, wall, retries = run_load(service, settings_manager, args)
+        print_report(args, results, wall, retries, [server.RequestHandlerClass.state for server in servers])
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
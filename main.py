@@ -1,139 +1,93 @@
 import base64
 import io
-import json
 import os
+import sys
 import threading
+import time
 import tkinter as tk
 from tkinter import messagebox
 import customtkinter as ctk
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 import requests
 from openai import OpenAI
 
-import pyautogui
 from pynput.keyboard import Key, Listener
 
-# OCR libraries
-try:
-    import pytesseract
-    import easyocr
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
-    print("OCR libraries not found. Please install: pip install pytesseract easyocr")
+from core import (
+    AIService,
+    AnswerHistory,
+    CircuitBreaker,
+    MemoryManager,
+    ModelCatalog,
+    NearDuplicateIndex,
+    OCRProcessor,
+    Precapture,
+    ProfileManager,
+    PromptBuilder,
+    ProviderUnavailableError,
+    RateLimiter,
+    SettingsManager,
+    UsageTracker,
+    grab_screen,
+)
 
 # Set CustomTkinter appearance
 ctk.set_appearance_mode("dark")  # Modes: "System" (standard), "Dark", "Light"
 ctk.set_default_color_theme("blue")  # Themes: "blue" (standard), "green", "dark-blue"
 
-# Global client - will be initialized based on settings
-client = None
 
-
-class SettingsManager:
-    def __init__(self):
-        self.settings_file = "settings.json"
-        self.default_settings = {
-            "ai_provider": "openai",  # "openai" or "ollama"
-            "openai_model": "gpt-4o-mini",
-            "ollama_url": "http://localhost:11434",
-            "ollama_model": "gemma3:12b",
-            "max_tokens": 1000,
-            "temperature": 0.1,
-            "system_prompt": "You are an advanced AI assistant specializing in analyzing text extracted from images. Provide clear, accurate, and detailed answers based on the given text content. Focus on understanding the context and providing helpful responses in English with perfect grammar and contextual accuracy.",
-            "ocr_method": "pytesseract",  # "pytesseract" or "easyocr"
-            "send_text_only": True,  # If True, send only OCR text; if False, send both text and image
-            "ocr_language": "eng",  # Language for OCR (eng, spa, fra, deu, etc.)
-            "window_transparency": 0.9  # Window transparency (0.1 = very transparent, 1.0 = opaque)
-        }
-        self.settings = self.load_settings()
-    
-    def load_settings(self):
-        """Load settings from file or create default."""
-        try:
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r') as f:
-                    loaded_settings = json.load(f)
-                # Merge with defaults to handle new settings
-                settings = self.default_settings.copy()
-                settings.update(loaded_settings)
-                return settings
-            else:
-                return self.default_settings.copy()
-        except Exception as e:
-            print(f"Error loading settings: {e}")
-            return self.default_settings.copy()
-    
-    def save_settings(self):
-        """Save current settings to file."""
-        try:
-            with open(self.settings_file, 'w') as f:
-                json.dump(self.settings, f, indent=2)
-            return True
-        except Exception as e:
-            print(f"Error saving settings: {e}")
-            return False
-    
-    def get(self, key):
-        """Get a setting value."""
-        return self.settings.get(key, self.default_settings.get(key))
+class SettingsWindow:
+    """Settings dialog, built once and then hidden/shown; tab contents are built on first view."""
     
-    def set(self, key, value):
-        """Set a setting value."""
-        self.settings[key] = value
+    TABS = ["Provider", "Profiles", "Advanced", "OCR", "Interface"]
     
-    def initialize_ai_client(self):
-        """Initialize the AI client based on current settings."""
-        global client
-        try:
-            if self.get("ai_provider") == "openai":
-                # Get API key from environment variable
-                api_key = os.getenv("OPENAI_API_KEY")
-                if api_key:
-                    client = OpenAI(api_key=api_key)
-                else:
-                    # Try to use default OpenAI client (might have API key set elsewhere)
-                    client = OpenAI()
-                return True
-            else:  # ollama
-                # For Ollama, we'll use requests directly
-                client = None
-                return True
-        except Exception as e:
-            print(f"Error initializing AI client: {e}")
-            return False
-
-
-class SettingsWindow:
-    def __init__(self, parent, settings_manager, on_save_callback=None):
+    def __init__(self, parent, settings_manager, on_save_callback=None, profile_manager=None, model_catalog=None):
         self.parent = parent
         self.settings_manager = settings_manager
         self.on_save_callback = on_save_callback
+        self.profile_manager = profile_manager
+        self.model_catalog = model_catalog or ModelCatalog(settings_manager)
+        
+        # Form state lives in variables so it can be loaded and saved before a tab is built
+        self.provider_var = tk.StringVar()
+        self.openai_model_var = tk.StringVar()
+        self.ollama_url_var = tk.StringVar()
+        self.ollama_urls_var = tk.StringVar()  # Extra hosts, comma-separated
+        self.ollama_model_var = tk.StringVar()
+        self.ollama_session_mode_var = tk.StringVar()
+        self.ollama_auto_model_var = tk.BooleanVar()
+        self.max_tokens_var = tk.IntVar()
+        self.temperature_var = tk.DoubleVar()
+        self.reuse_mode_var = tk.StringVar()
+        self.send_text_only_var = tk.BooleanVar()
+        self.ocr_method_var = tk.StringVar()
+        self.ocr_language_var = tk.StringVar()
+        self.transparency_var = tk.DoubleVar()
+        self.profile_var = tk.StringVar()
+        self.system_prompt = ""  # Held here until the Advanced tab's textbox exists
+        self.ollama_models = None  # Model list for the combobox once fetched
+        
+        self.built_tabs = set()
+        self.busy = False  # A background network action is running
         
         # Create settings window
         self.window = ctk.CTkToplevel(parent)
         self.window.title("Settings")
         self.window.geometry("700x800")
         self.window.resizable(True, True)
-        
-        # Make settings window stay on top of everything including the main window
-        self.window.attributes("-topmost", True)
-        self.window.lift()
-        self.window.focus_force()
-        
-        # Center the window
-        self.window.transient(parent)
-        self.window.grab_set()
+        self.window.protocol("WM_DELETE_WINDOW", self.close_window)
         
         # Ensure the settings window appears above the parent
+        self.window.transient(parent)
         self.center_window()
         
         self.setup_ui()
-        self.load_current_settings()
+        self.show()
     
     def center_window(self):
-        """Center the settings window on the screen and ensure it's visible."""
+        """Center the settings window on the screen."""
         self.window.update_idletasks()
         
         # Get screen dimensions
@@ -143,16 +97,23 @@ class SettingsWindow:
         # Calculate position
         x = (screen_width - 700) // 2
         y = (screen_height - 800) // 2
-        
-        # Set position and bring to front
         self.window.geometry(f"700x800+{x}+{y}")
+    
+    def show(self):
+        """Load the current settings and bring the window to the front."""
+        self.load_current_settings()
         self.window.deiconify()
         self.window.lift()
+        
+        # Make settings window stay on top of everything including the main window
         self.window.attributes("-topmost", True)
         self.window.focus_force()
+        self.window.grab_set()
+        
+        self.prefetch_ollama_models()
     
     def setup_ui(self):
-        """Setup the settings UI with CustomTkinter."""
+        """Build the window frame and tabs; tab contents are built by ensure_tab_built."""
         # Main container
         main_container = ctk.CTkFrame(self.window)
         main_container.pack(fill="both", expand=True, padx=20, pady=20)
@@ -167,7 +128,7 @@ class SettingsWindow:
         
         # Buttons Frame at the top
         button_frame = ctk.CTkFrame(main_container, fg_color="transparent")
-        button_frame.pack(fill="x", pady=(0, 15))
+        button_frame.pack(fill="x", pady=(0, 10))
         
         # Test Connection Button
         self.test_button = ctk.CTkButton(
@@ -206,12 +167,123 @@ class SettingsWindow:
         )
         cancel_button.pack(side="right")
         
-        # Create scrollable frame for content
-        self.scrollable_frame = ctk.CTkScrollableFrame(main_container)
-        self.scrollable_frame.pack(fill="both", expand=True, pady=(0, 10))
+        # Progress of background network actions (hidden while idle)
+        self.progress_frame = ctk.CTkFrame(main_container, fg_color="transparent")
+        self.progress_label = ctk.CTkLabel(
+            self.progress_frame,
+            text="",
+            font=ctk.CTkFont(size=12),
+            text_color="gray70"
+        )
+        self.progress_label.pack(anchor="w")
+        self.progress_bar = ctk.CTkProgressBar(self.progress_frame, mode="indeterminate")
+        self.progress_bar.pack(fill="x", pady=(2, 0))
+        
+        # Tabs
+        self.tabview = ctk.CTkTabview(main_container, command=self.on_tab_changed)
+        self.tabview.pack(fill="both", expand=True, pady=(0, 10))
+        self.tab_builders = {
+            "Provider": self.build_provider_tab,
+            "Profiles": self.build_profiles_tab,
+            "Advanced": self.build_advanced_tab,
+            "OCR": self.build_ocr_tab,
+            "Interface": self.build_interface_tab
+        }
+        for name in self.TABS:
+            self.tabview.add(name)
+        self.tabview.set("Provider")
+        self.ensure_tab_built("Provider")
+    
+    def on_tab_changed(self):
+        """Build the selected tab the first time it is shown."""
+        self.ensure_tab_built(self.tabview.get())
+    
+    def ensure_tab_built(self, name):
+        """Build a tab's widgets if that has not happened yet."""
+        if name in self.built_tabs:
+            return
+        self.built_tabs.add(name)
+        container = ctk.CTkScrollableFrame(self.tabview.tab(name), fg_color="transparent")
+        container.pack(fill="both", expand=True)
+        self.tab_builders[name](container)
+    
+    def build_profiles_tab(self, container):
+        """Build the Profiles tab."""
+        profiles_frame = ctk.CTkFrame(container)
+        profiles_frame.pack(fill="x", pady=(0, 20), padx=20)
+        
+        profiles_title = ctk.CTkLabel(
+            profiles_frame, 
+            text="Profiles", 
+            font=ctk.CTkFont(size=16, weight="bold")
+        )
+        profiles_title.pack(pady=(15, 10))
+        
+        # Active profile selection
+        active_profile_frame = ctk.CTkFrame(profiles_frame, fg_color="transparent")
+        active_profile_frame.pack(fill="x", padx=20, pady=(0, 10))
+        
+        ctk.CTkLabel(
+            active_profile_frame, 
+            text="Active Profile:", 
+            font=ctk.CTkFont(size=14, weight="bold")
+        ).pack(side="left")
+        
+        self.profile_combo = ctk.CTkComboBox(
+            active_profile_frame, 
+            variable=self.profile_var,
+            values=[],
+            command=self.on_profile_selected,
+            state="readonly",
+            width=200
+        )
+        self.profile_combo.pack(side="right")
         
-        # AI Provider Section
-        provider_frame = ctk.CTkFrame(self.scrollable_frame)
+        # Save / delete profile
+        profile_edit_frame = ctk.CTkFrame(profiles_frame, fg_color="transparent")
+        profile_edit_frame.pack(fill="x", padx=20, pady=(0, 10))
+        
+        self.profile_name_entry = ctk.CTkEntry(
+            profile_edit_frame, 
+            placeholder_text="Profile name (e.g., Fast OpenAI, Local Gemma)",
+            font=ctk.CTkFont(size=12)
+        )
+        self.profile_name_entry.pack(side="left", fill="x", expand=True, padx=(0, 10))
+        
+        ctk.CTkButton(
+            profile_edit_frame,
+            text="Save as Profile",
+            command=self.save_profile,
+            font=ctk.CTkFont(size=12),
+            width=120,
+            height=32
+        ).pack(side="left", padx=(0, 10))
+        
+        ctk.CTkButton(
+            profile_edit_frame,
+            text="Delete",
+            command=self.delete_profile,
+            font=ctk.CTkFont(size=12),
+            width=70,
+            height=32,
+            fg_color="red",
+            hover_color="dark red"
+        ).pack(side="right")
+        
+        # Profiles help
+        profiles_help = ctk.CTkLabel(
+            profiles_frame, 
+            text="A profile stores provider, model, prompt and OCR settings. Press F9 to switch profiles instantly.", 
+            font=ctk.CTkFont(size=11),
+            text_color="gray70"
+        )
+        profiles_help.pack(anchor="w", padx=20, pady=(0, 15))
+        
+        self.refresh_profile_list()
+    
+    def build_provider_tab(self, container):
+        """Build the Provider tab (provider choice, OpenAI and Ollama settings)."""
+        provider_frame = ctk.CTkFrame(container)
         provider_frame.pack(fill="x", pady=(0, 20), padx=20)
         
         provider_title = ctk.CTkLabel(
@@ -221,8 +293,6 @@ class SettingsWindow:
         )
         provider_title.pack(pady=(15, 10))
         
-        self.provider_var = tk.StringVar()
-        
         openai_radio = ctk.CTkRadioButton(
             provider_frame, 
             text="OpenAI (GPT-4 Vision)", 
@@ -244,7 +314,7 @@ class SettingsWindow:
         ollama_radio.pack(anchor="w", padx=20, pady=(5, 15))
         
         # OpenAI Settings Frame
-        self.openai_frame = ctk.CTkFrame(self.scrollable_frame)
+        self.openai_frame = ctk.CTkFrame(container)
         self.openai_frame.pack(fill="x", pady=(0, 20), padx=20)
         
         openai_title = ctk.CTkLabel(
@@ -282,7 +352,6 @@ class SettingsWindow:
             font=ctk.CTkFont(size=14, weight="bold")
         ).pack(anchor="w", padx=20, pady=(10, 5))
         
-        self.openai_model_var = tk.StringVar()
         openai_model_combo = ctk.CTkComboBox(
             self.openai_frame, 
             variable=self.openai_model_var,
@@ -292,7 +361,7 @@ class SettingsWindow:
         openai_model_combo.pack(fill="x", padx=20, pady=(0, 15))
         
         # Ollama Settings Frame
-        self.ollama_frame = ctk.CTkFrame(self.scrollable_frame)
+        self.ollama_frame = ctk.CTkFrame(container)
         self.ollama_frame.pack(fill="x", pady=(0, 20), padx=20)
         
         ollama_title = ctk.CTkLabel(
@@ -311,6 +380,7 @@ class SettingsWindow:
         
         self.ollama_url_entry = ctk.CTkEntry(
             self.ollama_frame, 
+            textvariable=self.ollama_url_var,
             placeholder_text="Enter Ollama URL (e.g., http://localhost:11434)",
             font=ctk.CTkFont(size=12)
         )
@@ -325,6 +395,27 @@ class SettingsWindow:
         )
         url_help.pack(anchor="w", padx=20, pady=(0, 10))
         
+        # Extra hosts for load balancing
+        ctk.CTkLabel(
+            self.ollama_frame, 
+            text="Additional Ollama URLs:", 
+            font=ctk.CTkFont(size=14, weight="bold")
+        ).pack(anchor="w", padx=20, pady=(5, 5))
+        
+        ctk.CTkEntry(
+            self.ollama_frame, 
+            textvariable=self.ollama_urls_var,
+            placeholder_text="Optional, comma-separated (e.g., http://192.168.1.101:11434, http://192.168.1.102:11434)",
+            font=ctk.CTkFont(size=12)
+        ).pack(fill="x", padx=20, pady=(0, 5))
+        
+        ctk.CTkLabel(
+            self.ollama_frame, 
+            text="Each request goes to the least-loaded healthy host; unhealthy hosts are skipped until they recover.", 
+            font=ctk.CTkFont(size=11),
+            text_color="gray70"
+        ).pack(anchor="w", padx=20, pady=(0, 10))
+        
         # Model selection
         ctk.CTkLabel(
             self.ollama_frame, 
@@ -336,17 +427,16 @@ class SettingsWindow:
         model_frame = ctk.CTkFrame(self.ollama_frame, fg_color="transparent")
         model_frame.pack(fill="x", padx=20, pady=(0, 10))
         
-        self.ollama_model_var = tk.StringVar()
         self.ollama_model_combo = ctk.CTkComboBox(
             model_frame, 
             variable=self.ollama_model_var,
-            values=["llava", "llava:7b", "llava:13b", "llava:34b", "bakllava", "moondream", "minicpm-v"],
+            values=self.ollama_models or ["llava", "llava:7b", "llava:13b", "llava:34b", "bakllava", "moondream", "minicpm-v"],
             state="readonly"
         )
         self.ollama_model_combo.pack(side="left", fill="x", expand=True, padx=(0, 10))
         
         # Refresh models button
-        refresh_btn = ctk.CTkButton(
+        self.refresh_button = ctk.CTkButton(
             model_frame,
             text="🔄",
             command=self.refresh_ollama_models,
@@ -354,19 +444,50 @@ class SettingsWindow:
             width=40,
             height=32
         )
-        refresh_btn.pack(side="right")
+        self.refresh_button.pack(side="right")
         
         # Model help
         model_help = ctk.CTkLabel(
             self.ollama_frame, 
-            text="Common vision models: llava, bakllava, moondream. Click 🔄 to fetch available models.", 
+            text="Vision-capable models are listed first. Click 🔄 to re-scan the server.",
             font=ctk.CTkFont(size=11),
             text_color="gray70"
         )
-        model_help.pack(anchor="w", padx=20, pady=(0, 15))
+        model_help.pack(anchor="w", padx=20, pady=(0, 10))
+        
+        # Chat session mode
+        session_frame = ctk.CTkFrame(self.ollama_frame, fg_color="transparent")
+        session_frame.pack(fill="x", padx=20, pady=(0, 15))
+        
+        ctk.CTkLabel(
+            session_frame, 
+            text="Session Mode:", 
+            font=ctk.CTkFont(size=14)
+        ).pack(side="left")
+        
+        ollama_session_combo = ctk.CTkComboBox(
+            session_frame, 
+            variable=self.ollama_session_mode_var,
+            values=["chat", "off"],
+            state="readonly",
+            width=100
+        )
+        ollama_session_combo.pack(side="right")
         
-        # Advanced Settings Frame
-        advanced_frame = ctk.CTkFrame(self.scrollable_frame)
+        # Automatic model choice from the catalog
+        auto_model_checkbox = ctk.CTkCheckBox(
+            self.ollama_frame,
+            text="Pick the smallest installed model that can answer automatically",
+            variable=self.ollama_auto_model_var,
+            font=ctk.CTkFont(size=12)
+        )
+        auto_model_checkbox.pack(anchor="w", padx=20, pady=(0, 15))
+        
+        self.on_provider_change()
+    
+    def build_advanced_tab(self, container):
+        """Build the Advanced tab (prompt, token and reuse settings)."""
+        advanced_frame = ctk.CTkFrame(container)
         advanced_frame.pack(fill="x", pady=(0, 20), padx=20)
         
         advanced_title = ctk.CTkLabel(
@@ -390,6 +511,7 @@ class SettingsWindow:
             wrap="word"
         )
         self.system_prompt_textbox.pack(fill="x", padx=20, pady=(0, 15))
+        self.system_prompt_textbox.insert("0.0", self.system_prompt)
         
         # Max Tokens
         tokens_frame = ctk.CTkFrame(advanced_frame, fg_color="transparent")
@@ -401,7 +523,6 @@ class SettingsWindow:
             font=ctk.CTkFont(size=14)
         ).pack(side="left")
         
-        self.max_tokens_var = tk.IntVar()
         tokens_entry = ctk.CTkEntry(
             tokens_frame, 
             textvariable=self.max_tokens_var,
@@ -420,7 +541,6 @@ class SettingsWindow:
             font=ctk.CTkFont(size=14)
         ).pack(side="left")
         
-        self.temperature_var = tk.DoubleVar()
         temp_entry = ctk.CTkEntry(
             temp_frame, 
             textvariable=self.temperature_var,
@@ -429,8 +549,28 @@ class SettingsWindow:
         )
         temp_entry.pack(side="right")
         
-        # OCR Settings Frame
-        ocr_frame = ctk.CTkFrame(self.scrollable_frame)
+        # Reuse answers for similar questions
+        reuse_frame = ctk.CTkFrame(advanced_frame, fg_color="transparent")
+        reuse_frame.pack(fill="x", padx=20, pady=(0, 15))
+        
+        ctk.CTkLabel(
+            reuse_frame, 
+            text="Reuse Answers for Similar Questions:", 
+            font=ctk.CTkFont(size=14)
+        ).pack(side="left")
+        
+        reuse_mode_combo = ctk.CTkComboBox(
+            reuse_frame, 
+            variable=self.reuse_mode_var,
+            values=["off", "offer", "auto"],
+            state="readonly",
+            width=100
+        )
+        reuse_mode_combo.pack(side="right")
+    
+    def build_ocr_tab(self, container):
+        """Build the OCR tab."""
+        ocr_frame = ctk.CTkFrame(container)
         ocr_frame.pack(fill="x", pady=(0, 20), padx=20)
         
         ocr_title = ctk.CTkLabel(
@@ -441,7 +581,6 @@ class SettingsWindow:
         ocr_title.pack(pady=(15, 10))
         
         # Send text only option
-        self.send_text_only_var = tk.BooleanVar()
         send_text_checkbox = ctk.CTkCheckBox(
             ocr_frame,
             text="Send only extracted text to AI (recommended for better processing)",
@@ -460,11 +599,10 @@ class SettingsWindow:
             font=ctk.CTkFont(size=14, weight="bold")
         ).pack(side="left")
         
-        self.ocr_method_var = tk.StringVar()
         ocr_method_combo = ctk.CTkComboBox(
             ocr_method_frame, 
             variable=self.ocr_method_var,
-            values=["pytesseract", "easyocr"],
+            values=["pytesseract", "easyocr", "easyocr_onnx", "cascade"],
             state="readonly",
             width=150
         )
@@ -480,11 +618,10 @@ class SettingsWindow:
             font=ctk.CTkFont(size=14, weight="bold")
         ).pack(side="left")
         
-        self.ocr_language_var = tk.StringVar()
         ocr_lang_combo = ctk.CTkComboBox(
             ocr_lang_frame, 
             variable=self.ocr_language_var,
-            values=["eng", "spa", "fra", "deu", "ita", "por", "rus", "chi_sim", "chi_tra", "jpn", "kor"],
+            values=["auto", "eng", "spa", "fra", "deu", "ita", "por", "rus", "chi_sim", "chi_tra", "jpn", "kor"],
             state="readonly",
             width=150
         )
@@ -493,14 +630,15 @@ class SettingsWindow:
         # OCR help
         ocr_help = ctk.CTkLabel(
             ocr_frame, 
-            text="OCR extracts text from images. Languages: eng=English, spa=Spanish, fra=French, deu=German, etc.", 
+            text="OCR extracts text from images. Languages: auto=detect per capture, eng=English, spa=Spanish, fra=French, deu=German, etc.", 
             font=ctk.CTkFont(size=11),
             text_color="gray70"
         )
         ocr_help.pack(anchor="w", padx=20, pady=(0, 15))
-        
-        # UI Settings Frame
-        ui_frame = ctk.CTkFrame(self.scrollable_frame)
+    
+    def build_interface_tab(self, container):
+        """Build the Interface tab."""
+        ui_frame = ctk.CTkFrame(container)
         ui_frame.pack(fill="x", pady=(0, 20), padx=20)
         
         ui_title = ctk.CTkLabel(
@@ -520,7 +658,6 @@ class SettingsWindow:
             font=ctk.CTkFont(size=14, weight="bold")
         ).pack(side="left")
         
-        self.transparency_var = tk.DoubleVar()
         transparency_slider = ctk.CTkSlider(
             transparency_frame,
             from_=0.3,
@@ -535,7 +672,7 @@ class SettingsWindow:
         # Transparency value label
         self.transparency_label = ctk.CTkLabel(
             transparency_frame,
-            text="90%",
+            text=f"{int(self.transparency_var.get() * 100)}%",
             font=ctk.CTkFont(size=12),
             width=40
         )
@@ -563,25 +700,28 @@ class SettingsWindow:
             print(f"Error changing transparency: {e}")
     
     def close_window(self):
-        """Close the settings window and restore main window focus."""
+        """Hide the settings window for reuse and restore main window focus."""
         try:
+            self.window.grab_release()
+            self.window.withdraw()
             # Restore main window topmost
             self.parent.attributes("-topmost", True)
             self.parent.lift()
-            self.window.destroy()
         except Exception as e:
             print(f"Error closing settings window: {e}")
-            self.window.destroy()
     
     def load_current_settings(self):
-        """Load current settings into the UI."""
+        """Load current settings into the form."""
         self.provider_var.set(self.settings_manager.get("ai_provider"))
         self.openai_model_var.set(self.settings_manager.get("openai_model"))
-        self.ollama_url_entry.delete(0, "end")
-        self.ollama_url_entry.insert(0, self.settings_manager.get("ollama_url"))
+        self.ollama_url_var.set(self.settings_manager.get("ollama_url"))
+        self.ollama_urls_var.set(", ".join(self.settings_manager.get("ollama_urls") or []))
         self.ollama_model_var.set(self.settings_manager.get("ollama_model"))
+        self.ollama_session_mode_var.set(self.settings_manager.get("ollama_session_mode"))
+        self.ollama_auto_model_var.set(self.settings_manager.get("ollama_auto_model"))
         self.max_tokens_var.set(self.settings_manager.get("max_tokens"))
         self.temperature_var.set(self.settings_manager.get("temperature"))
+        self.reuse_mode_var.set(self.settings_manager.get("reuse_mode"))
         
         # Load OCR settings
         self.send_text_only_var.set(self.settings_manager.get("send_text_only"))
@@ -591,17 +731,77 @@ class SettingsWindow:
         # Load UI settings
         transparency = self.settings_manager.get("window_transparency")
         self.transparency_var.set(transparency)
-        percentage = int(transparency * 100)
-        self.transparency_label.configure(text=f"{percentage}%")
+        if "Interface" in self.built_tabs:
+            self.transparency_label.configure(text=f"{int(transparency * 100)}%")
         
         # Load system prompt
-        self.system_prompt_textbox.delete("0.0", "end")
-        self.system_prompt_textbox.insert("0.0", self.settings_manager.get("system_prompt"))
+        self.system_prompt = self.settings_manager.get("system_prompt")
+        if "Advanced" in self.built_tabs:
+            self.system_prompt_textbox.delete("0.0", "end")
+            self.system_prompt_textbox.insert("0.0", self.system_prompt)
+        
+        # Load profiles
+        self.refresh_profile_list()
         
         self.on_provider_change()
     
+    def refresh_profile_list(self):
+        """Reload the profile names into the profile combobox."""
+        self.profile_var.set(self.settings_manager.get("active_profile") or "")
+        if "Profiles" in self.built_tabs:
+            names = self.profile_manager.get_names() if self.profile_manager else []
+            self.profile_combo.configure(values=names)
+    
+    def on_profile_selected(self, name):
+        """Activate the selected profile and show its settings."""
+        if not self.profile_manager:
+            return
+        if self.profile_manager.activate(name):
+            self.load_current_settings()
+            self.profile_name_entry.delete(0, "end")
+            self.profile_name_entry.insert(0, name)
+            if self.on_save_callback:
+                self.on_save_callback()
+    
+    def save_profile(self):
+        """Save the current form values as a named profile."""
+        if not self.profile_manager:
+            return
+        
+        name = self.profile_name_entry.get().strip()
+        if not name:
+            messagebox.showerror("Error", "Please enter a profile name")
+            return
+        
+        try:
+            self.apply_form_to_settings()
+            if self.profile_manager.save_profile(name):
+                self.profile_manager.activate(name)
+                self.refresh_profile_list()
+                messagebox.showinfo("Success", f"✅ Profile '{name}' saved!")
+            else:
+                messagebox.showerror("Error", "Failed to save profile")
+        except Exception as e:
+            messagebox.showerror("Error", f"Error saving profile:\n{str(e)}")
+    
+    def delete_profile(self):
+        """Delete the selected profile."""
+        if not self.profile_manager:
+            return
+        
+        name = self.profile_var.get()
+        if not name:
+            messagebox.showerror("Error", "Please select a profile to delete")
+            return
+        
+        if self.profile_manager.delete_profile(name):
+            self.refresh_profile_list()
+            messagebox.showinfo("Success", f"Profile '{name}' deleted")
+    
     def on_provider_change(self):
         """Handle provider change to show/hide relevant sections."""
+        if "Provider" not in self.built_tabs:
+            return
         provider = self.provider_var.get()
         if provider == "openai":
             self.openai_frame.pack(fill="x", pady=(0, 20), padx=20, before=self.ollama_frame)
@@ -610,78 +810,140 @@ class SettingsWindow:
             self.ollama_frame.pack(fill="x", pady=(0, 20), padx=20, before=self.openai_frame)
             self.openai_frame.pack_forget()
     
+    def run_in_background(self, message, work, on_done):
+        """Run work() in a thread with a progress indicator, then on_done(result, error) on the Tk thread."""
+        if self.busy:
+            return
+        self.busy = True
+        self.test_button.configure(state="disabled")
+        if "Provider" in self.built_tabs:
+            self.refresh_button.configure(state="disabled")
+        self.progress_label.configure(text=message)
+        self.progress_frame.pack(fill="x", pady=(0, 10), before=self.tabview)
+        self.progress_bar.start()
+        
+        def finish(result, error):
+            self.busy = False
+            self.progress_bar.stop()
+            self.progress_frame.pack_forget()
+            self.test_button.configure(state="normal")
+            if "Provider" in self.built_tabs:
+                self.refresh_button.configure(state="normal")
+            on_done(result, error)
+        
+        def run():
+            try:
+                result, error = work(), None
+            except Exception as e:
+                result, error = None, e
+            try:
+                self.window.after(0, finish, result, error)
+            except (RuntimeError, tk.TclError):
+                pass  # Window destroyed while the request was running
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def prefetch_ollama_models(self):
+        """Fill the Ollama model list from the cached catalog, refreshing it in the background if stale."""
+        url = self.ollama_url_var.get().strip()
+        if self.provider_var.get() != "ollama" or not url:
+            return
+        
+        models = self.model_catalog.cached(url)
+        if models:
+            self.set_ollama_models(models)
+        if self.model_catalog.is_fresh(url):
+            return
+        
+        def on_done(models):
+            try:
+                self.window.after(0, self.set_ollama_models, models)
+            except (RuntimeError, tk.TclError):
+                pass  # Window destroyed meanwhile
+        
+        # Errors stay quiet here; the 🔄 button reports them
+        self.model_catalog.refresh_async(url, on_done)
+    
+    def set_ollama_models(self, models):
+        """Show catalog models ({name: info}) in the combobox, vision-capable models first."""
+        self.ollama_models = ModelCatalog.sort_names(models)
+        if "Provider" in self.built_tabs and self.ollama_models:
+            self.ollama_model_combo.configure(values=self.ollama_models)
+    
+    @staticmethod
+    def describe_model(name, info):
+        """Return a one-line summary of a catalog model."""
+        facts = [info.get("parameter_size") or "?"]
+        if info.get("context_length"):
+            facts.append(f"{info['context_length'] // 1024}k context")
+        if info.get("vision"):
+            facts.append("vision")
+        return f"{name} ({', '.join(facts)})"
+    
     def refresh_ollama_models(self):
-        """Fetch available models from Ollama instance."""
-        try:
-            url = self.ollama_url_entry.get().strip()
-            if not url:
-                messagebox.showerror("Error", "Please enter Ollama URL first")
+        """Fetch available models and their capabilities from the Ollama instance."""
+        url = self.ollama_url_var.get().strip()
+        if not url:
+            messagebox.showerror("Error", "Please enter Ollama URL first")
+            return
+        
+        def done(models, error):
+            if isinstance(error, requests.exceptions.RequestException):
+                messagebox.showerror("Connection Error", f"Cannot connect to Ollama:\n{str(error)}")
+                return
+            if error:
+                messagebox.showerror("Error", f"Error fetching models:\n{str(error)}")
                 return
             
-            # Fetch models from Ollama
-            response = requests.get(f"{url}/api/tags", timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                models = [model['name'] for model in data.get('models', [])]
-                
-                # Filter for vision models (models that typically support images)
-                vision_keywords = ['llava', 'bakllava', 'moondream', 'minicpm-v', 'vision']
-                vision_models = [m for m in models if any(keyword in m.lower() for keyword in vision_keywords)]
-                
-                if vision_models:
-                    # Update combobox values
-                    self.ollama_model_combo.configure(values=vision_models)
-                    messagebox.showinfo("Success", f"Found {len(vision_models)} vision models:\n" + "\n".join(vision_models[:5]))
-                else:
-                    # Show all models if no vision models found
-                    self.ollama_model_combo.configure(values=models[:10])  # Limit to first 10
-                    messagebox.showinfo("Models Found", f"Found {len(models)} models (showing first 10):\n" + "\n".join(models[:5]))
-            else:
-                messagebox.showerror("Error", f"Failed to fetch models: {response.status_code}")
-                
-        except requests.exceptions.RequestException as e:
-            messagebox.showerror("Connection Error", f"Cannot connect to Ollama:\n{str(e)}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error fetching models:\n{str(e)}")
+            self.set_ollama_models(models)
+            names = ModelCatalog.sort_names(models)
+            vision_count = sum(1 for info in models.values() if info.get("vision"))
+            lines = [self.describe_model(name, models[name]) for name in names[:15]]
+            if len(names) > 15:
+                lines.append(f"... and {len(names) - 15} more in the model list")
+            messagebox.showinfo("Models Found", f"Found {len(models)} models, {vision_count} with vision:\n" + "\n".join(lines))
+        
+        # The button always bypasses the catalog cache
+        self.run_in_background(f"Fetching models from {url}...", lambda: self.model_catalog.details(url, force=True), done)
     
     def test_connection(self):
         """Test the connection to the selected AI provider."""
         provider = self.provider_var.get()
         
-        try:
-            if provider == "openai":
-                # Check if API key is available
-                api_key = os.getenv("OPENAI_API_KEY")
-                if not api_key:
-                    messagebox.showerror("Error", "OPENAI_API_KEY environment variable not found.\n\nPlease set it in your system environment or terminal:\nexport OPENAI_API_KEY='your-api-key-here'")
-                    return
-                
-                test_client = OpenAI(api_key=api_key)
+        if provider == "openai":
+            # Check if API key is available
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                messagebox.showerror("Error", "OPENAI_API_KEY environment variable not found.\n\nPlease set it in your system environment or terminal:\nexport OPENAI_API_KEY='your-api-key-here'")
+                return
+            model = self.openai_model_var.get()
+            
+            def work():
+                test_client = OpenAI(api_key=api_key, timeout=30)
                 # Simple test request
-                response = test_client.chat.completions.create(
-                    model=self.openai_model_var.get(),
+                test_client.chat.completions.create(
+                    model=model,
                     messages=[{"role": "user", "content": "Hello"}],
                     max_tokens=10
                 )
-                messagebox.showinfo("Success", "✅ OpenAI connection successful!")
-                
-            else:  # ollama
-                url = self.ollama_url_entry.get().strip()
-                model = self.ollama_model_var.get()
-                
-                if not url:
-                    messagebox.showerror("Error", "Please enter Ollama URL")
-                    return
-                    
-                if not model:
-                    messagebox.showerror("Error", "Please select a model")
-                    return
-                
+                return "✅ OpenAI connection successful!"
+        
+        else:  # ollama
+            url = self.ollama_url_var.get().strip()
+            model = self.ollama_model_var.get()
+            
+            if not url:
+                messagebox.showerror("Error", "Please enter Ollama URL")
+                return
+            
+            if not model:
+                messagebox.showerror("Error", "Please select a model")
+                return
+            
+            def work():
                 # Test Ollama connection with a simple text request first
-                test_url = f"{url}/api/generate"
                 response = requests.post(
-                    test_url,
+                    f"{url}/api/generate",
                     json={
                         "model": model,
                         "prompt": "Hello",
@@ -689,14 +951,42 @@ class SettingsWindow:
                     },
                     timeout=30
                 )
-                
-                if response.status_code == 200:
-                    messagebox.showinfo("Success", f"✅ Ollama connection successful!\nModel '{model}' is working.")
-                else:
-                    messagebox.showerror("Error", f"Ollama connection failed: {response.status_code}\n\nMake sure:\n1. Ollama is running\n2. Model '{model}' is installed\n3. URL is correct")
-                    
-        except Exception as e:
-            messagebox.showerror("Error", f"Connection test failed:\n{str(e)}")
+                if response.status_code != 200:
+                    raise RuntimeError(f"Ollama connection failed: {response.status_code}\n\nMake sure:\n1. Ollama is running\n2. Model '{model}' is installed\n3. URL is correct")
+                return f"✅ Ollama connection successful!\nModel '{model}' is working."
+        
+        def done(message, error):
+            if error:
+                messagebox.showerror("Error", f"Connection test failed:\n{str(error)}")
+            else:
+                messagebox.showinfo("Success", message)
+        
+        self.run_in_background(f"Testing {provider} connection...", work, done)
+    
+    def apply_form_to_settings(self):
+        """Copy the values from the form into the settings manager."""
+        if "Advanced" in self.built_tabs:
+            self.system_prompt = self.system_prompt_textbox.get("0.0", "end-1c")
+        
+        self.settings_manager.set("ai_provider", self.provider_var.get())
+        self.settings_manager.set("openai_model", self.openai_model_var.get())
+        self.settings_manager.set("ollama_url", self.ollama_url_var.get().strip())
+        self.settings_manager.set("ollama_urls", [url.strip() for url in self.ollama_urls_var.get().split(",") if url.strip()])
+        self.settings_manager.set("ollama_model", self.ollama_model_var.get())
+        self.settings_manager.set("ollama_session_mode", self.ollama_session_mode_var.get())
+        self.settings_manager.set("ollama_auto_model", self.ollama_auto_model_var.get())
+        self.settings_manager.set("max_tokens", self.max_tokens_var.get())
+        self.settings_manager.set("temperature", self.temperature_var.get())
+        self.settings_manager.set("reuse_mode", self.reuse_mode_var.get())
+        self.settings_manager.set("system_prompt", self.system_prompt)
+        
+        # Update OCR settings
+        self.settings_manager.set("send_text_only", self.send_text_only_var.get())
+        self.settings_manager.set("ocr_method", self.ocr_method_var.get())
+        self.settings_manager.set("ocr_language", self.ocr_language_var.get())
+        
+        # Update UI settings
+        self.settings_manager.set("window_transparency", self.transparency_var.get())
     
     def save_settings(self):
         """Save the current settings."""
@@ -710,34 +1000,22 @@ class SettingsWindow:
                     messagebox.showerror("Error", "Please select an OpenAI model")
                     return
             else:  # ollama
-                if not self.ollama_url_entry.get().strip():
+                if not self.ollama_url_var.get().strip():
                     messagebox.showerror("Error", "Please enter Ollama URL")
                     return
                 if not self.ollama_model_var.get():
                     messagebox.showerror("Error", "Please select an Ollama model")
                     return
             
-            # Update settings
-            self.settings_manager.set("ai_provider", self.provider_var.get())
-            self.settings_manager.set("openai_model", self.openai_model_var.get())
-            self.settings_manager.set("ollama_url", self.ollama_url_entry.get().strip())
-            self.settings_manager.set("ollama_model", self.ollama_model_var.get())
-            self.settings_manager.set("max_tokens", self.max_tokens_var.get())
-            self.settings_manager.set("temperature", self.temperature_var.get())
-            self.settings_manager.set("system_prompt", self.system_prompt_textbox.get("0.0", "end-1c"))
-            
-            # Update OCR settings
-            self.settings_manager.set("send_text_only", self.send_text_only_var.get())
-            self.settings_manager.set("ocr_method", self.ocr_method_var.get())
-            self.settings_manager.set("ocr_language", self.ocr_language_var.get())
-            
-            # Update UI settings
-            self.settings_manager.set("window_transparency", self.transparency_var.get())
+            self.apply_form_to_settings()
             
             # Save to file
             if self.settings_manager.save_settings():
-                # Initialize AI client with new settings
-                self.settings_manager.initialize_ai_client()
+                # Rebuild the AI client only if it no longer fits; warm profile clients are kept
+                if self.profile_manager:
+                    self.profile_manager.refresh_client()
+                else:
+                    self.settings_manager.initialize_ai_client()
                 
                 # Call callback if provided
                 if self.on_save_callback:
@@ -748,93 +1026,305 @@ class SettingsWindow:
                 self.close_window()
             else:
                 messagebox.showerror("Error", "Failed to save settings")
-                
+        
         except Exception as e:
             messagebox.showerror("Error", f"Error saving settings:\n{str(e)}")
 
 
+class SamplingProfiler:
+    """Sampling profiler over all threads, plus a cProfile of the Tk main thread.
+    
+    Nothing is installed while it is off: the sampler thread and the cProfile hook
+    exist only between start() and stop().
+    """
+    
+    def __init__(self, root, interval_ms=10, output_dir="profiles", on_saved=None):
+        self.root = root
+        self.interval = interval_ms / 1000
+        self.output_dir = output_dir
+        self.on_saved = on_saved  # Called on the Tk thread with (collapsed_path, prof_path, samples)
+        self.running = False
+        self.samples = {}  # collapsed stack -> sample count
+        self.sample_count = 0
+        self.stop_event = None
+        self.thread = None
+        self.main_profile = None
+    
+    def start(self):
+        """Start sampling all threads and profiling the Tk main thread."""
+        if self.running:
+            return
+        self.running = True
+        self.samples = {}
+        self.sample_count = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._sample, name="SamplingProfiler", daemon=True)
+        self.thread.start()
+        # cProfile only hooks the thread that enables it, so enable it inside the Tk loop
+        self.root.after(0, self._enable_main_profile)
+    
+    def stop(self):
+        """Stop profiling; the results are written on the Tk thread."""
+        if not self.running:
+            return
+        self.running = False
+        self.stop_event.set()
+        self.thread.join()
+        if threading.current_thread() is threading.main_thread():
+            self._finish()
+        else:
+            self.root.after(0, self._finish)
+    
+    def toggle(self):
+        """Start if stopped, stop if running; return True if now running."""
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+        return self.running
+    
+    def _enable_main_profile(self):
+        """Enable cProfile on the calling (Tk main) thread."""
+        import cProfile
+        self.main_profile = cProfile.Profile()
+        self.main_profile.enable()
+    
+    def _sample(self):
+        """Record the stack of every other thread at a fixed interval."""
+        own = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+            self.sample_count += 1
+    
+    def _finish(self):
+        """Disable cProfile and write the collapsed stacks and the cProfile dump."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
+        # Collapsed stacks (one "frame;frame;frame count" line per stack) for flamegraph.pl / speedscope
+        collapsed_path = os.path.join(self.output_dir, f"profile_{stamp}.collapsed")
+        with open(collapsed_path, "w") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+        
+        prof_path = None
+        if self.main_profile is not None:
+            self.main_profile.disable()
+            prof_path = os.path.join(self.output_dir, f"profile_{stamp}_main.prof")
+            self.main_profile.dump_stats(prof_path)
+            self.main_profile = None
+        
+        print(f"Profile saved: {collapsed_path} ({self.sample_count} samples), {prof_path}")
+        if self.on_saved:
+            self.on_saved(collapsed_path, prof_path, self.sample_count)
+
 
-class OCRProcessor:
-    """Handle OCR text extraction from images."""
+class HistoryWindow:
+    """Searchable answer history with a virtualized list that only draws the visible rows."""
     
-    def __init__(self, settings_manager):
-        self.settings_manager = settings_manager
-        self.easyocr_reader = None
+    ROW_HEIGHT = 44
+    PAGE_SIZE = 100
+    MAX_CACHED_PAGES = 20
     
-    def extract_text(self, image):
-        """Extract text from an image using the configured OCR method."""
-        if not OCR_AVAILABLE:
-            return "OCR libraries not available. Please install: pip install pytesseract easyocr"
+    def __init__(self, parent, history):
+        self.parent = parent
+        self.history = history
+        self.query = ""
+        self.total = 0
+        self.top_index = 0  # Index of the first visible row
+        self.selected_id = None
+        self.pages = OrderedDict()  # page number -> rows, least recently used first
+        self.search_job = None
         
-        method = self.settings_manager.get("ocr_method")
-        language = self.settings_manager.get("ocr_language")
+        self.window = ctk.CTkToplevel(parent)
+        self.window.title("Answer History")
+        self.window.geometry("800x700")
+        self.window.attributes("-topmost", True)
+        self.window.lift()
         
-        try:
-            if method == "pytesseract":
-                return self._extract_with_pytesseract(image, language)
-            elif method == "easyocr":
-                return self._extract_with_easyocr(image, language)
-            else:
-                return f"Unknown OCR method: {method}"
-        except Exception as e:
-            return f"OCR extraction failed: {str(e)}"
+        self.setup_ui()
+        self.reload()
     
-    def _extract_with_pytesseract(self, image, language):
-        """Extract text using pytesseract."""
-        try:
-            import pytesseract
-            # Configure language for pytesseract
-            text = pytesseract.image_to_string(image, lang=language)
-            return text.strip()
-        except ImportError:
-            return "pytesseract not installed. Please install: pip install pytesseract"
-        except Exception as e:
-            return f"Pytesseract error: {str(e)}"
+    def setup_ui(self):
+        """Setup the search box, the virtual list and the detail view."""
+        main_container = ctk.CTkFrame(self.window)
+        main_container.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        # Search bar
+        search_frame = ctk.CTkFrame(main_container, fg_color="transparent")
+        search_frame.pack(fill="x", padx=10, pady=(10, 5))
+        
+        self.search_entry = ctk.CTkEntry(
+            search_frame,
+            placeholder_text="🔍 Search questions and answers...",
+            font=ctk.CTkFont(size=14)
+        )
+        self.search_entry.pack(side="left", fill="x", expand=True)
+        self.search_entry.bind("<KeyRelease>", self.on_search_changed)
+        
+        self.count_label = ctk.CTkLabel(search_frame, text="", font=ctk.CTkFont(size=12), width=150)
+        self.count_label.pack(side="right", padx=(10, 0))
+        
+        # Virtual list: a canvas that only draws the rows in view
+        list_frame = ctk.CTkFrame(main_container)
+        list_frame.pack(fill="both", expand=True, padx=10, pady=5)
+        
+        self.canvas = tk.Canvas(list_frame, bg="gray14", highlightthickness=0)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        
+        self.scrollbar = ctk.CTkScrollbar(list_frame, command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        
+        self.canvas.bind("<Configure>", lambda event: self.render())
+        self.canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.canvas.bind("<Button-4>", lambda event: self.scroll_rows(-3))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll_rows(3))
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<Double-Button-1>", self.on_double_click)
+        
+        # Detail view
+        self.detail_textbox = ctk.CTkTextbox(main_container, height=220, font=ctk.CTkFont(size=12), wrap="word")
+        self.detail_textbox.pack(fill="x", padx=10, pady=(5, 10))
+        self.detail_textbox.insert("0.0", "Select an entry to see details. Double-click copies the answer.")
     
-    def _extract_with_easyocr(self, image, language):
-        """Extract text using easyocr."""
-        try:
-            import easyocr
-            import numpy as np
-            
-            # Initialize reader if not already done
-            if self.easyocr_reader is None:
-                # Map common language codes to EasyOCR format
-                lang_map = {
-                    'eng': 'en',
-                    'spa': 'es', 
-                    'fra': 'fr',
-                    'deu': 'de',
-                    'ita': 'it',
-                    'por': 'pt',
-                    'rus': 'ru',
-                    'chi_sim': 'ch_sim',
-                    'chi_tra': 'ch_tra',
-                    'jpn': 'ja',
-                    'kor': 'ko'
-                }
-                
-                easy_lang = lang_map.get(language, 'en')
-                self.easyocr_reader = easyocr.Reader([easy_lang])
-            
-            # Convert PIL image to numpy array
-            img_array = np.array(image)
-            
-            # Extract text
-            results = self.easyocr_reader.readtext(img_array)
-            
-            # Combine all detected text
-            text_lines = []
-            for (bbox, text, confidence) in results:
-                if confidence > 0.5:  # Filter low confidence results
-                    text_lines.append(text)
-            
-            return '\n'.join(text_lines).strip()
+    def visible_rows(self):
+        """Number of rows that fit in the canvas."""
+        return max(1, self.canvas.winfo_height() // self.ROW_HEIGHT + 1)
+    
+    def get_row(self, index):
+        """Return the row at index, fetching and caching its page on demand."""
+        page_number = index // self.PAGE_SIZE
+        if page_number not in self.pages:
+            self.pages[page_number] = self.history.page(self.query, page_number * self.PAGE_SIZE, self.PAGE_SIZE)
+            while len(self.pages) > self.MAX_CACHED_PAGES:
+                self.pages.popitem(last=False)
+        self.pages.move_to_end(page_number)
+        rows = self.pages[page_number]
+        offset = index % self.PAGE_SIZE
+        return rows[offset] if offset < len(rows) else None
+    
+    def reload(self):
+        """Re-run the current query and redraw from the top."""
+        started = time.perf_counter()
+        self.pages.clear()
+        self.total = self.history.count(self.query)
+        self.top_index = 0
+        self.render()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.count_label.configure(text=f"{self.total:,} entries ({elapsed_ms:.0f} ms)")
+    
+    def render(self):
+        """Draw only the rows currently in view and update the scrollbar."""
+        self.canvas.delete("all")
+        width = self.canvas.winfo_width()
+        visible = self.visible_rows()
+        
+        for i in range(visible):
+            index = self.top_index + i
+            if index >= self.total:
+                break
+            row = self.get_row(index)
+            if row is None:
+                break
             
-        except ImportError:
-            return "easyocr not installed. Please install: pip install easyocr"
-        except Exception as e:
-            return f"EasyOCR error: {str(e)}"
+            entry_id, created_at, model, answer = row
+            y = i * self.ROW_HEIGHT
+            fill = "gray30" if entry_id == self.selected_id else ("gray17" if index % 2 else "gray14")
+            self.canvas.create_rectangle(0, y, width, y + self.ROW_HEIGHT, fill=fill, outline="")
+            self.canvas.create_text(
+                10, y + 12, anchor="w", fill="gray70", font=("Arial", 10),
+                text=f"{created_at.replace('T', ' ')}  ·  {model or ''}"
+            )
+            preview = " ".join((answer or "").split())
+            self.canvas.create_text(10, y + 30, anchor="w", fill="white", font=("Arial", 12), text=preview[:120])
+        
+        if self.total:
+            first = self.top_index / self.total
+            last = min(1.0, (self.top_index + visible) / self.total)
+            self.scrollbar.set(first, last)
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def scroll_rows(self, delta):
+        """Scroll the list by delta rows."""
+        max_top = max(0, self.total - self.visible_rows() + 1)
+        self.top_index = max(0, min(max_top, self.top_index + delta))
+        self.render()
+    
+    def on_scrollbar(self, action, value, unit=None):
+        """Handle scrollbar drags and clicks."""
+        if action == "moveto":
+            max_top = max(0, self.total - self.visible_rows() + 1)
+            self.top_index = max(0, min(max_top, int(float(value) * self.total)))
+            self.render()
+        elif action == "scroll":
+            step = self.visible_rows() if unit == "pages" else 1
+            self.scroll_rows(int(value) * step)
+    
+    def on_mouse_wheel(self, event):
+        """Scroll with the mouse wheel."""
+        self.scroll_rows(-3 if event.delta > 0 else 3)
+    
+    def row_at(self, event):
+        """Return the row under the mouse pointer, or None."""
+        index = self.top_index + event.y // self.ROW_HEIGHT
+        return self.get_row(index) if index < self.total else None
+    
+    def on_click(self, event):
+        """Show the full entry for the clicked row."""
+        row = self.row_at(event)
+        if row is None:
+            return
+        
+        self.selected_id = row[0]
+        entry = self.history.get(self.selected_id)
+        self.render()
+        if entry is None:
+            return
+        
+        timings = f"OCR {entry['ocr_ms'] or 0:.0f} ms · AI {entry['ai_ms'] or 0:.0f} ms"
+        details = (
+            f"{entry['created_at']} · {entry['provider']} · {entry['model']} · {timings}\n"
+            f"Capture: {entry['capture_path']}\n\n"
+            f"Question:\n{entry['ocr_text']}\n\n"
+            f"Answer:\n{entry['answer']}"
+        )
+        self.detail_textbox.delete("0.0", "end")
+        self.detail_textbox.insert("0.0", details)
+    
+    def on_double_click(self, event):
+        """Copy the answer of the double-clicked row to the clipboard."""
+        row = self.row_at(event)
+        if row is None:
+            return
+        entry = self.history.get(row[0])
+        if entry:
+            self.window.clipboard_clear()
+            self.window.clipboard_append(entry["answer"])
+            self.count_label.configure(text="📋 Answer copied")
+    
+    def on_search_changed(self, event=None):
+        """Debounce typing so the query runs once the user pauses."""
+        if self.search_job:
+            self.window.after_cancel(self.search_job)
+        self.search_job = self.window.after(150, self.run_search)
+    
+    def run_search(self):
+        """Run the search for the current text in the search box."""
+        self.search_job = None
+        self.query = self.search_entry.get()
+        self.reload()
 
 
 class ScreenshotApp:
@@ -858,9 +1348,49 @@ class ScreenshotApp:
         self.settings_manager = SettingsManager()
         self.settings_manager.initialize_ai_client()
         
+        # Initialize profiles and warm up their clients in the background
+        self.profile_manager = ProfileManager(self.settings_manager)
+        if self.settings_manager.get("active_profile"):
+            self.profile_manager.activate(self.settings_manager.get("active_profile"))
+        self.profile_manager.warm_all()
+        
         # Initialize OCR processor
         self.ocr_processor = OCRProcessor(self.settings_manager)
         
+        # Unload idle OCR models and report memory use in the status bar
+        self.memory_manager = MemoryManager(
+            self.settings_manager,
+            self.ocr_processor,
+            on_update=lambda rss: self.root.after(0, self.update_memory_label, rss)
+        )
+        
+        # Keeps the selected area captured and OCR'd in the background
+        self.precapture = Precapture(self.settings_manager, self.ocr_processor)
+        self.ocr_config = self.ocr_processor.config_key()  # OCR settings the pre-captured text was read with
+        
+        # Initialize prompt builder
+        self.prompt_builder = PromptBuilder(self.settings_manager)
+        
+        # Initialize OpenAI rate limiter
+        self.rate_limiter = RateLimiter(self.settings_manager)
+        
+        # Tokens, speed and cost of every request, kept next to the answer history
+        self.usage_tracker = UsageTracker(self.settings_manager)
+        self.ai_service = AIService(self.settings_manager, self.prompt_builder, self.rate_limiter, self.usage_tracker)
+        self.ai_service.ollama_pool.start()
+        
+        # Refresh the cached Ollama model catalog in the background
+        if self.settings_manager.get("ai_provider") == "ollama":
+            self.ai_service.model_catalog.refresh_async(self.settings_manager.get("ollama_url"))
+        
+        # The settings window is built on first open and then hidden and reused
+        self.settings_window = None
+        
+        # Initialize answer history and the near-duplicate index over past questions
+        self.history = AnswerHistory()
+        self.duplicate_index = NearDuplicateIndex()
+        threading.Thread(target=self.build_duplicate_index, daemon=True).start()
+        
         # Make sure ss directory exists
         if not os.path.exists("ss"):
             os.makedirs("ss")
@@ -873,13 +1403,27 @@ class ScreenshotApp:
         self.screenshot_area = None  # Stores the screenshot coordinates (x, y, width, height)
         self.base64_image = None  # Stores the base64 encoded screenshot
         self.extracted_text = None  # Stores the OCR extracted text
+        self.last_capture_path = None  # Path of the last saved screenshot
+        self.last_ocr_ms = None  # OCR time of the last capture
+        self.ai_started = None  # perf_counter() when the last AI request started
 
         # Initialize UI
         self.setup_ui()
         
+        # F8 sampling profiler (idle until toggled)
+        self.profiler = SamplingProfiler(
+            self.root,
+            interval_ms=self.settings_manager.get("profiler_interval_ms"),
+            on_saved=self.on_profile_saved
+        )
+        
         # Start listening for F10 key in a separate thread
         self.start_keyboard_listener()
         
+        self.memory_manager.start()
+        self.update_memory_label(self.memory_manager.current_rss_mb())
+        self.update_usage_label()
+        
         # Handle window closing
         self.root.protocol("WM_DELETE_WINDOW", self.quit_app)
     
@@ -900,11 +1444,35 @@ class ScreenshotApp:
             text_color="green"
         )
         self.status_label.pack(pady=10)
+        
+        self.quota_label = ctk.CTkLabel(
+            self.status_frame, 
+            text="", 
+            font=ctk.CTkFont(size=11),
+            text_color="gray70"
+        )
+        self.quota_label.pack(pady=(0, 2))
+        
+        self.memory_label = ctk.CTkLabel(
+            self.status_frame, 
+            text="", 
+            font=ctk.CTkFont(size=11),
+            text_color="gray70"
+        )
+        self.memory_label.pack(pady=(0, 2))
+        
+        self.usage_label = ctk.CTkLabel(
+            self.status_frame, 
+            text="", 
+            font=ctk.CTkFont(size=11),
+            text_color="gray70"
+        )
+        self.usage_label.pack(pady=(0, 8))
 
         # Instructions
         self.label = ctk.CTkLabel(
             main_container, 
-            text="1. Click 'Select Area' to choose screenshot region\n2. Press F10 anywhere to capture\n3. Use F11/F12 to adjust transparency\n4. Answer will appear below and be copied to clipboard",
+            text="1. Click 'Select Area' to choose screenshot region\n2. Press F10 anywhere to capture\n3. Use F11/F12 to adjust transparency, F9 to switch profile, F8 to profile\n4. Answer will appear below and be copied to clipboard",
             font=ctk.CTkFont(size=14),
             justify="left"
         )
@@ -963,6 +1531,18 @@ class ScreenshotApp:
         )
         self.answer_only_button.pack(side="left", padx=5)
 
+        self.history_button = ctk.CTkButton(
+            self.button_frame, 
+            text="📜 History", 
+            command=self.open_history, 
+            font=ctk.CTkFont(size=14, weight="bold"),
+            height=40,
+            width=120,
+            fg_color="teal",
+            hover_color="dark cyan"
+        )
+        self.history_button.pack(side="left", padx=5)
+
         self.quit_button = ctk.CTkButton(
             self.button_frame, 
             text="Quit", 
@@ -1003,40 +1583,41 @@ class ScreenshotApp:
         """Update the status label with a message and color."""
         self.status_label.configure(text=message, text_color=color)
         self.root.update()
+
+    def update_memory_label(self, rss_mb):
+        """Show the process memory and whether OCR models are loaded."""
+        if rss_mb is None:
+            return
+        models = "OCR models loaded" if self.ocr_processor.models_loaded() else "OCR models unloaded"
+        self.memory_label.configure(text=f"💾 RSS {rss_mb:.0f} MB · {models}")
     
+    def update_usage_label(self):
+        """Show today's token usage, generation speed and estimated cost."""
+        try:
+            text = self.usage_tracker.summary_text()
+            usage = self.ai_service.last_usage
+            if usage and usage["tokens_per_s"]:
+                text += f"\nLast: {usage['model']} · {usage['completion_tokens']} tokens at {usage['tokens_per_s']:.0f} tok/s · ${usage['cost_usd']:.4f}"
+            self.usage_label.configure(text=text)
+        except Exception as e:
+            self.log_error(f"Error updating usage: {e}")
+
     def open_settings(self):
-        """Open the settings window."""
+        """Open the settings window, reusing it after the first time."""
         try:
-            # Temporarily disable topmost for main window
+            # Temporarily disable topmost for main window; close_window restores it
             self.root.attributes("-topmost", False)
             
-            # Create settings window
-            settings_window = SettingsWindow(
-                self.root, 
-                self.settings_manager, 
-                on_save_callback=self.on_settings_saved
-            )
-            
-            # Wait for settings window to close, then restore main window topmost
-            def restore_topmost():
-                self.root.attributes("-topmost", True)
-                self.root.lift()
-            
-            # Check if settings window is still open and restore topmost when closed
-            def check_settings_window():
-                try:
-                    if settings_window.window.winfo_exists():
-                        # Settings window still exists, check again in 100ms
-                        self.root.after(100, check_settings_window)
-                    else:
-                        # Settings window closed, restore main window topmost
-                        restore_topmost()
-                except tk.TclError:
-                    # Settings window was destroyed, restore main window topmost
-                    restore_topmost()
-            
-            # Start checking
-            self.root.after(100, check_settings_window)
+            if self.settings_window and self.settings_window.window.winfo_exists():
+                self.settings_window.show()
+            else:
+                self.settings_window = SettingsWindow(
+                    self.root, 
+                    self.settings_manager, 
+                    on_save_callback=self.on_settings_saved,
+                    profile_manager=self.profile_manager,
+                    model_catalog=self.ai_service.model_catalog
+                )
             
         except Exception as e:
             self.log_error(f"Error opening settings: {e}")
@@ -1044,17 +1625,41 @@ class ScreenshotApp:
             # Restore topmost even if there was an error
             self.root.attributes("-topmost", True)
     
+    def open_history(self):
+        """Open the answer history window."""
+        try:
+            HistoryWindow(self.root, self.history)
+        except Exception as e:
+            self.log_error(f"Error opening history: {e}")
+            self.update_status("❌ Error opening history", "red")
+    
     def on_settings_saved(self):
         """Called when settings are saved."""
         provider = self.settings_manager.get("ai_provider")
         self.update_status(f"⚙️ Settings saved - Using {provider.upper()}", "blue")
         
+        # OCR settings or the active profile may have changed
+        self.on_ocr_settings_changed()
+        
         # Update transparency from settings
         self.update_transparency()
         
         # Ensure main window stays on top after settings are saved
         self.root.after(200, lambda: self.root.attributes("-topmost", True))
     
+    def on_ocr_settings_changed(self):
+        """Restart pre-capture if the OCR settings changed, so its text is read with the new ones.
+        
+        OCR engine pools and the tile cache are keyed by these settings, so they stay warm.
+        """
+        config = self.ocr_processor.config_key()
+        if config == self.ocr_config:
+            return
+        self.ocr_config = config
+        self.precapture.stop()
+        if self.settings_manager.get("precapture") and self.screenshot_area:
+            self.precapture.start(self.screenshot_area)
+    
     def toggle_answer_only_view(self):
         """Toggle between full view and answer-only view."""
         try:
@@ -1119,6 +1724,7 @@ class ScreenshotApp:
     def clear_selection(self):
         """Clear the current area selection."""
         self.screenshot_area = None
+        self.precapture.stop()
         self.update_status("🔄 Selection cleared - Select new area", "orange")
     
     def start_keyboard_listener(self):
@@ -1148,10 +1754,45 @@ class ScreenshotApp:
             elif key == Key.f12:
                 # Decrease transparency (more opaque)
                 self.adjust_transparency(0.1)
+            elif key == Key.f9:
+                # Runs on the listener thread; settings are only changed and saved on the Tk thread
+                self.root.after(0, self.switch_profile)
+            elif key == Key.f8:
+                self.toggle_profiler()
         except AttributeError:
             # Handle special keys that might not have the expected attributes
             pass
     
+    def switch_profile(self):
+        """Switch to the next profile using its already warm client (runs on the Tk thread)."""
+        try:
+            name = self.profile_manager.cycle()
+            if name is None:
+                self.update_status("❌ No profiles configured - create one in Settings", "red")
+                return
+            # The profile may change the OCR method, language or models
+            self.on_ocr_settings_changed()
+            provider = self.settings_manager.get("ai_provider")
+            model = self.settings_manager.get("openai_model" if provider == "openai" else "ollama_model")
+            self.update_status(f"🔀 Profile: {name} ({provider.upper()} · {model})", "blue")
+        except Exception as e:
+            self.log_error(f"Error switching profile: {e}")
+            self.update_status("❌ Error switching profile", "red")
+    
+    def toggle_profiler(self):
+        """Start or stop the sampling profiler."""
+        try:
+            if self.profiler.toggle():
+                self.root.after(0, self.update_status, "🔴 Profiling - press F8 to stop and save", "orange")
+            else:
+                self.root.after(0, self.update_status, "💾 Saving profile...", "orange")
+        except Exception as e:
+            self.log_error(f"Error toggling profiler: {e}")
+    
+    def on_profile_saved(self, collapsed_path, prof_path, samples):
+        """Report where the profile was written."""
+        self.update_status(f"📈 Profile saved ({samples} samples): {collapsed_path}", "green")
+    
     def log_error(self, message):
         """Log error messages with timestamp."""
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -1162,6 +1803,14 @@ class ScreenshotApp:
         try:
             if self.listener and self.is_listening:
                 self.listener.stop()
+            self.memory_manager.stop()
+            self.precapture.stop()
+            self.ai_service.ollama_pool.stop()
+            for breaker in self.ai_service.breakers.values():
+                breaker.stop()
+            self.profiler.stop()
+            self.history.close()
+            self.usage_tracker.close()
             self.root.quit()
             self.root.destroy()
         except Exception as e:
@@ -1190,31 +1839,46 @@ class ScreenshotApp:
             print(f"Error adjusting transparency: {e}")
 
     def select_area(self):
-        """Use a simple click-and-drag method to select area without canvas."""
+        """Freeze the screen and let the user drag a rectangle over the frozen frame."""
         try:
-            self.update_status("🎯 Click and drag to select area on screen", "blue")
+            from PIL import ImageEnhance, ImageTk
             
-            # Get current window position to stay on same screen
-            main_x = self.root.winfo_x()
-            main_y = self.root.winfo_y()
+            self.update_status("🎯 Click and drag to select area on screen", "blue")
             
-            # Hide main window temporarily
+            # Hide main window and grab every monitor once; the selection is cropped from this frame
             self.root.withdraw()
-
-            # Create simple overlay on the same screen as main window
-            self.overlay = tk.Toplevel()
+            self.root.update()
+            self.frozen_frame = grab_screen()
+            
+            # The virtual root spans all monitors; its origin is negative if one is left of or above the primary
+            self.frame_origin = (self.root.winfo_vrootx(), self.root.winfo_vrooty())
+            screen_width = self.root.winfo_vrootwidth()
+            screen_height = self.root.winfo_vrootheight()
             
-            # Get screen dimensions for the current screen
-            screen_width = self.root.winfo_screenwidth()
-            screen_height = self.root.winfo_screenheight()
+            # On HiDPI displays the frame has more pixels than the screen has Tk coordinates
+            self.frame_scale = self.frozen_frame.width / screen_width
+            display = self.frozen_frame
+            if display.size != (screen_width, screen_height):
+                display = display.resize((screen_width, screen_height))
+            display = ImageEnhance.Brightness(display.convert("RGB")).enhance(0.7)
             
-            # Position overlay on the same screen
-            self.overlay.geometry(f"{screen_width}x{screen_height}+{max(0, main_x-100)}+0")
-            self.overlay.attributes("-alpha", 0.3)
+            # Create an overlay showing the frozen (slightly dimmed) frame
+            self.overlay = tk.Toplevel()
+            self.overlay.geometry(f"{screen_width}x{screen_height}+{self.frame_origin[0]}+{self.frame_origin[1]}")
             self.overlay.attributes("-topmost", True)
-            self.overlay.config(cursor="cross", bg="gray25")
             self.overlay.overrideredirect(True)  # Remove window decorations
             
+            self.selection_canvas = tk.Canvas(
+                self.overlay,
+                width=screen_width,
+                height=screen_height,
+                highlightthickness=0,
+                cursor="cross"
+            )
+            self.selection_canvas.pack(fill="both", expand=True)
+            self.frozen_photo = ImageTk.PhotoImage(display, master=self.overlay)  # Keep a reference
+            self.selection_canvas.create_image(0, 0, image=self.frozen_photo, anchor="nw")
+            
             # Add instruction label
             instruction = tk.Label(
                 self.overlay, 
@@ -1226,70 +1890,79 @@ class ScreenshotApp:
                 pady=8
             )
             instruction.place(x=50, y=50)
-
+            
             # Initialize selection variables
             self.start_x = None
             self.start_y = None
-            self.selection_frame = None
-
-            # Bind events directly to overlay (no canvas)
-            self.overlay.bind("<ButtonPress-1>", self.start_selection)
-            self.overlay.bind("<B1-Motion>", self.drag_selection)
-            self.overlay.bind("<ButtonRelease-1>", self.complete_selection)
+            self.selection_rect = None
+            self.pending_drag = None  # Latest pointer position not drawn yet
+            self.redraw_scheduled = False
+            
+            self.selection_canvas.bind("<ButtonPress-1>", self.start_selection)
+            self.selection_canvas.bind("<B1-Motion>", self.drag_selection)
+            self.selection_canvas.bind("<ButtonRelease-1>", self.complete_selection)
             self.overlay.bind("<Escape>", self.cancel_selection)
             self.overlay.bind("<KeyPress-Escape>", self.cancel_selection)
-            self.overlay.focus_set()
+            self.overlay.focus_force()
             
         except Exception as e:
             self.log_error(f"Error in select_area: {e}")
             self.update_status("❌ Error selecting area", "red")
             self.root.deiconify()
-
+    
+    def close_overlay(self):
+        """Destroy the selection overlay and release the frozen frame."""
+        if getattr(self, 'overlay', None):
+            self.overlay.destroy()
+        self.overlay = None
+        self.frozen_photo = None
+        self.frozen_frame = None
+    
     def cancel_selection(self, event=None):
         """Cancel area selection."""
         try:
-            if hasattr(self, 'overlay') and self.overlay:
-                self.overlay.destroy()
+            self.close_overlay()
             self.root.deiconify()
             self.update_status("🔄 Selection cancelled", "orange")
         except Exception as e:
             self.log_error(f"Error cancelling selection: {e}")
-
+    
     def start_selection(self, event):
         """Start the selection rectangle."""
         self.start_x = event.x_root  # Use root coordinates for screen positioning
         self.start_y = event.y_root
         
-        # Create a simple frame to show selection area
-        if self.selection_frame:
-            self.selection_frame.destroy()
-            
-        self.selection_frame = tk.Frame(
-            self.overlay, 
-            bg="red", 
-            highlightbackground="red", 
-            highlightthickness=2
+        if self.selection_rect:
+            self.selection_canvas.delete(self.selection_rect)
+        self.selection_rect = self.selection_canvas.create_rectangle(
+            event.x, event.y, event.x, event.y,
+            outline="red",
+            width=2
         )
-        self.selection_frame.place(x=event.x, y=event.y, width=1, height=1)
-
+    
     def drag_selection(self, event):
-        """Update the selection rectangle while dragging."""
-        if self.start_x and self.start_y and self.selection_frame:
-            # Calculate relative positions within overlay
-            start_x_rel = self.start_x - self.overlay.winfo_rootx()
-            start_y_rel = self.start_y - self.overlay.winfo_rooty()
-            
-            x = min(start_x_rel, event.x)
-            y = min(start_y_rel, event.y)
-            width = abs(event.x - start_x_rel)
-            height = abs(event.y - start_y_rel)
-            
-            self.selection_frame.place(x=x, y=y, width=width, height=height)
-
+        """Record the pointer position; the rectangle is redrawn at most once per selection_redraw_ms."""
+        if self.start_x is None or not self.selection_rect:
+            return
+        self.pending_drag = (event.x, event.y)
+        if not self.redraw_scheduled:
+            self.redraw_scheduled = True
+            self.overlay.after(self.settings_manager.get("selection_redraw_ms"), self.redraw_selection)
+    
+    def redraw_selection(self):
+        """Move the selection rectangle to the latest pointer position."""
+        self.redraw_scheduled = False
+        if not self.overlay or not self.pending_drag:
+            return
+        start_x_rel = self.start_x - self.overlay.winfo_rootx()
+        start_y_rel = self.start_y - self.overlay.winfo_rooty()
+        self.selection_canvas.coords(self.selection_rect, start_x_rel, start_y_rel, *self.pending_drag)
+        self.pending_drag = None
+    
     def complete_selection(self, event):
         """Complete the area selection."""
         try:
-            if not self.start_x or not self.start_y:
+            if self.start_x is None or self.start_y is None:
                 self.cancel_selection()
                 return
                 
@@ -1313,23 +1986,43 @@ class ScreenshotApp:
                 
             # Store the selection area (x, y, width, height) in screen coordinates
             self.screenshot_area = (x1, y1, width, height)
-
+            
+            # Crop the selection from the frozen frame (in frame pixels on HiDPI displays)
+            scale = self.frame_scale
+            origin_x, origin_y = self.frame_origin
+            selected_image = self.frozen_frame.crop((
+                round((x1 - origin_x) * scale), round((y1 - origin_y) * scale),
+                round((x2 - origin_x) * scale), round((y2 - origin_y) * scale)
+            )).convert("RGB")
+            
             # Clean up
-            if self.selection_frame:
-                self.selection_frame.destroy()
-            self.overlay.destroy()
+            self.close_overlay()
             self.root.deiconify()
             
             area_info = f"📍 Area selected: {width}x{height} pixels at ({x1},{y1})"
             self.update_status(area_info, "green")
             print(f"Area Selected: {self.screenshot_area}")
             
+            # A new area is a new task: start a fresh Ollama chat session
+            self.ai_service.ollama_session.reset()
+            
+            # Start OCR of the new area now, from the frame already captured
+            if self.settings_manager.get("precapture"):
+                self.precapture.start(self.screenshot_area, selected_image)
+            
+            if self.settings_manager.get("answer_on_select"):
+                threading.Thread(target=self.capture_screenshot, args=(selected_image,), daemon=True).start()
+            
         except Exception as e:
             self.log_error(f"Error completing selection: {e}")
             self.cancel_selection()
-
-    def capture_screenshot(self):
-        """Capture a screenshot of the selected area and process it."""
+    
+    def capture_screenshot(self, image=None):
+        """Capture a screenshot of the selected area and process it.
+        
+        image is an already captured frame of the area (from the selection overlay);
+        without it the area is grabbed from the screen.
+        """
         if self.screenshot_area is None:
             self.update_status("❌ No area selected. Please select an area first.", "red")
             return
@@ -1338,7 +2031,7 @@ class ScreenshotApp:
             self.update_status("📸 Capturing screenshot...", "blue")
             
             # Capture screenshot
-            screenshot = pyautogui.screenshot(region=self.screenshot_area)
+            screenshot = image if image is not None else grab_screen(self.screenshot_area)
             buffered = io.BytesIO()
 
             # Save to file with timestamp
@@ -1346,14 +2039,24 @@ class ScreenshotApp:
             random_name = f"screenshot_{timestamp}_{uuid.uuid4().hex[:8]}.png"
             file_path = os.path.join("ss", random_name)
             screenshot.save(file_path, format="PNG")
+            self.last_capture_path = file_path
 
             # Convert to base64 (still needed if sending both text and image)
             screenshot.save(buffered, format="PNG")
             self.base64_image = base64.b64encode(buffered.getvalue()).decode("utf-8")
 
-            # Extract text using OCR
-            self.update_status("🔍 Extracting text from image...", "blue")
-            self.extracted_text = self.ocr_processor.extract_text(screenshot)
+            # Extract text using OCR, unless the background pre-capture already read this exact frame
+            ocr_started = time.perf_counter()
+            digest = Precapture.hash_frame(screenshot)
+            precaptured = self.precapture.lookup(self.screenshot_area, digest) if self.settings_manager.get("precapture") else None
+            if precaptured is not None:
+                self.extracted_text = precaptured
+                print("Using pre-captured OCR text (area unchanged)")
+            else:
+                self.update_status("🔍 Extracting text from image...", "blue")
+                self.extracted_text = self.precapture.ocr(screenshot, self.screenshot_area)
+                self.precapture.store(self.screenshot_area, digest, self.extracted_text, newest=True)
+            self.last_ocr_ms = (time.perf_counter() - ocr_started) * 1000
             
             print(f"Screenshot saved: {file_path}")
             print(f"Extracted text: {self.extracted_text[:200]}{'...' if len(self.extracted_text) > 200 else ''}")
@@ -1378,123 +2081,128 @@ class ScreenshotApp:
                 self.root.after(0, self.update_status, "❌ No text extracted", "red")
                 return
 
-            provider = self.settings_manager.get("ai_provider")
-            send_text_only = self.settings_manager.get("send_text_only")
+            # Reuse the answer of a near-identical earlier question if allowed
+            if self.reuse_previous_answer():
+                return
             
-            if provider == "openai":
-                self.send_to_openai_api(send_text_only)
-            else:
-                self.send_to_ollama(send_text_only)
+            send_text_only = self.settings_manager.get("send_text_only")
+            self.ai_started = time.perf_counter()
+            self.ask_provider(send_text_only)
                 
         except Exception as e:
             error_msg = f"Failed to get AI response: {str(e)}"
             self.log_error(error_msg)
             self.root.after(0, self.update_status, "❌ AI request failed", "red")
     
-    def send_to_openai_api(self, send_text_only=True):
-        """Send to OpenAI API."""
-        global client
+    def build_duplicate_index(self):
+        """Index past questions from the history database (runs in the background)."""
+        try:
+            started = time.perf_counter()
+            for entry_id, ocr_text in self.history.iter_questions():
+                self.duplicate_index.add(entry_id, ocr_text)
+            elapsed = time.perf_counter() - started
+            print(f"Indexed {len(self.duplicate_index)} past questions in {elapsed:.1f}s")
+        except Exception as e:
+            self.log_error(f"Error building duplicate index: {e}")
+    
+    def reuse_previous_answer(self):
+        """Show the answer of a near-duplicate past question.
+        
+        Returns True if the AI request should be skipped ("auto" mode).
+        """
+        mode = self.settings_manager.get("reuse_mode")
+        if mode == "off":
+            return False
         
-        if not client:
-            self.root.after(0, self.update_status, "❌ OpenAI client not initialized", "red")
+        started = time.perf_counter()
+        match = self.duplicate_index.query(self.extracted_text, self.settings_manager.get("reuse_similarity_threshold"))
+        lookup_ms = (time.perf_counter() - started) * 1000
+        if match is None:
+            return False
+        
+        entry_id, similarity = match
+        entry = self.history.get(entry_id)
+        if entry is None:
+            return False
+        
+        print(f"Near-duplicate of history #{entry_id} ({similarity:.0%} similar, lookup {lookup_ms:.2f} ms)")
+        # "offer" only shows the old answer: the clipboard keeps the previous one until the fresh answer arrives
+        self.root.after(0, lambda: self.display_answer(entry["answer"], record=False, copy=mode == "auto"))
+        if mode == "auto":
+            self.root.after(0, self.update_status, f"♻️ Reused previous answer ({similarity:.0%} similar) - Copied to clipboard!", "green")
+            return True
+        
+        self.root.after(0, self.update_status, f"♻️ Similar question found ({similarity:.0%}) - asking AI for a fresh answer...", "blue")
+        return False
+    
+    def ask_provider(self, send_text_only=True):
+        """Ask the selected provider, failing over to the other one while it is down."""
+        def on_retry(attempt, delay, error):
+            self.log_error(f"OpenAI request failed ({error.__class__.__name__}), retry {attempt} in {delay:.1f}s")
+            self.root.after(0, self.update_status, f"⏳ Rate limited or unavailable - retry {attempt} in {delay:.0f}s", "orange")
+        
+        def on_failover(failed, fallback, error):
+            self.log_error(f"{failed} unavailable ({error.__class__.__name__}), asking {fallback}")
+            self.root.after(0, self.update_status, f"⚡ {failed.capitalize()} unavailable - asking {fallback.capitalize()}...", "orange")
+        
+        provider = self.settings_manager.get("ai_provider")
+        try:
+            answer, answered_by, model = self.ai_service.ask(self.extracted_text, send_text_only, on_retry=on_retry, on_failover=on_failover)
+        except ProviderUnavailableError as e:
+            self.log_error(str(e))
+            self.root.after(0, self.update_status, f"❌ {provider.capitalize()} unavailable", "red")
+            self.root.after(0, lambda: self.quota_label.configure(text=self.ai_service.breakers[provider].status_text()))
             return
-            
-        response = client.chat.completions.create(
-            model=self.settings_manager.get("openai_model"),
-            messages=[
-                {
-                    "role": "system",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": self.settings_manager.get("system_prompt"),
-                        }
-                    ],
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": f"Please answer the question and keep short: {self.extracted_text}",
-                        }
-                    ],
-                }
-            ],
-            max_tokens=self.settings_manager.get("max_tokens"),
-            temperature=self.settings_manager.get("temperature")
-        )
-
-        answer = response.choices[0].message.content
+        except RuntimeError as e:
+            self.log_error(str(e))
+            self.root.after(0, self.update_status, f"❌ {provider.capitalize()} request failed", "red")
+            return
+        
+        breaker = self.ai_service.breakers[provider]
+        pool = self.ai_service.ollama_pool
+        if breaker.state != CircuitBreaker.CLOSED:
+            self.root.after(0, lambda: self.quota_label.configure(text=breaker.status_text()))
+        elif answered_by == "openai":
+            self.root.after(0, lambda: self.quota_label.configure(text=self.rate_limiter.quota_text(model)))
+        elif len(pool.hosts()) > 1:
+            self.root.after(0, lambda: self.quota_label.configure(text=pool.status_text()))
+        
         # Update UI in main thread
-        self.root.after(0, self.display_answer, answer)
-    
-    def send_to_ollama(self, send_text_only=True):
-        """Send to Ollama local instance."""
-        url = self.settings_manager.get("ollama_url")
-        model = self.settings_manager.get("ollama_model")
-        
-        # Ollama API endpoint
-        api_url = f"{url}/api/generate"
-        
-        if send_text_only:
-            # Send only text to Ollama (for non-vision models or text-only processing)
-            payload = {
-                "model": model,
-                "system": self.settings_manager.get("system_prompt"),
-                "prompt": f"Please answer the question and keep short:\n\n{self.extracted_text}",
-                "stream": False,
-                "options": {
-                    "temperature": self.settings_manager.get("temperature"),
-                    "num_predict": self.settings_manager.get("max_tokens")
-                }
-            }
-        else:
-            # Send both text and image to Ollama (for vision models)
-            payload = {
-                "model": model,
-                "system": self.settings_manager.get("system_prompt"),
-                "prompt": f"Please answer the question and keep short: {self.extracted_text}",
-                "stream": False,
-                "options": {
-                    "temperature": self.settings_manager.get("temperature"),
-                    "num_predict": self.settings_manager.get("max_tokens")
-                }
-            }
-        
-        response = requests.post(api_url, json=payload, timeout=60)
-        
-        if response.status_code == 200:
-            result = response.json()
-            answer = result.get("response", "No response from Ollama")
-            # Update UI in main thread
-            self.root.after(0, self.display_answer, answer)
-        else:
-            error_msg = f"Ollama request failed: {response.status_code} - {response.text}"
-            self.log_error(error_msg)
-            self.root.after(0, self.update_status, "❌ Ollama request failed", "red")
+        self.root.after(0, self.display_answer, answer, True, answered_by, model)
     
-    def display_answer(self, answer):
-        """Display the answer in the UI and copy to clipboard."""
+    def display_answer(self, answer, record=True, provider=None, model=None, copy=True):
+        """Display the answer in the UI and copy to clipboard; record it with the provider and model that answered."""
         try:
             # Clear and insert new answer
             self.answer_label.delete("0.0", "end")
             self.answer_label.insert("0.0", answer)
             
-            # Copy to clipboard
-            self.root.clipboard_clear()
-            self.root.clipboard_append(answer)
-            
-            # Update status
             word_count = len(answer.split())
-            self.update_status(f"✅ Answer ready ({word_count} words) - Copied to clipboard!", "green")
+            if copy:
+                # Copy to clipboard
+                self.root.clipboard_clear()
+                self.root.clipboard_append(answer)
+                self.update_status(f"✅ Answer ready ({word_count} words) - Copied to clipboard!", "green")
             
             print(f"AI Response ({word_count} words):")
             print(answer[:200] + "..." if len(answer) > 200 else answer)
             
+            if record:
+                self.record_history(answer, provider, model)
+                self.update_usage_label()
+            
         except Exception as e:
             self.log_error(f"Error displaying answer: {e}")
             self.update_status("❌ Error displaying answer", "red")
+    
+    def record_history(self, answer, provider, model):
+        """Store the answered capture in the history database."""
+        try:
+            ai_ms = (time.perf_counter() - self.ai_started) * 1000 if self.ai_started else None
+            entry_id = self.history.add(self.last_capture_path, self.extracted_text, answer, provider, model, self.last_ocr_ms, ai_ms)
+            self.duplicate_index.add(entry_id, self.extracted_text)
+        except Exception as e:
+            self.log_error(f"Error saving history: {e}")
 
 
 if __name__ == "__main__":
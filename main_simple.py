@@ -1,21 +1,70 @@
+"""Lite mode: a fast-starting, low-memory screenshot answer tool for kiosk machines.
+
+Plain Tk only; no customtkinter, OCR engines or torch. The capture is sent to the
+provider as an image, so the model must accept images. pyautogui, pynput and the
+OpenAI client are imported on first use, and settings are read straight from
+settings.json (shared with main.py). benchmark_startup.py measures the startup time.
+
+Usage:
+    python main_simple.py
+    python benchmark_startup.py
+"""
 import base64
 import io
+import json
+import os
+import sys
 import threading
+import time
 import tkinter as tk
 import uuid
-from openai import OpenAI
 
-import pyautogui
-from pynput.keyboard import Key, Listener
+STARTED = time.perf_counter()
+
+SETTINGS_FILE = "settings.json"
+
+# Settings used by lite mode; values in settings.json take precedence
+DEFAULT_SETTINGS = {
+    "ai_provider": "openai",  # "openai" or "ollama"
+    "openai_model": "gpt-4o-mini",
+    "ollama_url": "http://localhost:11434",
+    "ollama_model": "gemma3:12b",  # Must accept images
+    "max_tokens": 1000,
+    "temperature": 0.1,
+    "system_prompt": "You are a helpful assistant and don't explain anything. just given answer.",
+    "connect_timeout": 3,
+    "request_timeout": 60,
+}
+
+# Modules lite mode must not load before its window is up (checked by benchmark_startup.py)
+HEAVY_MODULES = ["customtkinter", "easyocr", "torch", "onnxruntime", "pytesseract", "openai", "requests", "pyautogui", "pynput"]
 
-client = OpenAI()
+
+def load_settings(path=SETTINGS_FILE):
+    """Return the lite-mode settings from settings.json, falling back to the defaults."""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        with open(path, "r") as f:
+            stored = json.load(f)
+        settings.update({key: stored[key] for key in DEFAULT_SETTINGS if key in stored})
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error loading settings: {e}")
+    return settings
 
 
 class ScreenshotApp:
-    def __init__(self, root):
+    def __init__(self, root, settings=None):
         self.root = root
-        self.root.title("Screenshot App")
+        self.root.title("Screenshot App (lite)")
         self.root.geometry("900x300")
+        self.root.attributes("-topmost", True)
+
+        self.settings = settings or load_settings()
+        self.client = None  # OpenAI client, created on the first OpenAI request
+        self.listener = None  # The single keyboard listener, started once the window is up
+        self.busy = threading.Lock()  # Ignore F10 while a capture is being answered
 
         self.screenshot_area = None  # Stores the screenshot coordinates (x, y, width, height)
         self.base64_image = None  # Stores the base64 encoded screenshot
@@ -25,51 +74,67 @@ class ScreenshotApp:
             self.root, text="Press 'Select Area' to choose the screenshot region.\nPress F10 to capture.",
             font=("Arial", 12)
         )
-        self.label.pack(pady=20)
+        self.label.pack(pady=10)
 
-        self.select_button = tk.Button(self.root, text="Select Area", command=self.select_area, font=("Arial", 12))
-        self.select_button.pack(pady=10)
+        buttons = tk.Frame(self.root)
+        buttons.pack(pady=5)
+        self.select_button = tk.Button(buttons, text="Select Area", command=self.select_area, font=("Arial", 12))
+        self.select_button.pack(side=tk.LEFT, padx=5)
+        self.quit_button = tk.Button(buttons, text="Quit", command=self.quit_app, font=("Arial", 12), fg="red")
+        self.quit_button.pack(side=tk.LEFT, padx=5)
 
-        self.quit_button = tk.Button(self.root, text="Quit", command=self.quit_app, font=("Arial", 12), fg="red")
-        self.quit_button.pack(pady=10)
-
-        # Create GUI elements
         self.answer_label = tk.Text(self.root, height=10, width=120)
         self.answer_label.insert(tk.END, "Answer will be displayed here.")
-        self.answer_label.pack(pady=10)
+        self.answer_label.pack(pady=10, fill=tk.BOTH, expand=True)
 
-        # Start listening for F10 key in a separate thread
-        self.listening_thread = threading.Thread(target=self.listen_for_f10, daemon=True)
-        self.listening_thread.start()
+        self.root.protocol("WM_DELETE_WINDOW", self.quit_app)
+
+        # Importing pynput takes a while, so the hotkey is set up after the first frame
+        self.root.after_idle(lambda: threading.Thread(target=self.start_keyboard_listener, daemon=True).start())
+
+    def set_status(self, message):
+        """Show a status message; safe to call from any thread."""
+        self.root.after(0, lambda: self.label.configure(text=message))
 
     def quit_app(self):
         """Quit the application."""
+        if self.listener:
+            self.listener.stop()
         self.root.quit()
+        self.root.destroy()
 
-    def listen_for_f10(self):
-        """Continuously check for the F10 key press."""
-        while True:
-            try:
-                with Listener(on_press=self.capture_screenshot) as listener:
-                    listener.join()
-                if pyautogui.press("f10"):  # Check for F10 key press
-                    if self.screenshot_area is None:
-                        print("Error", "No area selected. Please select an area first.")
-                    else:
-                        print("F10 pressed! Capturing screenshot...")
-                        self.capture_screenshot("f10")
-            except Exception as e:
-                print(f"Error in F10 listener: {e}")
+    def start_keyboard_listener(self):
+        """Start the one F10 listener for the lifetime of the app."""
+        try:
+            from pynput.keyboard import Key, Listener
+
+            self.hotkey = Key.f10
+            self.listener = Listener(on_press=self.on_key_press)
+            self.listener.daemon = True
+            self.listener.start()
+        except Exception as e:
+            print(f"Error starting F10 listener: {e}")
+            self.set_status(f"F10 unavailable ({e}) - use a different build")
+
+    def on_key_press(self, key):
+        """Capture on F10 (runs on the listener thread)."""
+        if key != self.hotkey:
+            return
+        if self.screenshot_area is None:
+            self.set_status("No area selected. Please select an area first.")
+            return
+        if not self.busy.acquire(blocking=False):
+            return
+        threading.Thread(target=self.capture_screenshot, daemon=True).start()
 
     def select_area(self):
         """Open a fullscreen window to select a screenshot region."""
-        # self.root.withdraw()  # Hide the main window
-
-        self.overlay = tk.Toplevel()
-        self.overlay.geometry("1800x1000")
+        self.overlay = tk.Toplevel(self.root)
+        self.overlay.geometry(f"{self.root.winfo_screenwidth()}x{self.root.winfo_screenheight()}+0+0")
         self.overlay.attributes("-alpha", 0.3)
+        self.overlay.attributes("-topmost", True)
         self.overlay.config(cursor="cross", bg="gray")
-        self.canvas = tk.Canvas(self.overlay, bg="gray")
+        self.canvas = tk.Canvas(self.overlay, bg="gray", highlightthickness=0)
         self.canvas.pack(fill=tk.BOTH, expand=True)
 
         self.start_x = None
@@ -79,83 +144,135 @@ class ScreenshotApp:
         self.overlay.bind("<ButtonPress-1>", self.start_selection)
         self.overlay.bind("<B1-Motion>", self.drag_selection)
         self.overlay.bind("<ButtonRelease-1>", self.complete_selection)
+        self.overlay.bind("<Escape>", lambda event: self.overlay.destroy())
+        self.overlay.focus_force()
 
     def start_selection(self, event):
-        self.start_x, self.start_y = event.x, event.y
-        self.rect = self.canvas.create_rectangle(self.start_x, self.start_y, self.start_x, self.start_y, outline="red",
-                                                 width=2)
+        self.start_x, self.start_y = event.x_root, event.y_root
+        self.rect = self.canvas.create_rectangle(event.x, event.y, event.x, event.y, outline="red", width=2)
 
     def drag_selection(self, event):
-        self.canvas.coords(self.rect, self.start_x, self.start_y, event.x, event.y)
+        x, y = self.start_x - self.overlay.winfo_rootx(), self.start_y - self.overlay.winfo_rooty()
+        self.canvas.coords(self.rect, x, y, event.x, event.y)
 
     def complete_selection(self, event):
-        end_x, end_y = event.x, event.y
+        end_x, end_y = event.x_root, event.y_root
         x1, y1 = min(self.start_x, end_x), min(self.start_y, end_y)
         x2, y2 = max(self.start_x, end_x), max(self.start_y, end_y)
-        self.screenshot_area = (x1, y1, x2 - x1, y2 - y1)
-
         self.overlay.destroy()
-        self.root.deiconify()  # Show the main window
+        if x2 - x1 < 5 or y2 - y1 < 5:
+            self.label.configure(text="Selection too small - try again.")
+            return
+
+        self.screenshot_area = (x1, y1, x2 - x1, y2 - y1)
+        self.label.configure(text=f"Area selected: {self.screenshot_area}\nPress F10 to capture.")
         print("Area Selected", f"Selected area: {self.screenshot_area}")
 
-    def capture_screenshot(self, key):
-        """Capture a screenshot of the saved area and store it as a base64 string."""
-        if key == Key.f10:
-            try:
-                screenshot = pyautogui.screenshot(region=self.screenshot_area)
-                buffered = io.BytesIO()
+    def capture_screenshot(self):
+        """Capture the saved area, store it as a base64 PNG and ask the AI (runs on a worker thread)."""
+        try:
+            import pyautogui
 
-                random_name = f"screenshot_{uuid.uuid4().hex}.png"
-                screenshot.save("ss/" + random_name, format="PNG")
+            self.set_status("Capturing...")
+            screenshot = pyautogui.screenshot(region=self.screenshot_area)
 
-                screenshot.save(buffered, format="PNG")
-                self.base64_image = base64.b64encode(buffered.getvalue()).decode("utf-8")
+            os.makedirs("ss", exist_ok=True)
+            screenshot.save(os.path.join("ss", f"screenshot_{uuid.uuid4().hex}.png"), format="PNG")
 
-                print("Screenshot Captured", "Screenshot captured and stored as Base64.")
-                print("Base64 Image:", self.base64_image[:100], "...")  # Print the first 100 characters
-                self.send_to_openai()
-            except Exception as e:
-                print("Error", f"Failed to capture screenshot: {e}")
+            buffered = io.BytesIO()
+            screenshot.save(buffered, format="PNG")
+            self.base64_image = base64.b64encode(buffered.getvalue()).decode("utf-8")
 
-    def send_to_openai(self):
-        """Send the base64 image to OpenAI and display the response."""
-        try:
-            if not self.base64_image:
-                print("Error", "No Base64 image found. Please take a screenshot first.")
-                return
-
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "You are a helpful assistant and don't explain anything. just given answer.",
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{self.base64_image}"
-                                },
-                            },
-                        ],
-                    }
-                ],
-            )
-
-            answer = response.choices[0].message.content
-            print("OpenAI Response", answer)
-            self.answer_label.delete(1.0, tk.END)
-            self.answer_label.insert(tk.END, answer)
-            self.root.clipboard_clear()
-            self.root.clipboard_append(answer)
+            provider = self.settings["ai_provider"]
+            self.set_status(f"Asking {provider}...")
+            started = time.perf_counter()
+            answer = self.ask_openai() if provider == "openai" else self.ask_ollama()
+            print(f"{provider} answered in {time.perf_counter() - started:.1f}s: {answer[:200]}")
+            self.root.after(0, self.display_answer, answer)
         except Exception as e:
-            print("Error", f"Failed to send to OpenAI: {e}")
+            print("Error", f"Failed to answer capture: {e}")
+            self.set_status(f"Error: {e}")
+        finally:
+            self.busy.release()
+
+    def ask_openai(self):
+        """Send the capture to OpenAI and return the answer."""
+        if self.client is None:
+            import openai
+
+            timeout = openai.Timeout(self.settings["request_timeout"], connect=self.settings["connect_timeout"])
+            self.client = openai.OpenAI(timeout=timeout)
+
+        response = self.client.chat.completions.create(
+            model=self.settings["openai_model"],
+            max_tokens=self.settings["max_tokens"],
+            temperature=self.settings["temperature"],
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": self.settings["system_prompt"],
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/png;base64,{self.base64_image}"
+                            },
+                        },
+                    ],
+                }
+            ],
+        )
+        return response.choices[0].message.content
+
+    def ask_ollama(self):
+        """Send the capture to Ollama's /api/generate and return the answer."""
+        import urllib.error
+        import urllib.request
+
+        payload = {
+            "model": self.settings["ollama_model"],
+            "system": self.settings["system_prompt"],
+            "prompt": "Answer the question in this image.",
+            "images": [self.base64_image],
+            "stream": False,
+            "options": {"temperature": self.settings["temperature"], "num_predict": self.settings["max_tokens"]}
+        }
+        request = urllib.request.Request(
+            f"{self.settings['ollama_url'].rstrip('/')}/api/generate",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.settings["request_timeout"]) as response:
+                return json.load(response).get("response", "No response from Ollama")
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"Ollama request failed: {e.code} - {e.read().decode('utf-8', 'replace')}")
+
+    def display_answer(self, answer):
+        """Show the answer and copy it to the clipboard."""
+        self.answer_label.delete(1.0, tk.END)
+        self.answer_label.insert(tk.END, answer)
+        self.root.clipboard_clear()
+        self.root.clipboard_append(answer)
+        self.label.configure(text="Answer copied to clipboard. Press F10 to capture again.")
+
+
+def report_startup(root):
+    """Print startup time and loaded heavy modules as JSON, then exit (used by benchmark_startup.py)."""
+    # Checked before the first frame: the hotkey listener imports pynput in the background afterwards
+    heavy_modules = [name for name in HEAVY_MODULES if name in sys.modules]
+    root.update()
+    print(json.dumps({"ready_ms": (time.perf_counter() - STARTED) * 1000, "heavy_modules": heavy_modules}), flush=True)
+    root.destroy()
 
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = ScreenshotApp(root)
-    root.mainloop()
+    if "--startup-probe" in sys.argv:
+        report_startup(root)
+    else:
+        root.mainloop()
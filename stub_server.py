@@ -0,0 +1,617 @@
+"""Local stub of the OpenAI and Ollama APIs for offline and load testing.
+
+OpenAI endpoints:
+
+    POST /v1/chat/completions       chat completion (streaming with "stream": true)
+    POST /v1/files                  upload a batch input file (multipart)
+    GET  /v1/files/{id}             file metadata
+    GET  /v1/files/{id}/content     file content
+    POST /v1/batches                create a batch
+    GET  /v1/batches                list batches
+    GET  /v1/batches/{id}           batch status
+    POST /v1/batches/{id}/cancel    cancel a batch
+
+Ollama endpoints:
+
+    POST /api/generate              generate (NDJSON streaming unless "stream": false)
+    POST /api/chat                  chat, reporting prefix-cache hits in prompt_eval_count
+    GET  /api/tags                  installed models
+    POST /api/show                  model details and capabilities
+
+Latency, token rate, streaming chunk size and error injection are configurable,
+and errors are drawn from a seeded RNG so runs are reproducible.
+
+Usage:
+    python stub_server.py --port 8765
+    python stub_server.py --latency-ms 200 --tokens-per-sec 50 --error-rate 0.05 --error-status 429
+    python batch_answer.py --base-url http://localhost:8765/v1 submit ss/
+"""
+import argparse
+import contextlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    """In-memory storage for uploaded files and batches, plus the simulated server behaviour."""
+
+    def __init__(self, batch_delay=2.0, latency_ms=0.0, tokens_per_sec=0.0, chunk_tokens=1,
+                 error_rate=0.0, error_status=429, retry_after=1.0, seed=0, models=None, parallel=0):
+        self.batch_delay = batch_delay  # Seconds a batch stays "in_progress" before completing
+        self.latency_ms = latency_ms  # Time to first token for chat/generate requests
+        self.tokens_per_sec = tokens_per_sec  # Generation speed; 0 returns the whole answer at once
+        self.chunk_tokens = max(1, chunk_tokens)  # Tokens per streamed chunk
+        self.error_rate = error_rate  # Fraction of chat/generate requests that fail
+        self.error_status = error_status  # HTTP status of injected errors
+        self.retry_after = retry_after  # Retry-After seconds sent with injected 429s
+        # Like OLLAMA_NUM_PARALLEL: requests beyond this many queue for a slot (0 = unlimited)
+        self.slots = threading.Semaphore(parallel) if parallel > 0 else None
+        self.models = models or ["llava:7b", "llama3.2:3b", "moondream:latest"]
+        self.files = {}  # file id -> {"meta": dict, "content": bytes}
+        self.batches = {}  # batch id -> batch object
+        self.chat_cache = {}  # model -> messages of the last /api/chat prompt (simulated KV cache)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+
+    def slot(self):
+        """Context manager holding one generation slot for the duration of a request."""
+        return self.slots if self.slots is not None else contextlib.nullcontext()
+
+    def should_fail(self):
+        """Decide whether the next chat/generate request gets an injected error."""
+        with self.lock:
+            self.request_count += 1
+            fail = self.error_rate > 0 and self.rng.random() < self.error_rate
+            if fail:
+                self.error_count += 1
+            return fail
+
+    def chat_prefill_tokens(self, model, messages):
+        """Tokens /api/chat has to evaluate, reusing the longest message prefix of the model's last prompt."""
+        with self.lock:
+            cached = self.chat_cache.get(model, [])
+            shared = 0
+            while shared < min(len(cached), len(messages)) and cached[shared] == messages[shared]:
+                shared += 1
+            self.chat_cache[model] = list(messages)
+        return max(1, sum(len(m.get("content", "")) // 4 for m in messages[shared:]))
+
+    def answer_tokens(self, answer, max_tokens=None):
+        """Split an answer into word tokens, truncated to max_tokens."""
+        tokens = [word + " " for word in answer.split(" ")]
+        tokens[-1] = tokens[-1].rstrip()
+        return tokens[:max_tokens] if max_tokens else tokens
+
+    def generation_delay(self, token_count):
+        """Seconds it takes to generate token_count tokens at the configured rate."""
+        return token_count / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+    def add_file(self, filename, content, purpose):
+        """Store a file and return its metadata."""
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        meta = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed"
+        }
+        with self.lock:
+            self.files[file_id] = {"meta": meta, "content": content}
+        return meta
+
+    def answer_for(self, body):
+        """Return a deterministic answer for a chat completion request body."""
+        messages = body.get("messages", [])
+        content = messages[-1].get("content", "") if messages else ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+        return f"Stub answer to: {' '.join(content.split())[:80]}"
+
+    def prompt_tokens_for(self, body):
+        """Rough prompt token count for a chat completion request body."""
+        return sum(len(json.dumps(m.get("content", ""))) // 4 for m in body.get("messages", []))
+
+    def completion_for(self, body):
+        """Build a chat.completion object for a request body."""
+        answer = self.answer_for(body)
+        prompt_tokens = self.prompt_tokens_for(body)
+        completion_tokens = max(1, len(answer) // 4)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub-model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    def create_batch(self, input_file_id, endpoint, completion_window, metadata):
+        """Create a batch object; it completes after batch_delay seconds."""
+        with self.lock:
+            if input_file_id not in self.files:
+                return None
+            lines = self.files[input_file_id]["content"].decode("utf-8").splitlines()
+
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": endpoint,
+            "input_file_id": input_file_id,
+            "completion_window": completion_window,
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": len([l for l in lines if l.strip()]), "completed": 0, "failed": 0},
+            "metadata": metadata
+        }
+        with self.lock:
+            self.batches[batch_id] = batch
+
+        threading.Thread(target=self._run_batch, args=(batch_id, lines), daemon=True).start()
+        return batch
+
+    def _run_batch(self, batch_id, lines):
+        """Process a batch in the background like the real endpoint would."""
+        with self.lock:
+            self.batches[batch_id]["status"] = "in_progress"
+            self.batches[batch_id]["in_progress_at"] = int(time.time())
+        time.sleep(self.batch_delay)
+
+        output_lines = []
+        error_lines = []
+        for line in lines:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            if request.get("url") != "/v1/chat/completions":
+                error_lines.append(json.dumps({
+                    "id": f"batch_req_{uuid.uuid4().hex[:16]}",
+                    "custom_id": request.get("custom_id"),
+                    "response": None,
+                    "error": {"code": "invalid_url", "message": f"Unsupported url: {request.get('url')}"}
+                }))
+                continue
+            output_lines.append(json.dumps({
+                "id": f"batch_req_{uuid.uuid4().hex[:16]}",
+                "custom_id": request.get("custom_id"),
+                "response": {
+                    "status_code": 200,
+                    "request_id": uuid.uuid4().hex,
+                    "body": self.completion_for(request.get("body", {}))
+                },
+                "error": None
+            }))
+
+        with self.lock:
+            batch = self.batches[batch_id]
+            if batch["status"] == "cancelling":
+                batch["status"] = "cancelled"
+                batch["cancelled_at"] = int(time.time())
+                return
+
+        # Like the real endpoint, a batch whose requests all failed has no output file
+        output = None
+        if output_lines:
+            output = self.add_file(f"{batch_id}_output.jsonl", "\n".join(output_lines).encode("utf-8"), "batch_output")
+        errors = None
+        if error_lines:
+            errors = self.add_file(f"{batch_id}_errors.jsonl", "\n".join(error_lines).encode("utf-8"), "batch_output")
+
+        with self.lock:
+            batch.update({
+                "status": "completed",
+                "completed_at": int(time.time()),
+                "output_file_id": output["id"] if output else None,
+                "error_file_id": errors["id"] if errors else None,
+                "request_counts": {
+                    "total": len(output_lines) + len(error_lines),
+                    "completed": len(output_lines),
+                    "failed": len(error_lines)
+                }
+            })
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Route requests to the stub endpoints."""
+
+    state = None  # StubState shared by all handler instances
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Headers and body are separate writes; avoid 40ms delayed-ACK stalls
+
+    def log_message(self, format, *args):
+        """Keep the console quiet; the stub is used in benchmarks."""
+        pass
+
+    def send_json(self, status, payload):
+        """Send a JSON response."""
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        """Send an OpenAI-style error response."""
+        self.send_json(status, {"error": {"message": message, "type": "invalid_request_error"}})
+
+    def send_injected_error(self, ollama=False):
+        """Send the configured error, with Retry-After on 429s."""
+        status = self.state.error_status
+        message = "Rate limit reached (injected by stub)" if status == 429 else "Server error (injected by stub)"
+        payload = {"error": message} if ollama else {"error": {"message": message, "type": "requests" if status == 429 else "server_error"}}
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", f"{self.state.retry_after:g}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def start_stream(self, content_type):
+        """Send headers for a streamed response; the connection closes when it ends."""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def stream_tokens(self, tokens, write_chunk):
+        """Call write_chunk with chunk_tokens tokens at a time, paced at the token rate."""
+        size = self.state.chunk_tokens
+        for start in range(0, len(tokens), size):
+            chunk = tokens[start:start + size]
+            time.sleep(self.state.generation_delay(len(chunk)))
+            write_chunk("".join(chunk))
+            self.wfile.flush()
+
+    def handle_chat_completion(self, body):
+        """Answer POST /v1/chat/completions, streaming as server-sent events if requested."""
+        time.sleep(self.state.latency_ms / 1000)
+        if self.state.should_fail():
+            return self.send_injected_error()
+
+        full_tokens = self.state.answer_tokens(self.state.answer_for(body))
+        tokens = full_tokens[:body.get("max_tokens") or body.get("max_completion_tokens") or len(full_tokens)]
+        finish_reason = "length" if len(tokens) < len(full_tokens) else "stop"
+        prompt_tokens = self.state.prompt_tokens_for(body)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens)
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "stub-model")
+
+        if not body.get("stream"):
+            time.sleep(self.state.generation_delay(len(tokens)))
+            return self.send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": finish_reason
+                }],
+                "usage": usage
+            })
+
+        def event(delta, finish=None, chunk_usage=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}] if delta is not None else [],
+            }
+            if chunk_usage:
+                payload["usage"] = chunk_usage
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+        self.start_stream("text/event-stream")
+        event({"role": "assistant", "content": ""})
+        self.stream_tokens(tokens, lambda text: event({"content": text}))
+        event({}, finish_reason)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event(None, chunk_usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def handle_generate(self, body, chat=False):
+        """Answer POST /api/generate or /api/chat, streaming NDJSON unless "stream" is false (Ollama's default is true)."""
+        started = time.perf_counter()
+        time.sleep(self.state.latency_ms / 1000)
+        if self.state.should_fail():
+            return self.send_injected_error(ollama=True)
+
+        model = body.get("model", "stub-model")
+        if chat:
+            messages = body.get("messages") or []
+            prompt = messages[-1].get("content", "") if messages else ""
+            prompt_eval_count = self.state.chat_prefill_tokens(model, messages)
+        else:
+            prompt = body.get("prompt", "")
+            prompt_eval_count = max(1, len((body.get("system") or "") + prompt) // 4)
+        answer = f"Stub answer to: {' '.join(prompt.split())[:80]}"
+        options = body.get("options") or {}
+        num_predict = options.get("num_predict")
+        tokens = self.state.answer_tokens(answer, num_predict if num_predict and num_predict > 0 else None)
+
+        def content(text):
+            # /api/chat wraps the text in a message, /api/generate returns it as "response"
+            return {"message": {"role": "assistant", "content": text}} if chat else {"response": text}
+
+        def final(response_text):
+            total_ns = int((time.perf_counter() - started) * 1e9)
+            eval_ns = int(self.state.generation_delay(len(tokens)) * 1e9)
+            return {
+                "model": model,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                **content(response_text),
+                "done": True,
+                "done_reason": "length" if num_predict and len(tokens) >= num_predict else "stop",
+                "total_duration": total_ns,
+                "load_duration": 0,
+                "prompt_eval_count": prompt_eval_count,
+                "prompt_eval_duration": int(self.state.latency_ms * 1e6),
+                "eval_count": len(tokens),
+                "eval_duration": eval_ns
+            }
+
+        if body.get("stream") is False:
+            time.sleep(self.state.generation_delay(len(tokens)))
+            return self.send_json(200, final("".join(tokens)))
+
+        def line(text):
+            payload = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), **content(text), "done": False}
+            self.wfile.write((json.dumps(payload) + "\n").encode("utf-8"))
+
+        self.start_stream("application/x-ndjson")
+        self.stream_tokens(tokens, line)
+        self.wfile.write((json.dumps(final("")) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    # Model families the stub reports as accepting images
+    VISION_FAMILIES = {"llava", "bakllava", "moondream", "minicpm-v", "llama3.2-vision", "qwen2.5vl", "gemma3"}
+
+    @staticmethod
+    def model_details(name):
+        """Return Ollama-style details for a model name; the size comes from a tag like ":3b"."""
+        match = re.search(r"(\d+(?:\.\d+)?)b\b", name.lower())
+        return {
+            "format": "gguf",
+            "family": name.split(":")[0],
+            "parameter_size": f"{match.group(1)}B" if match else "7B",
+            "quantization_level": "Q4_0"
+        }
+
+    def tags(self):
+        """Return the /api/tags model list."""
+        models = []
+        for name in self.state.models:
+            details = self.model_details(name)
+            models.append({
+                "name": name,
+                "model": name,
+                "modified_at": "2024-01-01T00:00:00Z",
+                "size": int(float(details["parameter_size"][:-1]) * 600_000_000),
+                "digest": uuid.uuid5(uuid.NAMESPACE_DNS, name).hex,
+                "details": details
+            })
+        return {"models": models}
+
+    def show(self, name):
+        """Return the /api/show details and capabilities of an installed model, or None."""
+        if name not in self.state.models:
+            return None
+        details = self.model_details(name)
+        family = details["family"]
+        capabilities = ["completion"]
+        if family in self.VISION_FAMILIES:
+            capabilities.append("vision")
+        return {
+            "details": details,
+            "model_info": {
+                "general.architecture": family,
+                "general.parameter_count": int(float(details["parameter_size"][:-1]) * 1e9),
+                f"{family}.context_length": 131072 if family.startswith("llama3") else 4096
+            },
+            "capabilities": capabilities
+        }
+
+    def read_body(self):
+        """Read the raw request body."""
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def read_multipart(self, body):
+        """Parse a multipart/form-data body into (fields, files)."""
+        header = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8")
+        message = BytesParser(policy=policy.default).parsebytes(header + body)
+
+        fields = {}
+        files = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            filename = part.get_filename()
+            payload = part.get_payload(decode=True) or b""
+            if filename:
+                files[name] = (filename, payload)
+            else:
+                fields[name] = payload.decode("utf-8")
+        return fields, files
+
+    def do_GET(self):
+        """Handle GET routes."""
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+
+        if parts[:2] == ["v1", "files"] and len(parts) == 3:
+            entry = self.state.files.get(parts[2])
+            if not entry:
+                return self.send_error_json(404, f"No such file: {parts[2]}")
+            return self.send_json(200, entry["meta"])
+
+        if parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[3] == "content":
+            entry = self.state.files.get(parts[2])
+            if not entry:
+                return self.send_error_json(404, f"No such file: {parts[2]}")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(entry["content"])))
+            self.end_headers()
+            self.wfile.write(entry["content"])
+            return
+
+        if parts == ["api", "tags"]:
+            return self.send_json(200, self.tags())
+
+        if parts == ["v1", "batches"]:
+            with self.state.lock:
+                batches = sorted(self.state.batches.values(), key=lambda b: b["created_at"], reverse=True)
+            return self.send_json(200, {"object": "list", "data": batches, "has_more": False})
+
+        if parts[:2] == ["v1", "batches"] and len(parts) == 3:
+            batch = self.state.batches.get(parts[2])
+            if not batch:
+                return self.send_error_json(404, f"No such batch: {parts[2]}")
+            return self.send_json(200, batch)
+
+        self.send_error_json(404, f"Unknown route: GET {self.path}")
+
+    def do_POST(self):
+        """Handle POST routes."""
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        body = self.read_body()
+
+        if parts == ["v1", "chat", "completions"]:
+            with self.state.slot():
+                return self.handle_chat_completion(json.loads(body or b"{}"))
+
+        if parts == ["api", "generate"]:
+            with self.state.slot():
+                return self.handle_generate(json.loads(body or b"{}"))
+
+        if parts == ["api", "chat"]:
+            with self.state.slot():
+                return self.handle_generate(json.loads(body or b"{}"), chat=True)
+
+        if parts == ["api", "show"]:
+            request = json.loads(body or b"{}")
+            name = request.get("model") or request.get("name")
+            details = self.show(name)
+            if details is None:
+                return self.send_error_json(404, f"model '{name}' not found")
+            return self.send_json(200, details)
+
+        if parts == ["v1", "files"]:
+            fields, files = self.read_multipart(body)
+            if "file" not in files:
+                return self.send_error_json(400, "Missing file")
+            filename, content = files["file"]
+            return self.send_json(200, self.state.add_file(filename, content, fields.get("purpose", "batch")))
+
+        if parts == ["v1", "batches"]:
+            request = json.loads(body or b"{}")
+            batch = self.state.create_batch(
+                request.get("input_file_id"),
+                request.get("endpoint", "/v1/chat/completions"),
+                request.get("completion_window", "24h"),
+                request.get("metadata")
+            )
+            if batch is None:
+                return self.send_error_json(400, f"No such file: {request.get('input_file_id')}")
+            return self.send_json(200, batch)
+
+        if parts[:2] == ["v1", "batches"] and len(parts) == 4 and parts[3] == "cancel":
+            with self.state.lock:
+                batch = self.state.batches.get(parts[2])
+                if batch and batch["status"] in ("validating", "in_progress"):
+                    batch["status"] = "cancelling"
+            if not batch:
+                return self.send_error_json(404, f"No such batch: {parts[2]}")
+            return self.send_json(200, batch)
+
+        self.send_error_json(404, f"Unknown route: POST {self.path}")
+
+
+def create_server(host="127.0.0.1", port=8765, state=None):
+    """Create (but do not start) a stub server bound to host:port."""
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state or StubState()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def add_stub_arguments(parser):
+    """Add the server behaviour options; shared with load_test.py."""
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batch-delay", type=float, default=2.0, help="Seconds before a batch completes")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="Generation speed (0 = instant)")
+    parser.add_argument("--chunk-tokens", type=int, default=1, help="Tokens per streamed chunk")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of chat/generate requests that fail")
+    parser.add_argument("--error-status", type=int, default=429, help="HTTP status of injected errors")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on injected 429s")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for error injection")
+    parser.add_argument("--models", nargs="+", help="Model names listed by /api/tags")
+    parser.add_argument("--parallel", type=int, default=0, help="Concurrent generations before requests queue (0 = unlimited)")
+
+
+def state_from_args(args):
+    """Build a StubState from parsed add_stub_arguments options."""
+    return StubState(
+        batch_delay=args.batch_delay,
+        latency_ms=args.latency_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        chunk_tokens=args.chunk_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+        seed=args.seed,
+        models=args.models,
+        parallel=args.parallel
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI and Ollama API stub server")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, state_from_args(args))
+    print(f"Stub server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
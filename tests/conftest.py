@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Run the tests against the modules in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core  # noqa: E402
+
+
+@pytest.fixture
+def settings_manager(monkeypatch, tmp_path):
+    """Default settings in a temporary working directory; the app's global clients are restored afterwards."""
+    monkeypatch.chdir(tmp_path)  # Keep settings, catalog, history and log files out of the repository
+    monkeypatch.setattr(core, "client", None)
+    monkeypatch.setattr(core, "http_session", core.http_session)
+    return core.SettingsManager()
@@ -0,0 +1,40 @@
+"""AnswerHistory full-text search and paging."""
+import pytest
+
+import core
+
+
+@pytest.fixture
+def history(settings_manager):
+    history = core.AnswerHistory()
+    yield history
+    history.close()
+
+
+@pytest.fixture
+def entries(history):
+    history.add("ss/1.png", "What is the capital of France?", "Paris", "openai", "gpt-4o")
+    history.add("ss/2.png", "Which planet is closest to the sun?", "Mercury", "ollama", "llava")
+    history.add("ss/3.png", "What is the capital of Spain?", "Madrid", "openai", "gpt-4o")
+    return history
+
+
+def test_search_matches_word_prefixes_in_question_and_answer(entries):
+    assert entries.fts_available
+    assert [row[3] for row in entries.page("capit")] == ["Madrid", "Paris"]  # Newest first
+    assert entries.count("capital spain") == 1
+    assert entries.count("mercury") == 1
+    assert entries.count("venus") == 0
+
+
+def test_punctuation_only_query_lists_everything(entries):
+    assert entries.count('"*') == entries.count() == 3
+    assert [row[3] for row in entries.page('"*', offset=1, limit=1)] == ["Mercury"]
+
+
+def test_index_follows_deleted_rows(entries):
+    with entries.conn:
+        entries.conn.execute("DELETE FROM history WHERE answer = 'Paris'")
+
+    assert entries.count("capital") == 1
+    assert entries.get(1) is None
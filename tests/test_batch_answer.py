@@ -0,0 +1,79 @@
+"""batch_answer submit/status/ingest against the stub server's Files and Batches endpoints."""
+import io
+import json
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+import batch_answer
+import stub_server
+from core import OCRError
+
+
+@pytest.fixture
+def stub(settings_manager):
+    """Start a stub server with fast batches and return (client, state)."""
+    state = stub_server.StubState(batch_delay=0.05)
+    server = stub_server.create_server("127.0.0.1", 0, state)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    yield batch_answer.create_client(f"http://{host}:{port}/v1"), state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def captures(tmp_path, monkeypatch):
+    """Three readable captures and one that OCR fails on (OCR is faked by image width)."""
+    folder = tmp_path / "ss"
+    folder.mkdir()
+    for index, width in enumerate([100, 101, 102, 13]):
+        Image.new("RGB", (width, 20), "white").save(folder / f"capture_{index}.png")
+
+    def read_text(self, image):
+        if image.width == 13:
+            raise OCRError("Pytesseract error: tesseract is not installed")
+        return f"Question {image.width}: what is 2 + 2?"
+
+    monkeypatch.setattr(batch_answer.OCRProcessor, "read_text", read_text)
+    return str(folder)
+
+
+def wait_until_done(client, batch_id):
+    deadline = time.monotonic() + 5
+    while batch_answer.refresh_status(client, batch_id)["status"] not in batch_answer.TERMINAL_STATUSES:
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_submit_skips_queued_and_unreadable_captures(stub, captures, settings_manager):
+    client, state = stub
+
+    batch_id = batch_answer.submit(client, settings_manager, captures)
+    assert batch_answer.submit(client, settings_manager, captures) is None  # Still pending: nothing is re-queued
+
+    assert len(state.batches) == 1
+    queued = batch_answer.load_json(batch_answer.JOBS_FILE)[batch_id]["captures"]
+    assert sorted(queued) == [f"{captures}/capture_{index}.png" for index in range(3)]
+
+    wait_until_done(client, batch_id)
+    assert batch_answer.ingest(client, batch_id) == 3
+    assert batch_answer.pending_batch_ids() == []
+    assert batch_answer.submit(client, settings_manager, captures) is None  # Answered now
+
+
+def test_ingest_batch_without_output_file(stub, settings_manager):
+    client, state = stub
+    line = {"custom_id": "ss/a.png", "method": "POST", "url": "/v1/embeddings", "body": {}}
+    input_file = client.files.create(file=("batch.jsonl", io.BytesIO(json.dumps(line).encode())), purpose="batch")
+    batch = client.batches.create(input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window="24h")
+    batch_answer.save_json(batch_answer.JOBS_FILE, {batch.id: {"captures": {"ss/a.png": "text"}, "ingested": False}})
+
+    wait_until_done(client, batch.id)
+    job = batch_answer.load_json(batch_answer.JOBS_FILE)[batch.id]
+    assert job["output_file_id"] is None and job["error_file_id"]
+
+    assert batch_answer.ingest(client, batch.id) == 0
+    assert batch_answer.pending_batch_ids() == []
@@ -0,0 +1,130 @@
+"""CircuitBreaker state machine and AIService failover."""
+import threading
+import time
+
+import pytest
+
+import core
+
+
+@pytest.fixture
+def settings_manager(settings_manager):
+    settings_manager.set("circuit_failure_threshold", 3)
+    settings_manager.set("circuit_probe_interval", 0.01)
+    return settings_manager
+
+
+def wait_for(condition, timeout=2.0):
+    """Poll until condition() is true or the timeout passes."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_opens_after_threshold_then_half_opens_and_closes(settings_manager):
+    provider_up = threading.Event()
+
+    def probe():
+        if not provider_up.is_set():
+            raise ConnectionError("down")
+
+    breaker = core.CircuitBreaker("Test", settings_manager, probe)
+    try:
+        for _ in range(2):
+            breaker.record_failure(ConnectionError())
+            assert breaker.state == core.CircuitBreaker.CLOSED
+            assert breaker.allow()
+
+        breaker.record_failure(ConnectionError())
+        assert breaker.state == core.CircuitBreaker.OPEN
+        assert not breaker.allow()
+
+        # Failing probes keep it open
+        time.sleep(0.05)
+        assert breaker.state == core.CircuitBreaker.OPEN
+
+        provider_up.set()
+        assert wait_for(lambda: breaker.state == core.CircuitBreaker.HALF_OPEN)
+
+        # One trial request at a time while half-open
+        assert breaker.allow()
+        assert not breaker.allow()
+
+        breaker.record_success()
+        assert breaker.state == core.CircuitBreaker.CLOSED
+        assert breaker.failures == 0
+        assert breaker.allow()
+    finally:
+        breaker.stop()
+
+
+def test_failed_trial_reopens(settings_manager):
+    breaker = core.CircuitBreaker("Test", settings_manager, lambda: None)
+    try:
+        for _ in range(3):
+            breaker.record_failure(ConnectionError())
+        assert wait_for(lambda: breaker.state == core.CircuitBreaker.HALF_OPEN)
+        assert breaker.allow()
+
+        breaker.record_failure(ConnectionError())
+        assert breaker.state == core.CircuitBreaker.OPEN
+    finally:
+        breaker.stop()
+
+
+def test_success_resets_the_failure_count(settings_manager):
+    breaker = core.CircuitBreaker("Test", settings_manager, lambda: None)
+    breaker.record_failure(ConnectionError())
+    breaker.record_failure(ConnectionError())
+    breaker.record_success()
+    breaker.record_failure(ConnectionError())
+    assert breaker.state == core.CircuitBreaker.CLOSED
+
+
+@pytest.fixture
+def service(settings_manager, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    settings_manager.set("ai_provider", "ollama")
+    settings_manager.set("circuit_probe_interval", 60)  # Keep the circuit open for the test
+    service = core.AIService(settings_manager, core.PromptBuilder(settings_manager), core.RateLimiter(settings_manager))
+    yield service
+    for breaker in service.breakers.values():
+        breaker.stop()
+
+
+def test_open_circuit_fails_fast(service, monkeypatch):
+    calls = []
+
+    def ask_ollama(text, send_text_only=True):
+        calls.append(text)
+        raise core.ProviderUnavailableError("Ollama request failed: 503")
+
+    monkeypatch.setattr(service, "ask_ollama", ask_ollama)
+    for _ in range(3):
+        with pytest.raises(core.ProviderUnavailableError):
+            service.ask("question")
+    assert len(calls) == 3
+    assert service.breakers["ollama"].state == core.CircuitBreaker.OPEN
+
+    started = time.perf_counter()
+    with pytest.raises(core.ProviderUnavailableError, match="circuit is open"):
+        service.ask("question")
+    assert len(calls) == 3
+    assert time.perf_counter() - started < 0.1
+
+
+def test_no_failover_unless_configured(service, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+    def ask_ollama(text, send_text_only=True):
+        raise core.ProviderUnavailableError("down")
+
+    monkeypatch.setattr(service, "ask_ollama", ask_ollama)
+    monkeypatch.setattr(service, "ask_openai", lambda *args, **kwargs: ("cloud answer", "gpt-4o-mini"))
+
+    with pytest.raises(core.ProviderUnavailableError):
+        service.ask("question")
+
+    service.settings_manager.set("failover_provider", "openai")
+    assert service.ask("question") == ("cloud answer", "openai", "gpt-4o-mini")
@@ -0,0 +1,70 @@
+"""Drive AIService against the in-process stub server, as load_test.py does."""
+import pytest
+
+import load_test
+
+
+@pytest.fixture
+def stub(settings_manager):
+    """Start a stub server and return (args, base_url, state)."""
+    args = load_test.build_parser().parse_args(["--requests", "6", "--concurrency", "3"])
+    server, base_url = load_test.start_stub(args)
+    yield args, base_url, server.RequestHandlerClass.state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("provider", ["openai", "ollama", "models"])
+def test_requests_succeed(stub, provider):
+    args, base_url, state = stub
+    args.provider = provider
+    service, settings_manager = load_test.build_service([base_url], args)
+
+    results, wall, retries = load_test.run_load(service, settings_manager, args)
+
+    assert [error for _, error in results] == [None] * args.requests
+    assert retries == 0
+    if provider != "models":
+        assert state.request_count == args.requests
+
+
+def test_injected_errors_are_retried(stub):
+    args, base_url, state = stub
+    state.error_rate = 0.5
+    state.error_status = 503
+    state.retry_after = 0
+    service, settings_manager = load_test.build_service([base_url], args)
+
+    results, wall, retries = load_test.run_load(service, settings_manager, args)
+
+    assert state.error_count > 0
+    assert retries >= state.error_count - sum(1 for _, error in results if error)
+    assert any(error is None for _, error in results)
+
+
+def test_ollama_answer_is_routed(stub):
+    args, base_url, state = stub
+    service, settings_manager = load_test.build_service([base_url], args)
+
+    answer, model = service.ask_ollama(load_test.SAMPLE_QUESTION)
+
+    assert answer
+    assert model == settings_manager.get("ollama_model")
+    assert service.router.route(load_test.SAMPLE_QUESTION, "ollama")["type"] == "multiple_choice"
+
+
+def test_chat_session_requests_run_in_parallel(stub):
+    args, base_url, state = stub
+    args.provider = "ollama"
+    args.ollama_session = "chat"
+    args.requests = 4
+    args.concurrency = 4
+    state.latency_ms = 200
+    service, settings_manager = load_test.build_service([base_url], args)
+
+    results, wall, retries = load_test.run_load(service, settings_manager, args)
+
+    assert [error for _, error in results] == [None] * 4
+    # Serialized requests would take at least 4 x 200 ms
+    assert wall < 0.6
+    assert len(service.ollama_session.messages) == 8
@@ -0,0 +1,52 @@
+"""MemoryManager unloading of idle OCR models."""
+import threading
+
+import pytest
+
+import core
+
+
+@pytest.fixture
+def ocr_processor(settings_manager):
+    ocr_processor = core.OCRProcessor(settings_manager)
+    ocr_processor.easyocr_readers[("en", False)] = object()  # A resident reader
+    return ocr_processor
+
+
+@pytest.fixture
+def memory_manager(settings_manager, ocr_processor, monkeypatch):
+    settings_manager.set("ocr_idle_unload_seconds", 300)
+    settings_manager.set("memory_rss_budget_mb", 0)
+    monkeypatch.setattr(core.MemoryManager, "current_rss_mb", staticmethod(lambda: 500.0))
+    monkeypatch.setattr(core.MemoryManager, "trim", staticmethod(lambda: None))
+    return core.MemoryManager(settings_manager, ocr_processor)
+
+
+def test_models_in_use_recently_stay_loaded(memory_manager, ocr_processor):
+    ocr_processor.last_used = core.time.monotonic() - 10
+    memory_manager.check()
+    assert ocr_processor.models_loaded()
+
+
+def test_idle_models_are_unloaded(memory_manager, ocr_processor):
+    ocr_processor.last_used = core.time.monotonic() - 301
+    assert memory_manager.check() == 500.0
+    assert not ocr_processor.models_loaded()
+
+
+def test_rss_budget_unloads_busy_models(settings_manager, memory_manager, ocr_processor):
+    settings_manager.set("memory_rss_budget_mb", 400)
+    ocr_processor.last_used = core.time.monotonic()
+    memory_manager.check()
+    assert not ocr_processor.models_loaded()
+
+
+def test_running_ocr_is_never_unloaded(memory_manager, ocr_processor):
+    ocr_processor.last_used = core.time.monotonic() - 301
+    with ocr_processor.model_lock:
+        # check() runs on its own thread in the app; unloading must not wait for the lock
+        worker = threading.Thread(target=memory_manager.check)
+        worker.start()
+        worker.join(timeout=5)
+        assert not worker.is_alive()
+        assert ocr_processor.models_loaded()
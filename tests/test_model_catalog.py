@@ -0,0 +1,65 @@
+"""ModelCatalog capabilities and automatic model choice."""
+import pytest
+
+import core
+
+
+@pytest.fixture
+def catalog(settings_manager):
+    return core.ModelCatalog(settings_manager)
+
+
+def tag(name, parameter_size, family):
+    return {"name": name, "digest": name, "size": 1, "details": {"parameter_size": parameter_size, "family": family}}
+
+
+def test_fastest_skips_embedding_models(catalog):
+    models = {
+        "nomic-embed-text": catalog.model_info(tag("nomic-embed-text", "137M", "nomic-bert"), {"capabilities": ["embedding"]}),
+        "llama3.2:3b": catalog.model_info(tag("llama3.2:3b", "3.2B", "llama"), {"capabilities": ["completion", "tools"]}),
+        "llama3.1:8b": catalog.model_info(tag("llama3.1:8b", "8B", "llama"), {"capabilities": ["completion"]}),
+    }
+    catalog.entries["http://ollama"] = {"fetched_at": 0, "models": models}
+
+    assert catalog.fastest("http://ollama") == "llama3.2:3b"
+
+
+def test_capabilities_inferred_for_older_ollama(catalog):
+    assert catalog.model_info(tag("all-minilm", "23M", "bert"), {})["capabilities"] == ["embedding"]
+    llava = catalog.model_info(tag("llava", "7B", "llama"), {"details": {"families": ["llama", "clip"]}})
+    assert llava["capabilities"] == ["completion", "vision"]
+    assert llava["vision"]
+
+
+def test_fastest_ignores_entries_without_capabilities(catalog):
+    catalog.entries["http://ollama"] = {"fetched_at": 0, "models": {"old": {"parameters": 1.0, "vision": False}}}
+
+    assert catalog.fastest("http://ollama") is None
+
+
+def test_fastest_vision_model(catalog):
+    catalog.entries["http://ollama"] = {"fetched_at": 0, "models": {
+        "llama3.2:3b": catalog.model_info(tag("llama3.2:3b", "3.2B", "llama"), {"capabilities": ["completion"]}),
+        "llava:7b": catalog.model_info(tag("llava:7b", "7B", "llama"), {"capabilities": ["completion", "vision"]}),
+    }}
+
+    assert catalog.fastest("http://ollama") == "llama3.2:3b"
+    assert catalog.fastest("http://ollama", vision=True) == "llava:7b"
+
+
+def test_image_requests_only_go_to_hosts_with_a_vision_model(settings_manager, catalog):
+    settings_manager.set("ollama_url", "http://a")
+    settings_manager.set("ollama_urls", ["http://b", "http://c"])
+    llava = {"llava": catalog.model_info(tag("llava", "7B", "llama"), {"capabilities": ["completion", "vision"]})}
+    text_only = {"llava": catalog.model_info(tag("llava", "7B", "llama"), {"capabilities": ["completion"]})}
+    catalog.entries["http://a"] = {"fetched_at": 0, "models": text_only}
+    catalog.entries["http://b"] = {"fetched_at": 0, "models": llava}
+    pool = core.OllamaHostPool(settings_manager, catalog)
+    pool.hosts()
+    pool.state["http://b"]["ewma_ms"] = 500.0
+    pool.state["http://c"]["ewma_ms"] = 800.0
+    pool.state["http://a"]["ewma_ms"] = 10.0
+
+    assert pool.pick("llava") == "http://a"
+    assert pool.pick("llava", vision=True) == "http://b"
+    assert pool.pick("llava", exclude=["http://b"], vision=True) == "http://c"  # Not described yet: stays eligible
@@ -0,0 +1,35 @@
+"""NearDuplicateIndex reuse of answers to near-identical questions."""
+import pytest
+
+import core
+
+QUESTION = "Which planet is closest to the sun and also the smallest planet in the solar system?"
+
+
+@pytest.fixture
+def index():
+    index = core.NearDuplicateIndex()
+    index.add(1, QUESTION)
+    index.add(2, "What is the capital city of Australia and when did it become the capital?")
+    return index
+
+
+def test_ocr_noise_is_reused_above_the_threshold(index):
+    assert index.query("WHICH planet is closest to the sun, and also the smallest planet in the solar system", 0.85) == (1, 1.0)
+
+    entry_id, similarity = index.query("Which pIanet is closest to the sun and also the smallest planet in the solar system?", 0.85)
+    assert entry_id == 1 and 0.85 <= similarity < 1.0
+
+
+def test_different_questions_are_not_reused(index):
+    changed_answer = "Which planet is closest to the sun and also the largest planet in the solar system?"
+    assert index.query(changed_answer, 0.85) is None
+    assert index.query(changed_answer, 0.5)[0] == 1  # A candidate, only rejected by the threshold
+    assert index.query("Which planet is farthest from the sun and also the largest planet in the solar system?", 0.85) is None
+    assert index.query("?!", 0.0) is None
+
+
+def test_newest_entry_wins_a_tie(index):
+    index.add(3, QUESTION)
+    assert index.query(QUESTION, 0.85) == (3, 1.0)
+    assert len(index) == 3
@@ -0,0 +1,70 @@
+"""OCRProcessor engine pooling, the cascade fallback and incremental OCR."""
+import numpy as np
+import pytest
+from PIL import Image
+
+import core
+
+
+@pytest.fixture
+def ocr_processor(settings_manager):
+    return core.OCRProcessor(settings_manager)
+
+
+def test_engine_pool_keeps_recent_languages_and_evicts_by_key(settings_manager, ocr_processor):
+    settings_manager.set("ocr_reader_pool_size", 2)
+    created = []
+
+    def engine(key):
+        return ocr_processor._pooled(ocr_processor.onnx_backends, key, lambda: created.append(key) or key)
+
+    for key in ["en", "es", "en", "fr", "en"]:
+        engine(key)
+
+    assert created == ["en", "es", "fr"]
+    assert list(ocr_processor.onnx_backends) == ["fr", "en"]
+
+
+def test_cascade_keeps_tesseract_text_without_easyocr(settings_manager, ocr_processor, monkeypatch):
+    settings_manager.set("ocr_method", "cascade")
+    lines = [
+        {"text": "What is 2 + 2?", "confidence": 91.0, "min_confidence": 88.0, "box": [0, 0, 90, 10]},
+        {"text": "A) 3 B) 4", "confidence": 40.0, "min_confidence": 20.0, "box": [0, 20, 90, 30]},
+    ]
+    monkeypatch.setattr(ocr_processor, "_read_tesseract_lines", lambda image, language: [dict(line) for line in lines])
+
+    def no_easyocr(image, language):
+        raise ImportError("No module named 'easyocr'")
+
+    monkeypatch.setattr(ocr_processor, "_read_with_easyocr", no_easyocr)
+
+    assert ocr_processor.read_text(Image.new("RGB", (100, 40), "white")) == "What is 2 + 2?\nA) 3 B) 4"
+
+
+def bands_frame(*shades):
+    """A white frame with one dark 20-pixel band per shade, 30 rows apart."""
+    frame = Image.new("RGB", (200, 40 + 50 * len(shades)), "white")
+    for index, shade in enumerate(shades):
+        frame.paste((shade, shade, shade), (10, 20 + 50 * index, 190, 40 + 50 * index))
+    return frame
+
+
+def test_incremental_ocr_rereads_only_changed_tiles(ocr_processor, monkeypatch):
+    composites = []
+
+    def read_lines(image, language):
+        """Fake OCR: one line per band, named after its shade."""
+        composites.append(image.height)
+        gray = np.asarray(image.convert("L"))
+        return [(f"shade {gray[top:bottom].min()}", (top + bottom) / 2) for top, bottom in ocr_processor._split_text_bands(gray)]
+
+    monkeypatch.setattr(ocr_processor, "_read_lines", read_lines)
+
+    assert ocr_processor.extract_text_incremental(bands_frame(0, 50, 100), "full") == "shade 0\nshade 50\nshade 100"
+    assert ocr_processor.extract_text_incremental(bands_frame(0, 60, 100), "full") == "shade 0\nshade 60\nshade 100"
+    assert ocr_processor.extract_text_incremental(bands_frame(0, 60, 100), "full") == "shade 0\nshade 60\nshade 100"
+    assert len(composites) == 2 and composites[1] < composites[0]  # Only the changed band was read again
+
+    ocr_processor.settings_manager.set("tesseract_psm", 4)  # A different OCR config never reuses tiles
+    ocr_processor.extract_text_incremental(bands_frame(0, 60, 100), "full")
+    assert len(composites) == 3
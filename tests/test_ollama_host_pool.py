@@ -0,0 +1,55 @@
+"""OllamaHostPool load balancing and failover."""
+import pytest
+import requests
+
+import core
+
+
+@pytest.fixture
+def pool(settings_manager):
+    settings_manager.set("ollama_url", "http://a")
+    settings_manager.set("ollama_urls", ["http://b/", "http://a"])
+    return core.OllamaHostPool(settings_manager)
+
+
+class Response:
+    status_code = 200
+    text = "{}"
+
+
+def test_hosts_are_deduplicated(pool):
+    assert pool.hosts() == ["http://a", "http://b"]
+
+
+def test_requests_go_to_the_least_loaded_host(pool):
+    pool.hosts()
+    pool.state["http://a"]["ewma_ms"] = 100.0
+    pool.state["http://b"]["ewma_ms"] = 300.0
+    assert pool.pick() == "http://a"
+
+    pool.state["http://a"]["outstanding"] = 3  # 4 x 100 ms queued behind a, 1 x 300 ms on b
+    assert pool.pick() == "http://b"
+
+    pool.state["http://b"]["models"] = {"llama3.2"}
+    pool.state["http://a"]["models"] = {"llava"}
+    assert pool.pick("llava") == "http://a"
+
+
+def test_failed_host_is_skipped_until_healthy_again(pool, monkeypatch):
+    calls = []
+
+    class Session:
+        def post(self, url, json=None, timeout=None):
+            calls.append(url)
+            if url.startswith("http://a"):
+                raise requests.exceptions.ConnectionError("refused")
+            return Response()
+
+    monkeypatch.setattr(core, "http_session", Session())
+
+    assert pool.post("/api/generate", {}, preferred="http://a")[0] == "http://b"
+    assert calls == ["http://a/api/generate", "http://b/api/generate"]
+    assert not pool.is_healthy("http://a")
+
+    pool.post("/api/generate", {}, preferred="http://a")
+    assert calls[-1] == "http://b/api/generate"
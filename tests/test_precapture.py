@@ -0,0 +1,81 @@
+"""Precapture reuse of background OCR for F10 captures."""
+import pytest
+from PIL import Image
+
+import core
+
+REGION = (0, 0, 120, 40)
+
+
+@pytest.fixture
+def screen(monkeypatch):
+    """The frame grab_screen returns; replace .frame to change the screen."""
+    class Screen:
+        frame = Image.new("RGB", (120, 40), "white")
+
+    monkeypatch.setattr(core, "grab_screen", lambda region=None: Screen.frame)
+    return Screen
+
+
+@pytest.fixture
+def ocr_calls(settings_manager, monkeypatch):
+    settings_manager.set("ocr_incremental", False)
+    settings_manager.set("precapture_interval", 0.01)
+    calls = []
+
+    def extract_text(self, image):
+        calls.append(image.getpixel((0, 0)))
+        return f"text of {image.getpixel((0, 0))}"
+
+    monkeypatch.setattr(core.OCRProcessor, "extract_text", extract_text)
+    return calls
+
+
+@pytest.fixture
+def precapture(settings_manager, ocr_calls):
+    precapture = core.Precapture(settings_manager, core.OCRProcessor(settings_manager))
+    yield precapture
+    precapture.stop()
+    precapture.thread.join(timeout=5)
+
+
+def test_unchanged_frame_reuses_the_background_ocr(precapture, screen, ocr_calls):
+    precapture.start(REGION, screen.frame)
+    digest = precapture.hash_frame(screen.frame)
+
+    assert precapture.lookup(REGION, digest, timeout=5) == "text of (255, 255, 255)"
+    precapture.stop_event.wait(0.1)  # Several more captures of the same frame
+    assert ocr_calls == [(255, 255, 255)]
+
+
+def test_changed_frame_or_region_is_not_reused(precapture, screen):
+    precapture.start(REGION, screen.frame)
+    assert precapture.lookup(REGION, precapture.hash_frame(screen.frame), timeout=5)
+
+    assert precapture.lookup((0, 0, 10, 10), precapture.hash_frame(screen.frame)) is None
+    changed = Image.new("RGB", (120, 40), "black")
+    assert precapture.lookup(REGION, precapture.hash_frame(changed)) is None
+
+
+def test_background_follows_screen_changes(precapture, screen, ocr_calls):
+    precapture.start(REGION, screen.frame)
+    assert precapture.lookup(REGION, precapture.hash_frame(screen.frame), timeout=5)
+
+    screen.frame = Image.new("RGB", (120, 40), "black")
+    digest = precapture.hash_frame(screen.frame)
+    for _ in range(500):
+        if precapture.lookup(REGION, digest, timeout=5):
+            break
+        precapture.stop_event.wait(0.01)
+    assert precapture.lookup(REGION, digest) == "text of (0, 0, 0)"
+
+
+def test_f10_result_replaces_a_stale_background_result(settings_manager, ocr_calls):
+    precapture = core.Precapture(settings_manager, core.OCRProcessor(settings_manager))
+    precapture.region, precapture.frame_hash = REGION, b"old"
+
+    precapture.store(REGION, b"new", "stale background text")
+    assert precapture.lookup(REGION, b"new", timeout=0) is None
+
+    precapture.store(REGION, b"new", "F10 text", newest=True)
+    assert precapture.lookup(REGION, b"new") == "F10 text"
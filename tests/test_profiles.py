@@ -0,0 +1,35 @@
+"""ProfileManager client swapping."""
+import pytest
+
+import core
+
+
+@pytest.fixture
+def profile_manager(settings_manager, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    profile_manager = core.ProfileManager(settings_manager)
+    monkeypatch.setattr(profile_manager, "warm_profile", lambda name: None)  # No network
+    return profile_manager
+
+
+def test_settings_save_keeps_the_warm_profile_client(settings_manager, profile_manager):
+    settings_manager.set("ai_provider", "openai")
+    profile_manager.save_profile("work")
+    profile_manager.activate("work")
+    warm = core.client
+
+    assert profile_manager.refresh_client()
+    assert core.client is warm
+
+    settings_manager.set("ai_provider", "ollama")
+    assert profile_manager.refresh_client()
+    assert core.client is warm
+
+
+def test_missing_client_comes_from_the_active_profile(settings_manager, profile_manager):
+    settings_manager.set("ai_provider", "openai")
+    profile_manager.save_profile("work")
+    core.client = None
+
+    assert profile_manager.refresh_client()
+    assert core.client is profile_manager.get_clients("work")["openai"]
@@ -0,0 +1,39 @@
+"""PromptBuilder OCR text normalization and token counting."""
+import types
+
+import pytest
+
+import core
+
+
+@pytest.fixture
+def builder(settings_manager):
+    return core.PromptBuilder(settings_manager)
+
+
+def test_chrome_dropped_only_at_the_edges(builder):
+    text = "Menu\n3/10\nWhich key confirms a dialog?\nOK\n?\nEsc\nNext\n12:05"
+
+    assert builder.normalize(text) == "Which key confirms a dialog?\nOK\n?\nEsc"
+
+
+def test_bare_options_after_the_question_are_kept(builder):
+    assert builder.normalize("Which button saves the form?\nSave\nCancel\nHelp") == (
+        "Which button saves the form?\nSave\nCancel\nHelp"
+    )
+    assert builder.normalize("Pick one\nA) Paris\nB) London\nContinue") == "Pick one\nA) Paris\nB) London\nContinue"
+
+
+def test_failed_encoding_download_falls_back_to_estimate(builder, monkeypatch):
+    def unknown_model(model):
+        raise KeyError(model)
+
+    def unavailable(name):
+        raise OSError("could not download o200k_base")
+
+    fake = types.SimpleNamespace(encoding_for_model=unknown_model, get_encoding=unavailable)
+    monkeypatch.setattr(core, "TIKTOKEN_AVAILABLE", True)
+    monkeypatch.setattr(core, "tiktoken", fake, raising=False)
+
+    assert builder.get_encoder("llama3.2") is None
+    assert builder.count_tokens("x" * 40, "llama3.2") == 10
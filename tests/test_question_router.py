@@ -0,0 +1,56 @@
+"""QuestionRouter classification and routing."""
+import pytest
+
+import core
+
+
+@pytest.fixture
+def router(settings_manager):
+    return core.QuestionRouter(settings_manager)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("True or false: 17 is a prime number.", "true_false"),
+    ("Which planet is closest to the Sun?\nA) Mercury\nB) Venus\nC) Earth\nD) Mars", "multiple_choice"),
+    ("Solve for x: 3x + 7 = 22", "math"),
+    ("What is 12 * 4?", "math"),
+    ("What is 3/4 + 1/8?", "math"),
+    ("def add(a, b):\n    return a + b\nWhat does add(2, 3) return;", "code"),
+    ("Explain the causes of the French Revolution.", "essay"),
+    ("What is the capital of Australia?", "short_answer"),
+])
+def test_classify(router, text, expected):
+    assert router.classify(text)[0] == expected
+
+
+@pytest.mark.parametrize("text", [
+    "Question 3/10\nWhat is the capital of Australia?",
+    "Quiz due 12/05\nWho wrote Hamlet?",
+    "Posted 2024-05-12\nWho painted the Mona Lisa?",
+])
+def test_counters_and_dates_are_not_math(router, text):
+    assert router.classify(text)[0] == "short_answer"
+
+
+def test_route_uses_rule_and_defaults(router):
+    route = router.route("True or false: water boils at 100 °C at sea level.", "openai")
+    assert route["type"] == "true_false"
+    assert route["model"] == router.settings_manager.get("openai_model")
+    # Room for the one-sentence reason the prompt asks for
+    assert route["max_tokens"] >= 40
+    assert "True or False" in router.render(route, "Q", core.QuestionRouter.DEFAULT_PROMPT)
+
+
+def test_routing_rules_override_defaults(router):
+    router.settings_manager.set("routing_rules", {"math": {"ollama_model": "qwen2.5-math:7b", "max_tokens": 200}})
+    route = router.route("Solve for x: 2x = 8", "ollama")
+    assert route["model"] == "qwen2.5-math:7b"
+    assert route["max_tokens"] == 200
+
+
+def test_routing_off_keeps_settings(router):
+    router.settings_manager.set("question_routing", False)
+    route = router.route("Solve for x: 2x = 8", "openai")
+    assert route["type"] is None
+    assert route["max_tokens"] == router.settings_manager.get("max_tokens")
+    assert router.render(route, "Q", "fallback {question}") == "fallback Q"
@@ -0,0 +1,103 @@
+"""TokenBucket pacing and RateLimiter's 429 handling, on a fake clock."""
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+import core
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace time.monotonic and time.sleep with a clock that only moves when slept."""
+    class Clock:
+        now = 1000.0
+        sleeps = []
+
+        @classmethod
+        def sleep(cls, seconds):
+            cls.sleeps.append(round(seconds, 3))
+            cls.now += seconds
+
+    Clock.sleeps = []
+    monkeypatch.setattr(core.time, "monotonic", lambda: Clock.now)
+    monkeypatch.setattr(core.time, "sleep", Clock.sleep)
+    return Clock
+
+
+class RawResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+    def parse(self):
+        return "answer"
+
+
+def rate_limit_error(headers):
+    response = SimpleNamespace(status_code=429, headers=headers, request=None)
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def test_bucket_waits_for_refill(clock):
+    bucket = core.TokenBucket(2, 1.0)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    assert clock.sleeps == [1.0]
+
+    bucket.refund(5)
+    assert bucket.available() == 2  # Never above capacity
+
+
+def test_headers_shrink_the_bucket_and_pause_when_exhausted(settings_manager, clock):
+    limiter = core.RateLimiter(settings_manager)
+    limiter.update_from_headers("gpt-4o", {
+        "x-ratelimit-limit-requests": "60", "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "1.5s"
+    })
+    assert limiter.get_buckets("gpt-4o")["requests"].capacity == 60
+
+    limiter.acquire("gpt-4o", 10)
+    assert clock.sleeps[0] == 1.5
+
+
+def test_429_retries_after_the_server_delay(settings_manager, clock):
+    limiter = core.RateLimiter(settings_manager)
+    attempts = []
+    retries = []
+
+    def request():
+        attempts.append(clock.now)
+        if len(attempts) < 3:
+            raise rate_limit_error({"retry-after": "2"})
+        return RawResponse({})
+
+    assert limiter.call("gpt-4o", 100, request, on_retry=lambda attempt, delay, error: retries.append((attempt, delay))) == "answer"
+    assert retries == [(1, 2.0), (2, 2.0)]
+    assert attempts[1] - attempts[0] >= 2.0 and attempts[2] - attempts[1] >= 2.0
+
+
+def test_gives_up_after_max_retries(settings_manager, clock):
+    settings_manager.set("openai_max_retries", 1)
+    limiter = core.RateLimiter(settings_manager)
+
+    def request():
+        raise rate_limit_error({"retry-after-ms": "250"})
+
+    with pytest.raises(openai.RateLimitError):
+        limiter.call("gpt-4o", 100, request)
+    assert 0.25 in clock.sleeps
+
+
+def test_client_errors_are_not_retried(settings_manager, clock):
+    limiter = core.RateLimiter(settings_manager)
+    calls = []
+
+    def request():
+        calls.append(1)
+        raise ValueError("bad request body")
+
+    with pytest.raises(ValueError):
+        limiter.call("gpt-4o", 100, request)
+    assert calls == [1]
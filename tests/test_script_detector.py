@@ -0,0 +1,55 @@
+"""ScriptDetector language choice for OCR language "auto"."""
+import pytest
+import pytesseract
+from PIL import Image
+
+import core
+
+
+@pytest.fixture
+def settings_manager(settings_manager):
+    settings_manager.set("ocr_method", "pytesseract")
+    return settings_manager
+
+
+@pytest.fixture
+def tesseract(monkeypatch):
+    """Fake Tesseract with English, Spanish and Russian installed; OSD reports the script in .script."""
+    class Fake:
+        script = "Latin"
+        osd_calls = 0
+
+    def image_to_osd(image, config="", output_type=None):
+        Fake.osd_calls += 1
+        return {"script": Fake.script}
+
+    monkeypatch.setattr(pytesseract, "get_languages", lambda config="": ["eng", "spa", "rus", "osd"])
+    monkeypatch.setattr(pytesseract, "image_to_osd", image_to_osd)
+    monkeypatch.setattr(pytesseract, "image_to_string", lambda *args, **kwargs: pytest.fail("no extra OCR pass"))
+    return Fake
+
+
+def frame(shade):
+    return Image.new("RGB", (1200, 300), (shade, shade, shade))
+
+
+def test_uninstalled_languages_are_never_chosen(settings_manager, tesseract):
+    detector = core.ScriptDetector(settings_manager)
+    assert detector.candidates() == ["eng", "spa", "rus"]
+
+    tesseract.script = "Han"
+    assert detector.detect(frame(1)) == "eng"
+    tesseract.script = "Cyrillic"
+    assert detector.detect(frame(2)) == "rus"
+
+
+def test_latin_language_comes_from_the_last_capture(settings_manager, tesseract):
+    detector = core.ScriptDetector(settings_manager)
+    assert detector.detect(frame(1)) == "eng"
+
+    detector.observe("¿Cuál es el planeta más cercano al sol y que es el más pequeño?")
+    assert detector.detect(frame(1)) == "spa"
+    assert tesseract.osd_calls == 1  # The frame's script is cached
+
+    detector.observe("3/10")
+    assert detector.detect(frame(2)) == "spa"
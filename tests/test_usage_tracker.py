@@ -0,0 +1,56 @@
+"""UsageTracker accounting and the daily budget."""
+import sqlite3
+
+import pytest
+
+import core
+
+
+@pytest.fixture
+def usage_tracker(settings_manager):
+    usage_tracker = core.UsageTracker(settings_manager)
+    yield usage_tracker
+    usage_tracker.close()
+
+
+def test_prompt_stats_are_stored_with_each_request(settings_manager, usage_tracker):
+    prompt_builder = core.PromptBuilder(settings_manager)
+    _, prompt_stats = prompt_builder.build("What  is   2 + 2 ?\n\n\n\n" * 3, "gpt-4o")
+
+    entry = usage_tracker.record("openai", "gpt-4o", prompt_stats["prompt_tokens"], 5, 120.0, prompt_stats=prompt_stats)
+
+    assert entry["tokens_saved"] == prompt_stats["tokens_saved"] > 0
+    assert usage_tracker.totals()["tokens_saved"] == prompt_stats["tokens_saved"]
+
+
+def test_older_databases_gain_the_prompt_stats_columns(settings_manager):
+    with sqlite3.connect("history.db") as conn:
+        conn.execute("CREATE TABLE usage (id INTEGER PRIMARY KEY, created_at TEXT NOT NULL, day TEXT NOT NULL, provider TEXT, "
+                     "model TEXT, question_type TEXT, prompt_tokens INTEGER, completion_tokens INTEGER, latency_ms REAL, "
+                     "tokens_per_s REAL, cost_usd REAL)")
+    conn.close()
+
+    usage_tracker = core.UsageTracker(settings_manager)
+    usage_tracker.record("openai", "gpt-4o", 10, 5, 120.0, prompt_stats={"raw_tokens": 14, "prompt_tokens": 10, "tokens_saved": 4})
+    assert usage_tracker.totals()["tokens_saved"] == 4
+    usage_tracker.close()
+
+
+def test_budget_switches_to_the_fallback_model(settings_manager, usage_tracker):
+    settings_manager.set("daily_budget_usd", 0.01)
+    assert usage_tracker.budget_model("gpt-4o") == "gpt-4o"
+
+    usage_tracker.record("openai", "gpt-4o", 2000, 500, 900.0)  # $0.005 + $0.005
+    assert usage_tracker.spent_today() == pytest.approx(0.01)
+    assert usage_tracker.budget_model("gpt-4o") == "gpt-4o-mini"
+    assert usage_tracker.budget_model("gpt-4o-mini") == "gpt-4o-mini"
+
+
+def test_ollama_and_unlimited_budgets_never_switch(settings_manager, usage_tracker):
+    settings_manager.set("daily_budget_usd", 0.01)
+    usage_tracker.record("ollama", "llava", 1_000_000, 1_000_000, 900.0)
+    assert usage_tracker.budget_model("gpt-4o") == "gpt-4o"
+
+    settings_manager.set("daily_budget_usd", 0)
+    usage_tracker.record("openai", "gpt-4o", 1_000_000, 0, 900.0)
+    assert usage_tracker.budget_model("gpt-4o") == "gpt-4o"
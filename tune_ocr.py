@@ -0,0 +1,200 @@
+"""Tune OCR settings on a labeled corpus: best accuracy within a latency budget.
+
+Searches the OCR method, Tesseract page segmentation / engine modes and model
+folder (tessdata_fast vs tessdata_best), the EasyOCR confidence threshold and
+the preprocessing scale. Every configuration is scored on a sample of the corpus
+first; the most accurate ones within budget are re-scored on the whole corpus.
+The winner is written to settings.json (or a named profile in it).
+
+Usage:
+    python generate_corpus.py corpus/ --count 200
+    python tune_ocr.py corpus/ --budget-ms 300
+    python tune_ocr.py corpus/ --budget-ms 150 --tessdata-dirs /opt/tessdata_fast /opt/tessdata_best --profile "Fast laptop"
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+
+from benchmark_ocr import character_error_rate, list_images, load_labels, normalize_text, percentile
+
+PSM_MODES = [3, 4, 6, 11]
+OEM_MODES = [1, 3]
+EASYOCR_CONFIDENCES = [0.0, 0.2, 0.4, 0.5, 0.6]
+SCALES = [0.75, 1.0, 1.5, 2.0]
+
+# Settings written for the winning configuration
+TUNED_KEYS = ["ocr_method", "tesseract_psm", "tesseract_oem", "tessdata_dir", "easyocr_min_confidence", "ocr_scale"]
+
+
+def search_space(methods, tessdata_dirs):
+    """Return the candidate configurations (settings overrides) for the given OCR methods."""
+    configs = []
+    for method in methods:
+        if method == "pytesseract":
+            for psm, oem, tessdata_dir, scale in itertools.product(PSM_MODES, OEM_MODES, tessdata_dirs, SCALES):
+                configs.append({"ocr_method": method, "tesseract_psm": psm, "tesseract_oem": oem,
+                                "tessdata_dir": tessdata_dir, "ocr_scale": scale})
+        elif method in ("easyocr", "easyocr_onnx"):
+            for confidence, scale in itertools.product(EASYOCR_CONFIDENCES, SCALES):
+                configs.append({"ocr_method": method, "easyocr_min_confidence": confidence, "ocr_scale": scale})
+        elif method == "cascade":
+            for psm, tessdata_dir, confidence, scale in itertools.product(PSM_MODES, tessdata_dirs, EASYOCR_CONFIDENCES[1:4], SCALES):
+                configs.append({"ocr_method": method, "tesseract_psm": psm, "tessdata_dir": tessdata_dir,
+                                "easyocr_min_confidence": confidence, "ocr_scale": scale})
+    return configs
+
+
+def load_corpus(folder):
+    """Return [(language, image, truth)] for the labeled images in folder."""
+    from PIL import Image
+
+    labels = load_labels(folder)
+    items = []
+    for path in list_images(folder):
+        label = labels.get(os.path.basename(path))
+        if label is not None:
+            items.append((label["language"], Image.open(path).convert("RGB"), label["text"]))
+    # Group by language so each model is loaded once per evaluation
+    items.sort(key=lambda item: item[0])
+    return items
+
+
+def evaluate(ocr_processor, settings_manager, config, items):
+    """Run one configuration over items and return (CER, p95 ms, mean ms)."""
+    # Keys the config leaves out take their defaults, not whatever the previous config set
+    for key in TUNED_KEYS:
+        settings_manager.set(key, config.get(key, settings_manager.default_settings[key]))
+
+    latencies = []
+    errors = 0.0
+    truth_characters = 0
+    warmed = set()
+    for language, image, truth in items:
+        settings_manager.set("ocr_language", language)
+        if language not in warmed:
+            ocr_processor.extract_text(image)  # Model load is not part of the latency budget
+            warmed.add(language)
+
+        start = time.perf_counter()
+        text = ocr_processor.extract_text(image)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        truth_length = len(normalize_text(truth))
+        errors += character_error_rate(text, truth) * truth_length
+        truth_characters += truth_length
+
+    return errors / max(1, truth_characters), percentile(latencies, 95), sum(latencies) / len(latencies)
+
+
+def describe(config):
+    """Return a short one-line description of a configuration."""
+    return " ".join(f"{key.replace('tesseract_', '')}={value}" for key, value in config.items() if value != "")
+
+
+def tune(items, configs, budget_ms, sample_size, finalists):
+    """Score configs on a sample, re-score the best on all items and return the results, best first.
+
+    Each result is (config, cer, p95_ms, mean_ms). Among configurations whose p95
+    latency is within budget the lowest CER wins, ties going to the faster; if none
+    is within budget, the fastest comes first.
+    """
+    from core import OCRProcessor, SettingsManager
+
+    settings_manager = SettingsManager()
+    settings_manager.set("ocr_incremental", False)
+    processors = {}  # One processor per method so models stay loaded across configs
+
+    def score(config, subset):
+        method = config["ocr_method"]
+        if method not in processors:
+            processors[method] = OCRProcessor(settings_manager)
+        return evaluate(processors[method], settings_manager, config, subset)
+
+    # Spread the sample over the corpus so every language is represented
+    step = max(1, len(items) // sample_size)
+    sample = items[::step][:sample_size]
+
+    print(f"Stage 1: {len(configs)} configurations on {len(sample)} images")
+    scored = []
+    for i, config in enumerate(configs, 1):
+        cer, p95, mean = score(config, sample)
+        scored.append((config, cer, p95, mean))
+        print(f"  [{i}/{len(configs)}] CER {cer:6.1%}  p95 {p95:7.1f} ms  {describe(config)}")
+
+    def rank(result):
+        config, cer, p95, mean = result
+        over_budget = p95 > budget_ms
+        return (over_budget, p95 if over_budget else cer, mean)
+
+    scored.sort(key=rank)
+    top = scored[:finalists]
+
+    print(f"Stage 2: {len(top)} finalists on all {len(items)} images")
+    results = []
+    for config, *_ in top:
+        cer, p95, mean = score(config, items)
+        results.append((config, cer, p95, mean))
+        print(f"  CER {cer:6.1%}  p95 {p95:7.1f} ms  mean {mean:7.1f} ms  {describe(config)}")
+
+    results.sort(key=rank)
+    return results
+
+
+def write_settings(config, profile=None):
+    """Write the tuned settings to settings.json, into a profile if one is named."""
+    from core import PROFILE_KEYS, SettingsManager
+
+    settings_manager = SettingsManager()
+    tuned = {key: config.get(key, settings_manager.default_settings[key]) for key in TUNED_KEYS}  # As evaluated
+    for key, value in tuned.items():
+        settings_manager.set(key, value)
+
+    if profile:
+        profiles = dict(settings_manager.get("profiles") or {})
+        entry = profiles.get(profile) or {key: settings_manager.get(key) for key in PROFILE_KEYS}
+        entry.update(tuned)
+        profiles[profile] = entry
+        settings_manager.set("profiles", profiles)
+        settings_manager.set("active_profile", profile)
+
+    return settings_manager.save_settings()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune OCR settings on a labeled corpus")
+    parser.add_argument("corpus", nargs="?", default="corpus", help="Folder with images and labels.jsonl (see generate_corpus.py)")
+    parser.add_argument("--budget-ms", type=float, default=500, help="p95 OCR latency budget per capture")
+    parser.add_argument("--methods", nargs="+", default=["pytesseract", "easyocr", "easyocr_onnx", "cascade"],
+                        choices=["pytesseract", "easyocr", "easyocr_onnx", "cascade"])
+    parser.add_argument("--tessdata-dirs", nargs="+", default=[""],
+                        help="Tesseract model folders to compare, e.g. tessdata_fast and tessdata_best (\"\" = built-in)")
+    parser.add_argument("--sample", type=int, default=20, help="Images per configuration in the first stage")
+    parser.add_argument("--finalists", type=int, default=5, help="Configurations re-scored on the whole corpus")
+    parser.add_argument("--profile", help="Store the result in this profile instead of only the top-level settings")
+    parser.add_argument("--dry-run", action="store_true", help="Report the winner without writing settings.json")
+    args = parser.parse_args()
+
+    items = load_corpus(args.corpus)
+    if not items:
+        print(f"No labeled images found in {args.corpus} (generate some with generate_corpus.py)")
+        return 1
+
+    results = tune(items, search_space(args.methods, args.tessdata_dirs), args.budget_ms, args.sample, args.finalists)
+    config, cer, p95, mean = results[0]
+    if p95 > args.budget_ms:
+        print(f"No configuration meets the {args.budget_ms:.0f} ms budget; using the fastest one")
+    print(f"Best: CER {cer:.1%}, p95 {p95:.1f} ms, mean {mean:.1f} ms - {describe(config)}")
+
+    if args.dry_run:
+        return 0
+    if not write_settings(config, args.profile):
+        return 1
+    target = f"profile '{args.profile}' in settings.json" if args.profile else "settings.json"
+    print(f"Saved to {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())